@@ -3,6 +3,12 @@ import time
 import logging
 from src.scraper.web_monitor import WebsiteMonitor
 from src.data_processing.content_processor import ContentProcessor
+from src.config.settings import (
+    ADAPTIVE_RECRAWL, RECRAWL_TICK_MINUTES, METRICS_FILE, METRICS_PORT,
+    EMBED_WORKER_ADDRESS, EMBED_WORKER_SPAWN
+)
+from src.data_processing.embedding_worker import start_worker
+from src.monitoring.metrics import metrics
 import os
 from dotenv import load_dotenv
 
@@ -21,7 +27,9 @@ logging.basicConfig(
 
 logger = logging.getLogger(__name__)
 
-def check_and_update():
+MODEL_NAME = os.getenv('MODEL_NAME', 'all-MiniLM-L6-v2')
+
+def check_and_update(due_only=False):
     """Main function to check website and update content"""
     try:
         # Initialize components
@@ -29,33 +37,51 @@ def check_and_update():
             start_url=os.getenv('WEBSITE_URL', 'https://aphrc.org'),
             output_dir='data'
         )
+        if due_only and not monitor.has_due_pages():
+            return
         
         processor = ContentProcessor(
             redis_host=os.getenv('REDIS_HOST', 'localhost'),
             redis_port=int(os.getenv('REDIS_PORT', 6379)),
             redis_db=int(os.getenv('REDIS_DB', 0)),
-            model_name=os.getenv('MODEL_NAME', 'all-MiniLM-L6-v2')
+            model_name=MODEL_NAME
         )
         
-        # Check for website changes
-        changes_detected = monitor.check_for_updates()
-        
-        if changes_detected:
-            logger.info("Changes detected, updating content...")
-            # Get changed content and process it
-            new_content = monitor.get_changed_content()
-            processor.process_new_content(new_content)
+        try:
+            # Check for website changes
+            changes_detected = monitor.check_for_updates(due_only=due_only)
             
-            # Cleanup old content
-            processor.cleanup_old_content(list(new_content.keys()))
-            logger.info("Content update completed")
-        else:
-            logger.info("No changes detected")
+            if changes_detected:
+                logger.info("Changes detected, updating content...")
+                # Get changed content and process it
+                new_content = monitor.get_changed_content()
+                processor.process_new_content(new_content)
+                
+                # Cleanup old content
+                processor.cleanup_old_content(monitor.get_current_urls())
+                logger.info("Content update completed")
+            else:
+                logger.info("No changes detected")
+        finally:
+            # Release the encode pool and worker connection even when the run fails
+            processor.close()
+        metrics.report(METRICS_FILE)
             
     except Exception as e:
         logger.error(f"Error in check_and_update: {e}")
+        metrics.report(METRICS_FILE)
 
 def main():
+    if METRICS_PORT:
+        metrics.serve(METRICS_PORT)
+    
+    # Keep the model loaded between checks instead of reloading it every interval
+    if EMBED_WORKER_SPAWN and EMBED_WORKER_ADDRESS:
+        try:
+            start_worker(MODEL_NAME, EMBED_WORKER_ADDRESS)
+        except Exception as e:
+            logger.error(f"Could not start the embedding worker, loading the model per check: {e}")
+    
     # Set up scheduling
     interval_hours = int(os.getenv('CHECK_INTERVAL_HOURS', 24))
     logger.info(f"Setting up schedule to run every {interval_hours} hours")
@@ -63,6 +89,10 @@ def main():
     # Schedule the job
     schedule.every(interval_hours).hours.do(check_and_update)
     
+    # Recheck pages as their learned recrawl intervals come due
+    if ADAPTIVE_RECRAWL:
+        schedule.every(RECRAWL_TICK_MINUTES).minutes.do(check_and_update, due_only=True)
+    
     # Run immediately on startup
     logger.info("Running initial check...")
     check_and_update()
@@ -1,99 +1,245 @@
-from sentence_transformers import SentenceTransformer
 import numpy as np
-import redis
 import json
 import logging
 from datetime import datetime
 from typing import Dict, List, Optional
+from src.config.settings import (
+    EMBED_BATCH_SIZE, EMBED_PROCESSES, EMBED_MAX_CHUNKS_PER_PASS,
+    EMBED_CACHE_BACKEND, EMBED_CACHE_MAX_ENTRIES, REDIS_FLUSH_SIZE, REDIS_ATOMIC_WRITES,
+    EMBEDDING_BACKEND, EMBEDDING_STORE_DIR, EMBEDDING_STORE_DTYPE, EMBEDDING_COMPACT_SEGMENTS,
+    CHUNK_MAX_TOKENS, CHUNK_OVERLAP_TOKENS, NEAR_DUPLICATE_DISTANCE
+)
+from src.data_processing.embeddings import BatchEmbedder, EmbeddingCache
+from src.data_processing.embedding_worker import RemoteEmbeddingModel, load_model
+from src.data_processing.chunker import TokenChunker
+from src.data_processing.near_duplicates import NearDuplicateRegistry, simhash, parse_fingerprint
+from src.storage.redis_manager import RedisKeyManager, RedisBulkWriter
+from src.storage.embedding_store import EmbeddingSegmentStore
 
 logging.basicConfig(level=logging.INFO)
 
 class ContentProcessor:
     def __init__(self, redis_host='localhost', redis_port=6379, redis_db=0,
-                 model_name='all-MiniLM-L6-v2'):
-        self.model = SentenceTransformer(model_name)
-        self.redis = redis.Redis(
-            host=redis_host,
-            port=redis_port,
-            db=redis_db,
-            decode_responses=True
+                 model_name='all-MiniLM-L6-v2', batch_size=EMBED_BATCH_SIZE,
+                 num_processes=EMBED_PROCESSES):
+        self.model = load_model(model_name)
+        self.chunker = TokenChunker.for_model(self.model, CHUNK_MAX_TOKENS, CHUNK_OVERLAP_TOKENS)
+        self.key_manager = RedisKeyManager(redis_host, redis_port, redis_db)
+        self.redis = self.key_manager.redis_text
+        self.redis_binary = self.key_manager.redis_binary
+        self.embedding_cache = EmbeddingCache.for_backend(
+            EMBED_CACHE_BACKEND, model_name, EMBED_CACHE_MAX_ENTRIES, self.redis_binary
         )
-        self.redis_binary = redis.Redis(
-            host=redis_host,
-            port=redis_port,
-            db=redis_db,
-            decode_responses=False
+        self.embedder = BatchEmbedder(
+            self.model,
+            batch_size=batch_size,
+            # The resident worker does its own batching; local process pools only apply in-process
+            num_processes=0 if isinstance(self.model, RemoteEmbeddingModel) else num_processes,
+            max_chunks_per_pass=EMBED_MAX_CHUNKS_PER_PASS,
+            cache=self.embedding_cache
         )
+        self.embedding_store = None
+        if EMBEDDING_BACKEND == 'segments':
+            self.embedding_store = EmbeddingSegmentStore(
+                EMBEDDING_STORE_DIR, EMBEDDING_STORE_DTYPE, EMBEDDING_COMPACT_SEGMENTS
+            )
+        self.near_duplicates = None
+        if NEAR_DUPLICATE_DISTANCE > 0:
+            self.near_duplicates = NearDuplicateRegistry(self.redis, NEAR_DUPLICATE_DISTANCE)
+        self._pending_embeddings = []
+        self._pending_deletes = []
+        self._orphaned = set()
         self.logger = logging.getLogger(__name__)
 
-    def chunk_text(self, text: str, max_length: int = 512) -> List[str]:
-        """Split text into chunks suitable for embedding"""
-        words = text.split()
-        chunks = []
-        current_chunk = []
-        current_length = 0
-        
-        for word in words:
-            if current_length + len(word) + 1 > max_length:
-                chunks.append(' '.join(current_chunk))
-                current_chunk = [word]
-                current_length = len(word)
-            else:
-                current_chunk.append(word)
-                current_length += len(word) + 1
-                
-        if current_chunk:
-            chunks.append(' '.join(current_chunk))
-            
-        return chunks
+    def chunk_text(self, text: str) -> List[str]:
+        """Split text into chunks that fill the model's token budget"""
+        return self.chunker.chunk_text(text)
 
     def generate_embeddings(self, text: str) -> List[np.ndarray]:
         """Generate embeddings for text chunks"""
-        chunks = self.chunk_text(text)
-        return [self.model.encode(chunk) for chunk in chunks]
+        return list(self.embedder.encode_texts(self.chunk_text(text)))
 
-    def store_content(self, url: str, content: Dict, embeddings: List[np.ndarray]):
-        """Store content and embeddings in Redis"""
-        try:
+    def _bulk_writer(self) -> RedisBulkWriter:
+        return self.key_manager.bulk_writer(REDIS_FLUSH_SIZE, REDIS_ATOMIC_WRITES)
+
+    def store_content(self, url: str, content: Dict, embeddings: List[np.ndarray],
+                      writer: Optional[RedisBulkWriter] = None, chunk_ids: Optional[List[str]] = None):
+        """Store content and embeddings in Redis, queued on writer when one is given"""
+        if writer is None:
+            with self._bulk_writer() as own_writer:
+                self.store_content(url, content, embeddings, own_writer, chunk_ids)
+                self._flush_embeddings()
+            return
+
+        with writer.document():
             # Store text content
-            content_key = f"content:{url}"
-            self.redis.hset(content_key, mapping={
+            writer.hset(f"content:{url}", mapping={
                 'text': content['content'],
                 'title': content['title'],
                 'last_updated': content['last_updated']
             })
-            
-            # Store embeddings
+            writer.hdel(f"content:{url}", 'alias_of')
+            if chunk_ids is not None:
+                # Ids in chunk order, so chunk_i of either embedding backend has id i
+                writer.hset(f"content:{url}", 'chunk_ids', json.dumps(chunk_ids))
+            else:
+                writer.hdel(f"content:{url}", 'chunk_ids')
+
+            # Replace embeddings so chunks beyond the new count don't linger
             embedding_key = f"embedding:{url}"
-            for i, emb in enumerate(embeddings):
-                self.redis_binary.hset(embedding_key, f"chunk_{i}", emb.tobytes())
-            
+            writer.delete(embedding_key)
+            if self.embedding_store is not None:
+                self._pending_embeddings.append((url, embeddings))
+            else:
+                writer.hset(embedding_key, mapping={
+                    f"chunk_{i}": emb.tobytes() for i, emb in enumerate(embeddings)
+                })
+
             # Update index
-            self.redis.sadd("urls", url)
-            self.redis.hset("url_updates", url, datetime.now().isoformat())
-            
-        except Exception as e:
-            self.logger.error(f"Error storing content for {url}: {e}")
-            raise
+            writer.sadd("urls", url)
+            writer.hset("url_updates", url, datetime.now().isoformat())
+
+    def _store_alias(self, url: str, content: Dict, canonical: str, writer: RedisBulkWriter):
+        """Store a near-duplicate page as an alias of its canonical page, without embeddings"""
+        with writer.document():
+            writer.hset(f"content:{url}", mapping={
+                'text': content['content'],
+                'title': content['title'],
+                'last_updated': content['last_updated'],
+                'alias_of': canonical
+            })
+            writer.hdel(f"content:{url}", 'chunk_ids')
+            writer.delete(f"embedding:{url}")
+            writer.sadd("urls", url)
+            # Dropping the update entry takes any old vectors out of the search index
+            writer.hdel("url_updates", url)
+            self._orphaned.update(self.near_duplicates.add_alias(url, canonical, writer))
+        if self.embedding_store is not None:
+            self._pending_deletes.append(url)
+
+    def _canonical_for(self, url: str, content: Dict, writer: RedisBulkWriter) -> Optional[str]:
+        """Canonical page this content nearly duplicates; otherwise register it as canonical"""
+        if self.near_duplicates is None:
+            return None
+        if 'simhash' in content:
+            fingerprint = parse_fingerprint(content['simhash'])
+        else:
+            fingerprint = simhash(content['content'])
+        canonical = self.near_duplicates.canonical_for(url, fingerprint)
+        if canonical is None:
+            self._orphaned.update(self.near_duplicates.add_canonical(url, fingerprint, writer))
+        return canonical
+
+    def _flush_embeddings(self):
+        """Write queued embeddings to the segment store as one segment"""
+        if self.embedding_store is None:
+            return
+        if self._pending_deletes:
+            self.embedding_store.delete(self._pending_deletes)
+            self._pending_deletes = []
+        if not self._pending_embeddings:
+            return
+        rows = self.embedding_store.append(self._pending_embeddings)
+        self._pending_embeddings = []
+        self.logger.info(f"Appended {rows} chunk embeddings to {self.embedding_store.directory}")
+        self.embedding_store.maybe_compact_async()
 
     def process_new_content(self, content_dict: Dict[str, Dict]):
-        """Process and store new content"""
-        for url, content in content_dict.items():
+        """Process and store new content, embedding chunks from all URLs in shared batches"""
+        self.logger.info(f"Processing content for {len(content_dict)} URLs")
+        writer = self._bulk_writer()
+        aliased = 0
+        chunk_ids: Dict[str, List[str]] = {}
+
+        def documents():
+            nonlocal aliased
+            for url, content in content_dict.items():
+                # Stored again now, whatever happened to its canonical page earlier
+                self._orphaned.discard(url)
+                canonical = self._canonical_for(url, content, writer)
+                if canonical is not None:
+                    self.logger.info(f"{url} is a near-duplicate of {canonical}, storing as alias")
+                    self._store_alias(url, content, canonical, writer)
+                    aliased += 1
+                    continue
+                chunks = self.chunker.chunk(content['content'], url)
+                chunk_ids[url] = [chunk.id for chunk in chunks]
+                yield url, [chunk.text for chunk in chunks]
+
+        stored = failed = 0
+        try:
+            for url, embeddings in self.embedder.iter_encode(documents()):
+                # The embedder has logged documents that failed to encode
+                if embeddings is None:
+                    failed += 1
+                    continue
+                try:
+                    self.store_content(url, content_dict[url], embeddings, writer, chunk_ids.pop(url, None))
+                    stored += 1
+                except Exception as e:
+                    self.logger.error(f"Failed to process {url}: {e}")
+                    failed += 1
+        finally:
+            # Even after an error, write what was already queued
             try:
-                self.logger.info(f"Processing content for {url}")
-                embeddings = self.generate_embeddings(content['content'])
-                self.store_content(url, content, embeddings)
-                self.logger.info(f"Successfully processed {url}")
+                self._flush_embeddings()
+                writer.flush()
             except Exception as e:
-                self.logger.error(f"Failed to process {url}: {e}")
+                self.logger.error(f"Error storing content: {e}")
+                raise
+        self.logger.info(
+            f"Stored {stored} URLs and {aliased} near-duplicate aliases ({failed} failed) with "
+            f"{writer.commands_sent} Redis commands in {writer.round_trips} round trips"
+        )
+        if self.embedding_cache is not None:
+            self.embedding_cache.log_stats()
+
+        # Aliases whose canonical page changed or became an alias need their own embeddings now
+        if self._orphaned:
+            orphans, self._orphaned = sorted(self._orphaned), set()
+            self.logger.info(f"Re-processing {len(orphans)} aliases of changed pages")
+            self._reprocess(orphans)
+
+    def _reprocess(self, urls: List[str]):
+        """Process already stored pages again from their stored text"""
+        pipe = self.redis.pipeline(transaction=False)
+        for url in urls:
+            pipe.hgetall(f"content:{url}")
+        self.process_new_content({
+            url: {
+                'content': stored['text'],
+                'title': stored.get('title', url),
+                'last_updated': stored.get('last_updated', datetime.now().isoformat())
+            }
+            for url, stored in zip(urls, pipe.execute()) if stored.get('text')
+        })
+
+    def close(self):
+        self.embedder.close()
+        if isinstance(self.model, RemoteEmbeddingModel):
+            self.model.close()
+        if self.embedding_store is not None:
+            self.embedding_store.wait()
 
     def cleanup_old_content(self, current_urls: List[str]):
         """Remove content for URLs that no longer exist"""
-        stored_urls = self.redis.smembers("urls")
-        for url in stored_urls:
-            if url not in current_urls:
+        current = set(current_urls)
+        stale = [url for url in self.redis.smembers("urls") if url not in current]
+        orphans = []
+        with self._bulk_writer() as writer:
+            for url in stale:
                 self.logger.info(f"Removing old content for {url}")
-                self.redis.delete(f"content:{url}")
-                self.redis.delete(f"embedding:{url}")
-                self.redis.srem("urls", url)
-                self.redis.hdel("url_updates", url)
\ No newline at end of file
+                with writer.document():
+                    writer.delete(f"content:{url}", f"embedding:{url}")
+                    writer.srem("urls", url)
+                    writer.hdel("url_updates", url)
+            if self.near_duplicates is not None:
+                orphans = self.near_duplicates.remove(stale, writer)
+        if self.embedding_store is not None:
+            self.embedding_store.delete(stale)
+
+        # Aliases whose canonical page is gone need their own embeddings now
+        orphans = [url for url in orphans if url in current]
+        if orphans:
+            self.logger.info(f"Re-processing {len(orphans)} aliases of removed pages")
+            self._reprocess(orphans)
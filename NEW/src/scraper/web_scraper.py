@@ -1,16 +1,36 @@
-import requests
-from bs4 import BeautifulSoup
-import json
 import os
-from urllib.parse import urlparse, urljoin
+from urllib.parse import urlparse
 import time
 import hashlib
 from datetime import datetime
 import logging
-from selenium import webdriver
-from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.common.by import By
-from selenium.webdriver.common.keys import Keys
+from src.config.settings import (
+    FETCH_CONCURRENCY, FETCH_PER_HOST_CONCURRENCY, FETCH_TIMEOUT,
+    RENDER_URL_PATTERNS, STATIC_URL_PATTERNS,
+    BROWSER_POOL_SIZE, BROWSER_MAX_PAGES, BROWSER_PAGE_TIMEOUT,
+    MAX_SCRAPED_PAGES, MAX_CRAWL_DEPTH, CRAWL_CHECKPOINT_EVERY,
+    INCREMENTAL_DISCOVERY, FULL_CRAWL_INTERVAL_DAYS,
+    RENDER_BUDGET_SECONDS, RENDER_QUIET_MS, RENDER_PROFILES_FILE,
+    PDF_DOWNLOAD_WORKERS, PDF_MAX_SIZE_MB, HTML_PARSER_BACKEND, CHECK_INTERVAL_HOURS,
+    RESPECT_ROBOTS_TXT, ROBOTS_CACHE_HOURS, HOST_INITIAL_RATE, HOST_MAX_RATE, HOST_MAX_RETRIES,
+    ADAPTIVE_RECRAWL, RECRAWL_PAGES_PER_HOUR, RECRAWL_MIN_INTERVAL_HOURS, RECRAWL_MAX_INTERVAL_HOURS
+)
+from src.scraper.fetcher import StaticFetcher, RenderRules
+from src.scraper.driver_pool import DriverPool
+from src.scraper.frontier import CrawlFrontier
+from src.scraper.sitemap import SitemapDiscovery, IncrementalCrawlPlanner
+from src.scraper.recrawl import RecrawlScheduler
+from src.scraper.politeness import Politeness, RobotsCache
+from src.scraper.render_wait import RenderReadiness
+from src.scraper.pdf_downloader import PDFDownloader
+from src.scraper.html_extract import extract_page
+from src.data_processing.near_duplicates import simhash, format_fingerprint
+from src.storage.crawl_output import JsonlCrawlWriter, iter_crawl_records, new_run_id
+from src.storage.page_state import PageStateStore
+from src.monitoring.metrics import metrics
+
+# Page furniture left out of the text used for checksums and embeddings
+TEXT_SKIP_TAGS = frozenset({'script', 'style', 'nav', 'footer'})
 
 logging.basicConfig(
     level=logging.INFO,
@@ -22,8 +42,11 @@ logging.basicConfig(
 )
 
 class WebsiteMonitor:
-    def __init__(self, start_url, output_dir='data'):
+    def __init__(self, start_url, output_dir='data', fetch_batch_size=FETCH_CONCURRENCY,
+                 max_pages=MAX_SCRAPED_PAGES, max_depth=MAX_CRAWL_DEPTH):
         self.start_url = start_url
+        self.max_pages = max_pages
+        self.max_depth = max_depth
         self.visited_urls = set()
         self.domain = urlparse(start_url).netloc
         
@@ -35,26 +58,85 @@ class WebsiteMonitor:
         os.makedirs(self.data_dir, exist_ok=True)
         
         self.checksum_file = os.path.join(self.data_dir, 'checksums.json')
-        self.content_file = os.path.join(self.data_dir, 'content.json')
+        self.content_dir = os.path.join(self.data_dir, 'content')
+        self.frontier_file = os.path.join(self.data_dir, 'frontier.json')
+        self.validators_file = os.path.join(self.data_dir, 'validators.json')
+        self.crawl_state_file = os.path.join(self.data_dir, 'crawl_state.json')
+        self.page_state_file = os.path.join(self.data_dir, 'page_state.db')
+        
+        # Per-URL checksums, validators and status, imported once from the old JSON files
+        self.page_state = PageStateStore(self.page_state_file)
+        self.page_state.migrate_json(self.checksum_file, self.validators_file)
+        
+        # Per-URL recheck times learned from how often each page changes
+        self.scheduler = None
+        if ADAPTIVE_RECRAWL:
+            self.scheduler = RecrawlScheduler(
+                self.page_state,
+                pages_per_hour=RECRAWL_PAGES_PER_HOUR,
+                min_interval_hours=RECRAWL_MIN_INTERVAL_HOURS,
+                max_interval_hours=RECRAWL_MAX_INTERVAL_HOURS,
+                default_interval_hours=CHECK_INTERVAL_HOURS
+            )
+        self.run_id = None
+        self.writer = None
         
-        # Load existing data
-        self.checksums = self._load_json(self.checksum_file, {})
-        self.content = self._load_json(self.content_file, {})
+        # One adaptive rate limit per host, shared by static fetches, renders and PDFs
+        self.politeness = Politeness(
+            max_concurrency=FETCH_PER_HOST_CONCURRENCY,
+            initial_rate=HOST_INITIAL_RATE,
+            max_rate=HOST_MAX_RATE,
+            respect_robots=RESPECT_ROBOTS_TXT,
+            robots=RobotsCache(ttl_hours=ROBOTS_CACHE_HOURS, timeout=FETCH_TIMEOUT)
+        )
+        self.pdf_downloader = PDFDownloader(
+            self.pdf_dir,
+            max_workers=PDF_DOWNLOAD_WORKERS,
+            max_size_mb=PDF_MAX_SIZE_MB,
+            politeness=self.politeness
+        )
+        
+        # Static HTTP tier; Selenium is only used for JS-dependent pages
+        self.fetch_batch_size = fetch_batch_size
+        self.fetcher = StaticFetcher(
+            max_concurrency=FETCH_CONCURRENCY,
+            per_host_concurrency=FETCH_PER_HOST_CONCURRENCY,
+            timeout=FETCH_TIMEOUT,
+            render_rules=RenderRules(
+                always_render=RENDER_URL_PATTERNS,
+                never_render=STATIC_URL_PATTERNS
+            ),
+            page_state=self.page_state,
+            politeness=self.politeness,
+            max_retries=HOST_MAX_RETRIES
+        )
+        self.driver_pool = DriverPool(
+            self._get_driver,
+            size=BROWSER_POOL_SIZE,
+            max_pages_per_driver=BROWSER_MAX_PAGES,
+            page_timeout=BROWSER_PAGE_TIMEOUT
+        )
+        self.readiness = RenderReadiness.from_file(
+            RENDER_PROFILES_FILE,
+            {'budget': RENDER_BUDGET_SECONDS, 'quiet_ms': RENDER_QUIET_MS}
+        )
+        
+        # Sitemap/feed driven incremental checks with a periodic full crawl
+        self.planner = None
+        if INCREMENTAL_DISCOVERY:
+            self.planner = IncrementalCrawlPlanner(
+                SitemapDiscovery(start_url, timeout=FETCH_TIMEOUT),
+                self.crawl_state_file,
+                full_crawl_interval_days=FULL_CRAWL_INTERVAL_DAYS
+            )
         
         self.logger = logging.getLogger(__name__)
 
-    def _load_json(self, filepath, default):
-        try:
-            with open(filepath, 'r', encoding='utf-8') as f:
-                return json.load(f)
-        except FileNotFoundError:
-            return default
-
-    def _save_json(self, data, filepath):
-        with open(filepath, 'w', encoding='utf-8') as f:
-            json.dump(data, f, indent=4, ensure_ascii=False)
-
     def _get_driver(self):
+        # Imported here so runs that never need a browser don't pay for selenium
+        from selenium import webdriver
+        from selenium.webdriver.chrome.options import Options
+
         options = Options()
         options.add_argument('--headless')
         options.add_argument('--no-sandbox')
@@ -62,94 +144,177 @@ class WebsiteMonitor:
         return webdriver.Chrome(options=options)
 
     def _calculate_checksum(self, content):
-        return hashlib.sha256(content.encode('utf-8')).hexdigest()
+        with metrics.time('hash', bytes=len(content)):
+            return hashlib.sha256(content.encode('utf-8')).hexdigest()
 
     def _has_content_changed(self, url, new_checksum):
-        return url not in self.checksums or self.checksums[url] != new_checksum
+        return self.page_state.get_checksum(url) != new_checksum
 
-    def _extract_text(self, soup):
-        # Remove script and style elements
-        for element in soup(['script', 'style', 'nav', 'footer']):
-            element.decompose()
-        
-        # Get text and clean it
-        text = soup.get_text(separator=' ', strip=True)
-        return ' '.join(text.split())
+    def _render_page(self, driver, url):
+        """Load a page in the browser and return its rendered HTML"""
+        started = time.monotonic()
+        # Render time covers scripts and subresources, not just the server's response
+        with metrics.time('render', url=url), self.politeness.request(url, timed=False) as slot:
+            driver.get(url)
+            slot.response(200)
+        self.readiness.wait(driver, url, started=started)
+        return driver.page_source
 
-    def _process_page(self, driver, url):
+    def _process_page(self, url, html, headers=None, depth=0, parent_url=None):
+        """Check a page's HTML for changes and return (changed, links)"""
         try:
-            driver.get(url)
-            time.sleep(2)  # Wait for dynamic content
+            page = extract_page(html, url, TEXT_SKIP_TAGS, HTML_PARSER_BACKEND)
+            links, pdf_links = self._get_links(page)
             
-            # Scroll to load dynamic content
-            last_height = driver.execute_script("return document.body.scrollHeight")
-            while True:
-                driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
-                time.sleep(2)
-                new_height = driver.execute_script("return document.body.scrollHeight")
-                if new_height == last_height:
-                    break
-                last_height = new_height
-            
-            soup = BeautifulSoup(driver.page_source, 'html.parser')
-            text_content = self._extract_text(soup)
+            # PDFs download in the background, off the crawl's critical path
+            for pdf_link in pdf_links:
+                self.pdf_downloader.submit(pdf_link)
+            title = page.title or url
+            # Collapse all whitespace, non-breaking spaces included, as this monitor always has
+            text_content = ' '.join(page.text.split())
             new_checksum = self._calculate_checksum(text_content)
             
             # Check for changes
-            if self._has_content_changed(url, new_checksum):
+            changed = self._has_content_changed(url, new_checksum)
+            content_ref = None
+            if changed:
                 self.logger.info(f"Content changed: {url}")
-                self.checksums[url] = new_checksum
-                self.content[url] = {
+                content_ref = self.writer.write({
+                    'url': url,
+                    'parent_url': parent_url,
+                    'depth': depth,
                     'content': text_content,
+                    'simhash': format_fingerprint(simhash(text_content)),
                     'last_updated': datetime.now().isoformat(),
-                    'title': soup.title.string if soup.title else url
-                }
-                return True
+                    'title': title
+                })
             
-            return False
+            self.page_state.record_check(url, new_checksum, headers or {},
+                                         links=links, content_ref=content_ref)
+            if self.scheduler is not None:
+                self.scheduler.record(url, changed)
+            return changed, links
             
         except Exception as e:
             self.logger.error(f"Error processing {url}: {e}")
-            return False
+            return False, []
+
+    def _get_links(self, page):
+        """Return (same-domain page links, PDF links)"""
+        links = [link for link in page.links
+                 if link not in page.pdf_links and urlparse(link).netloc == self.domain]
+        return links, page.pdf_links
 
-    def _get_links(self, driver):
-        elements = driver.find_elements(By.TAG_NAME, "a")
-        links = []
-        for element in elements:
-            try:
-                href = element.get_attribute('href')
-                if href and urlparse(href).netloc == self.domain:
-                    links.append(href)
-            except:
+    def _fetch_batch(self, urls):
+        """Fetch a batch statically, rendering only the pages that need a browser
+
+        Returns the rendered/static HTML by URL plus the raw fetch results,
+        which carry 304s and response validators.
+        """
+        pages = {}
+        render_urls = []
+        results = self.fetcher.fetch_many(urls)
+        for url, result in results.items():
+            if result.not_modified:
                 continue
-        return list(set(links))
+            if result.needs_render:
+                render_urls.append(url)
+            elif result.ok:
+                pages[url] = result.html
+            elif result.status:
+                self.logger.warning(f"Skipping {url}: HTTP {result.status}")
+        
+        if render_urls:
+            self.logger.info(f"Rendering {len(render_urls)} pages with browser")
+            pages.update(self.driver_pool.render_all(render_urls, self._render_page))
+        return pages, results
 
-    def check_for_updates(self):
+    def has_due_pages(self):
+        """Whether a due-only check has anything to do"""
+        if self.scheduler is None:
+            return False
+        return os.path.exists(self.frontier_file) or bool(self.scheduler.due_urls(limit=1))
+
+    def _create_frontier(self, due_only=False):
+        """Resume an interrupted crawl, or plan a full, incremental or due-only one"""
+        seeds = None
+        if not os.path.exists(self.frontier_file):
+            scheduled = self.scheduler.due_urls() if self.scheduler is not None else None
+            if due_only:
+                seeds = scheduled or []
+            elif self.planner is not None:
+                seeds = self.planner.plan(set(self.page_state.current_urls()), scheduled)
+        
+        frontier = CrawlFrontier(
+            self.start_url,
+            max_pages=self.max_pages,
+            max_depth=self.max_depth,
+            allowed_domain=self.domain,
+            checkpoint_path=self.frontier_file,
+            checkpoint_every=CRAWL_CHECKPOINT_EVERY,
+            seeds=seeds
+        )
+        if not frontier.resumed:
+            frontier.meta['full_crawl'] = seeds is None
+            frontier.meta['due_only'] = due_only
+        if not frontier.meta.get('full_crawl', True):
+            # Sitemaps already list every page, so don't follow links
+            frontier.max_depth = 0
+        return frontier
+
+    def check_for_updates(self, due_only=False):
+        """Check the site for changes; ``due_only`` checks just the pages the recrawl scheduler has due"""
         self.logger.info("Starting website check...")
-        driver = self._get_driver()
-        changes_detected = False
         self.visited_urls.clear()
+        frontier = self._create_frontier(due_only)
+        changes_detected = frontier.meta.get('changes_detected', False)
+        if 'run_id' not in frontier.meta:
+            frontier.meta['run_id'] = new_run_id()
+        
+        # Changed pages are streamed to disk as they are found
+        self.run_id = frontier.meta['run_id']
+        self.writer = JsonlCrawlWriter(self.content_dir, run_id=self.run_id, prefix='content')
         
         try:
-            queue = [self.start_url]
-            while queue:
-                url = queue.pop(0)
-                if url in self.visited_urls:
-                    continue
-                    
-                self.visited_urls.add(url)
-                self.logger.info(f"Checking: {url}")
+            while frontier:
+                batch = frontier.pop_batch(self.fetch_batch_size)
+                depths = {url: depth for url, depth, _ in batch}
+                parents = {url: parent for url, _, parent in batch}
+                
+                self.logger.info(f"Checking {len(batch)} pages")
+                pages, results = self._fetch_batch(list(depths))
                 
-                if self._process_page(driver, url):
-                    changes_detected = True
+                for url, depth in depths.items():
+                    self.visited_urls.add(url)
+                    result = results[url]
+                    if result.not_modified:
+                        # Unchanged since last visit; follow the links we saw then
+                        self.page_state.touch(url)
+                        if self.scheduler is not None:
+                            self.scheduler.record(url, False)
+                        frontier.add_links(self.page_state.get_links(url), depth + 1, parent=url)
+                    elif url in pages:
+                        changed, links = self._process_page(url, pages[url], result.headers,
+                                                            depth, parents[url])
+                        if changed:
+                            changes_detected = True
+                        
+                        # Add new links to the frontier
+                        frontier.add_links(links, depth + 1, parent=url)
+                    elif result.status and not result.ok:
+                        self.page_state.mark_status(url, result.status)
+                    frontier.done(url)
                 
-                # Add new links to queue
-                links = self._get_links(driver)
-                queue.extend([link for link in links if link not in self.visited_urls])
+                # Page state is committed per batch, before the frontier moves on
+                self.page_state.commit()
+                if frontier.checkpoint_due:
+                    frontier.meta['changes_detected'] = changes_detected
+                    frontier.checkpoint()
                 
-            if changes_detected:
-                self._save_json(self.checksums, self.checksum_file)
-                self._save_json(self.content, self.content_file)
+            frontier.clear_checkpoint()
+            # Due-only checks skip the sitemaps, so they don't move the planner's last check
+            if self.planner is not None and not frontier.meta.get('due_only'):
+                self.planner.record_run(full_crawl=frontier.meta.get('full_crawl', True))
                 
             self.logger.info("Website check completed")
             return changes_detected
@@ -158,8 +323,20 @@ class WebsiteMonitor:
             self.logger.error(f"Error during website check: {e}")
             return False
         finally:
-            driver.quit()
+            self.writer.close()
+            self.fetcher.close()
+            self.driver_pool.close()
+            self.pdf_downloader.wait()
 
     def get_changed_content(self):
-        """Returns the latest content that has changed"""
-        return self.content
\ No newline at end of file
+        """Returns the content that changed during the last check"""
+        if self.run_id is None:
+            return {}
+        return {
+            record['url']: record
+            for record in iter_crawl_records(self.content_dir, run_id=self.run_id, prefix='content')
+        }
+
+    def get_current_urls(self):
+        """Returns every URL known to exist on the site"""
+        return self.page_state.current_urls()
@@ -0,0 +1,78 @@
+"""Micro-benchmark: single-pass extraction vs. the BeautifulSoup multi-pass code
+
+Run from the repository root:
+
+    python -m benchmarks.bench_html_extract --repeat 50
+"""
+import os
+import glob
+import time
+from urllib.parse import urljoin
+
+import click
+from bs4 import BeautifulSoup
+
+from src.scraper.html_extract import extract_page, is_pdf_link, lxml_available
+
+FIXTURE_DIR = os.path.join(os.path.dirname(__file__), 'fixtures')
+BASE_URL = 'https://example.org/section/page/'
+NEW_MONITOR_SKIP_TAGS = frozenset({'script', 'style', 'nav', 'footer'})
+
+
+def legacy_extract(html: str, base_url: str):
+    """The previous NEW-monitor path: html.parser, decompose, get_text, find_all"""
+    soup = BeautifulSoup(html, 'html.parser')
+    links = [urljoin(base_url, a['href']) for a in soup.find_all('a', href=True)]
+    title = soup.title.string if soup.title else None
+    for element in soup(['script', 'style', 'nav', 'footer']):
+        element.decompose()
+    text = ' '.join(soup.get_text(separator=' ', strip=True).split())
+    return title, text, links, [link for link in links if is_pdf_link(link)]
+
+
+def time_per_page(extract, pages, repeat: int) -> float:
+    started = time.perf_counter()
+    for _ in range(repeat):
+        for html in pages:
+            extract(html)
+    return (time.perf_counter() - started) * 1000 / (repeat * len(pages))
+
+
+@click.command()
+@click.option('--repeat', default=20, help='Passes over the fixture pages per variant')
+@click.option('--fixtures', default=FIXTURE_DIR, help='Directory of saved .html pages')
+def main(repeat: int, fixtures: str):
+    paths = sorted(glob.glob(os.path.join(fixtures, '*.html')))
+    pages = []
+    for path in paths:
+        with open(path, 'r', encoding='utf-8') as f:
+            pages.append(f.read())
+    click.echo(f"{len(pages)} fixture pages, {sum(map(len, pages)) // 1024} KiB, {repeat} passes")
+
+    variants = {'bs4 html.parser (current)': lambda html: legacy_extract(html, BASE_URL)}
+    backends = ['stdlib'] + (['lxml'] if lxml_available() else [])
+    for backend in backends:
+        variants[f"extract_page {backend}"] = (
+            lambda html, backend=backend: extract_page(html, BASE_URL, NEW_MONITOR_SKIP_TAGS, backend)
+        )
+
+    baseline = None
+    for name, extract in variants.items():
+        ms = time_per_page(extract, pages, repeat)
+        baseline = baseline or ms
+        click.echo(f"  {name:<28} {ms:8.2f} ms/page  {baseline / ms:5.1f}x")
+
+    # Parity check against the current output
+    for path, html in zip(paths, pages):
+        title, text, links, pdf_links = legacy_extract(html, BASE_URL)
+        for backend in backends:
+            result = extract_page(html, BASE_URL, NEW_MONITOR_SKIP_TAGS, backend)
+            # The NEW monitor collapses whitespace in the extracted text, as the old path did
+            same = (' '.join(result.text.split()) == text, sorted(result.links) == sorted(set(links)),
+                    sorted(result.pdf_links) == sorted(set(pdf_links)))
+            if not all(same):
+                click.echo(f"  mismatch in {os.path.basename(path)} ({backend}): text/links/pdfs = {same}")
+
+
+if __name__ == '__main__':
+    main()
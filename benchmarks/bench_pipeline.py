@@ -0,0 +1,306 @@
+"""End-to-end pipeline benchmark against a synthetic site on localhost
+
+Crawls a generated site with the static fetch tier and downloads its PDFs,
+then stores every page and PDF through ``TextProcessingPipeline`` with a
+deterministic stub model and an in-process Redis, so diffing, chunking,
+embedding, near-duplicate detection and versioning all run as in
+production. A second pass stores the same pages again to time the
+unchanged path. Store latencies are per crawl batch; the pipeline's own
+chunk, embed and redis_write timings are in the metrics. Nothing leaves
+the machine, so runs are reproducible and can be compared. Run from the
+repository root:
+
+    python -m benchmarks.bench_pipeline --pages 2000 --output bench-baseline.json
+    python -m benchmarks.bench_pipeline --pages 2000 --compare bench-baseline.json
+"""
+import os
+import sys
+import json
+import time
+import logging
+import platform
+import resource
+import tempfile
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, List, Optional
+from urllib.parse import urlsplit
+
+import click
+
+from benchmarks.stubs import StubModel, in_process_redis
+from benchmarks.synthetic_site import SyntheticSite
+from src.config.settings import (
+    FETCH_CONCURRENCY, FETCH_PER_HOST_CONCURRENCY, FETCH_TIMEOUT, PDF_DOWNLOAD_WORKERS,
+    ROBOTS_CACHE_HOURS, HOST_INITIAL_RATE, HOST_MAX_RATE, HOST_MAX_RETRIES
+)
+from src.data_processing.text_processor import TextProcessingPipeline
+from src.monitoring.metrics import metrics
+from src.scraper.fetcher import StaticFetcher
+from src.scraper.frontier import CrawlFrontier
+from src.scraper.html_extract import extract_page, is_pdf_link
+from src.scraper.pdf_downloader import PDFDownloader
+from src.scraper.politeness import Politeness, RobotsCache
+
+TEXT_SKIP_TAGS = frozenset({'script', 'style', 'nav', 'footer'})
+PIPELINE_STAGES = ('chunk', 'embed', 'redis_write')
+
+
+def peak_rss_mb() -> float:
+    """Peak resident set size of this process so far"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KiB, macOS bytes
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def percentile(values: List[float], q: float) -> float:
+    """Nearest-rank percentile of already sorted values"""
+    if not values:
+        return 0.0
+    return values[min(max(int(round(q * len(values) + 0.5)) - 1, 0), len(values) - 1)]
+
+
+class StageStats:
+    """Per-item latencies, items, bytes and wall time of one benchmark stage"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.latencies: List[float] = []
+        self.items = 0
+        self.bytes = 0
+        self.wall = 0.0
+        self.rss_mb = 0.0
+
+    def add(self, seconds: Optional[float], items: int = 1, bytes: int = 0):
+        if seconds is not None:
+            self.latencies.append(seconds)
+        self.items += items
+        self.bytes += bytes
+
+    @contextmanager
+    def timed(self):
+        """Count a block towards the stage's wall time"""
+        started = time.perf_counter()
+        try:
+            yield self
+        finally:
+            self.wall += time.perf_counter() - started
+            self.rss_mb = peak_rss_mb()
+
+    def result(self) -> Dict:
+        latencies = sorted(self.latencies)
+        return {
+            'items': self.items,
+            'bytes': self.bytes,
+            'wall_seconds': round(self.wall, 4),
+            'items_per_second': round(self.items / self.wall, 2) if self.wall else None,
+            'mib_per_second': round(self.bytes / 1024 / 1024 / self.wall, 2) if self.wall else None,
+            'latency_ms': {
+                'count': len(latencies),
+                'p50': round(percentile(latencies, 0.5) * 1000, 3),
+                'p95': round(percentile(latencies, 0.95) * 1000, 3),
+                'p99': round(percentile(latencies, 0.99) * 1000, 3),
+                'max': round(latencies[-1] * 1000, 3) if latencies else 0.0
+            },
+            'peak_rss_mb': round(self.rss_mb, 1)
+        }
+
+
+def crawl(base_url: str, max_pages: int, batch_size: int, backend: str, pdf_dir: str,
+          politeness: Optional[Politeness], stages: Dict[str, StageStats], totals: Dict) -> List[Dict]:
+    """Crawl the site, extracting every page and queueing its PDFs; returns crawl records"""
+    fetcher = StaticFetcher(FETCH_CONCURRENCY, FETCH_PER_HOST_CONCURRENCY, FETCH_TIMEOUT,
+                            politeness=politeness, max_retries=HOST_MAX_RETRIES)
+    downloader = PDFDownloader(pdf_dir, PDF_DOWNLOAD_WORKERS, politeness=politeness)
+    frontier = CrawlFrontier(base_url, max_pages=max_pages, allowed_domain=urlsplit(base_url).hostname)
+    records = []
+    submitted = {}
+
+    def downloaded(url: str):
+        return lambda future: stages['pdf_download'].add(time.perf_counter() - submitted[url])
+
+    try:
+        while frontier:
+            batch = frontier.pop_batch(batch_size)
+            with stages['fetch'].timed():
+                results = fetcher.fetch_many(url for url, _, _ in batch)
+
+            for url, depth, parent_url in batch:
+                result = results[url]
+                frontier.done(url)
+                stages['fetch'].add(result.elapsed, bytes=len(result.html))
+                if not result.ok:
+                    totals['errors'] += 1
+                    continue
+                if result.needs_render:
+                    # No browser here; these would go to the Selenium tier
+                    totals['needs_render'] += 1
+                    continue
+
+                with stages['extract'].timed():
+                    started = time.perf_counter()
+                    page = extract_page(result.html, result.final_url, TEXT_SKIP_TAGS, backend)
+                    stages['extract'].add(time.perf_counter() - started, bytes=len(result.html))
+                records.append({'url': url, 'content': page.text, 'depth': depth,
+                                'parent_url': parent_url, 'pdf_links': page.pdf_links})
+                frontier.add_links([link for link in page.links if not is_pdf_link(link)], depth + 1, url)
+                for pdf_url in page.pdf_links:
+                    if pdf_url not in submitted:
+                        submitted[pdf_url] = time.perf_counter()
+                        downloader.submit(pdf_url).add_done_callback(downloaded(pdf_url))
+
+        downloads = downloader.wait()
+        # Downloads overlap the crawl; their wall time runs from the first submit
+        if submitted:
+            stages['pdf_download'].wall = time.perf_counter() - min(submitted.values())
+        stages['pdf_download'].rss_mb = peak_rss_mb()
+        stages['pdf_download'].bytes = sum(
+            os.path.getsize(result['path']) for result in downloads.values() if result['path']
+        )
+        totals['pages'] = frontier.completed
+    finally:
+        downloader.close()
+        fetcher.close()
+    return records
+
+
+def store_records(pipeline: TextProcessingPipeline, records: List[Dict], batch_size: int,
+                  stage: StageStats) -> int:
+    """Store crawl records through the pipeline one crawl batch at a time; returns pages stored"""
+    stored = 0
+    with stage.timed():
+        for start in range(0, len(records), batch_size):
+            batch = records[start:start + batch_size]
+            started = time.perf_counter()
+            stored += pipeline.process_scraped_data(batch)
+            stage.add(time.perf_counter() - started, items=len(batch),
+                      bytes=sum(len(record['content']) for record in batch))
+    return stored
+
+
+def run_pipeline(site: SyntheticSite, base_url: str, batch_size: int, backend: str,
+                 polite: bool, workdir: str) -> Dict:
+    stages = {name: StageStats(name) for name in
+              ('fetch', 'extract', 'pdf_download', 'store', 'store_pdfs', 'store_unchanged')}
+    totals = {'pages': 0, 'needs_render': 0, 'errors': 0}
+    politeness = None
+    if polite:
+        politeness = Politeness(FETCH_PER_HOST_CONCURRENCY, HOST_INITIAL_RATE, HOST_MAX_RATE,
+                                True, RobotsCache(ttl_hours=ROBOTS_CACHE_HOURS))
+
+    started = time.perf_counter()
+    pdf_dir = os.path.join(workdir, 'pdfs')
+    records = crawl(base_url, site.pages + 10, batch_size, backend, pdf_dir, politeness, stages, totals)
+
+    redis_text, redis_binary = in_process_redis()
+    pipeline = TextProcessingPipeline(model_name='stub-model', redis_text=redis_text,
+                                      redis_binary=redis_binary, model=StubModel())
+    try:
+        pages_stored = store_records(pipeline, records, batch_size, stages['store'])
+        with stages['store_pdfs'].timed():
+            pdfs_stored = pipeline.process_all_pdfs(pdf_dir, os.path.join(workdir, 'pdf_text_cache.db'))
+            stages['store_pdfs'].add(None, items=pdfs_stored, bytes=stages['pdf_download'].bytes)
+        # Nothing changed, so this pass only diffs the pages against the current version
+        store_records(pipeline, records, batch_size, stages['store_unchanged'])
+        cache = pipeline.embedder.cache
+        totals.update({
+            'documents': pages_stored + pdfs_stored,
+            'aliases': redis_text.hlen('simhash:aliases'),
+            'chunks': sum(redis_binary.hlen(key) for key in redis_binary.scan_iter(match='embedding:*')),
+            'pdfs': pdfs_stored,
+            'requests_served': site.requests,
+            'redis_keys': redis_binary.dbsize(),
+            'redis_round_trips': metrics.snapshot()['stages'].get('redis_write', {}).get('count', 0),
+            'embed_cache_hit_rate': round(cache.stats()['hit_rate'], 4) if cache is not None else None,
+            'wall_seconds': round(time.perf_counter() - started, 3)
+        })
+    finally:
+        pipeline.close()
+        pipeline.version_manager.close()
+    return {'stages': {name: stage.result() for name, stage in stages.items()}, 'totals': totals}
+
+
+def compare(baseline: Dict, current: Dict):
+    click.echo(f"\nAgainst {baseline.get('started_at', 'baseline')}:")
+    for name, stats in current['stages'].items():
+        before = baseline.get('stages', {}).get(name)
+        if not before or not before.get('items_per_second') or not stats['items_per_second']:
+            continue
+        click.echo(
+            f"  {name:<15} {before['items_per_second']:>10.1f} -> {stats['items_per_second']:>10.1f} items/s "
+            f"({stats['items_per_second'] / before['items_per_second']:5.2f}x)  p95 "
+            f"{before['latency_ms']['p95']:.1f} -> {stats['latency_ms']['p95']:.1f} ms"
+        )
+    click.echo(f"  {'peak RSS':<15} {baseline.get('peak_rss_mb', 0):>10.1f} -> {current['peak_rss_mb']:>10.1f} MiB")
+
+
+@click.command()
+@click.option('--pages', default=2000, help='Article pages on the synthetic site')
+@click.option('--fanout', default=8, help='Links from each article to other articles')
+@click.option('--words', default=600, help='Words of body text per article')
+@click.option('--pdf-ratio', default=0.05, help='Share of articles linking a PDF')
+@click.option('--js-ratio', default=0.05, help='Share of articles that are JavaScript shells')
+@click.option('--latency-ms', default=0.0, help='Server-side delay added to every response')
+@click.option('--seed', default=42, help='Seed for the generated content and link graph')
+@click.option('--batch-size', default=64, help='URLs fetched concurrently per crawl batch')
+@click.option('--backend', default='auto', type=click.Choice(['auto', 'lxml', 'stdlib']), help='HTML parser')
+@click.option('--polite', is_flag=True, help='Apply robots.txt and the adaptive per-host rate limits')
+@click.option('--output', default=None, help='Write the results as JSON to this path')
+@click.option('--compare', 'baseline_path', default=None, help='Results JSON of an earlier run to compare against')
+@click.option('--verbose', is_flag=True, help='Show pipeline log output')
+def main(pages: int, fanout: int, words: int, pdf_ratio: float, js_ratio: float, latency_ms: float,
+         seed: int, batch_size: int, backend: str, polite: bool, output: Optional[str],
+         baseline_path: Optional[str], verbose: bool):
+    logging.basicConfig(level=logging.INFO if verbose else logging.WARNING,
+                        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    site = SyntheticSite(pages, fanout, words, pdf_ratio, js_ratio, latency_ms, seed)
+    config = {'pages': pages, 'fanout': fanout, 'words': words, 'pdf_ratio': pdf_ratio, 'js_ratio': js_ratio,
+              'latency_ms': latency_ms, 'seed': seed, 'batch_size': batch_size, 'backend': backend,
+              'polite': polite}
+    started_at = datetime.now().isoformat()
+
+    with site.serve() as base_url, tempfile.TemporaryDirectory(prefix='bench-pipeline-') as workdir:
+        click.echo(f"Serving {pages} synthetic pages at {base_url}")
+        results = run_pipeline(site, base_url, batch_size, backend, polite, workdir)
+
+    results = {
+        'benchmark': 'pipeline',
+        'started_at': started_at,
+        'config': config,
+        'environment': {'python': platform.python_version(), 'platform': platform.platform(),
+                        'cpus': os.cpu_count()},
+        **results,
+        'peak_rss_mb': round(peak_rss_mb(), 1),
+        'metrics': metrics.snapshot()
+    }
+
+    totals = results['totals']
+    click.echo(
+        f"{totals['pages']} pages ({totals['needs_render']} need rendering, {totals['errors']} errors), "
+        f"{totals['pdfs']} PDFs, {totals['aliases']} near-duplicates, {totals['chunks']} chunks in {totals['wall_seconds']:.1f}s, "
+        f"peak RSS {results['peak_rss_mb']:.0f} MiB"
+    )
+    for name, stats in results['stages'].items():
+        rate = f"{stats['items_per_second']:>10.1f}/s" if stats['items_per_second'] else f"{'-':>12}"
+        latency = stats['latency_ms']
+        percentiles = '  '.join(f"{q} {latency[q]:>8.2f}ms" for q in ('p50', 'p95', 'p99')) if latency['count'] else ''
+        click.echo(f"  {name:<15} {stats['items']:>7} items {stats['wall_seconds']:>8.2f}s {rate}  {percentiles}")
+    inside = results['metrics']['stages']
+    click.echo('  within store: ' + ', '.join(
+        f"{name} {inside[name]['seconds_total']:.2f}s" for name in PIPELINE_STAGES if name in inside
+    ))
+
+    if output:
+        directory = os.path.dirname(output)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+        click.echo(f"Results written to {output}")
+    if baseline_path:
+        with open(baseline_path, 'r', encoding='utf-8') as f:
+            compare(json.load(f), results)
+
+
+if __name__ == '__main__':
+    main()
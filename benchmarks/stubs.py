@@ -0,0 +1,50 @@
+"""Offline stand-ins for the embedding model and Redis"""
+import hashlib
+from typing import List
+
+import numpy as np
+
+
+class StubModel:
+    """Deterministic SentenceTransformer stand-in
+
+    Vectors are derived from a SHAKE-256 digest of each text, so identical
+    chunks always get identical unit vectors and runs are comparable
+    without downloading or running a model. Only the parts of the
+    SentenceTransformer API the pipeline uses are provided.
+    """
+
+    max_seq_length = 256
+    tokenizer = None
+
+    def __init__(self, dimensions: int = 384):
+        self.dimensions = dimensions
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return self.dimensions
+
+    def encode(self, sentences: List[str], batch_size: int = 32, convert_to_numpy: bool = True,
+               show_progress_bar: bool = False, **kwargs) -> np.ndarray:
+        if isinstance(sentences, str):
+            return self.encode([sentences])[0]
+        vectors = np.empty((len(sentences), self.dimensions), dtype=np.float32)
+        for row, text in enumerate(sentences):
+            digest = hashlib.shake_256(text.encode('utf-8')).digest(self.dimensions)
+            vectors[row] = np.frombuffer(digest, dtype=np.uint8).astype(np.float32) - 127.5
+        vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors
+
+
+def in_process_redis():
+    """(text, binary) Redis clients sharing one in-process fakeredis server
+
+    They stand in for ``RedisKeyManager``'s clients: the first decodes
+    responses, the second returns bytes.
+    """
+    try:
+        import fakeredis
+    except ImportError as e:
+        raise ImportError("The benchmarks need fakeredis: pip install -r benchmarks/requirements.txt") from e
+    server = fakeredis.FakeServer()
+    return (fakeredis.FakeRedis(server=server, decode_responses=True),
+            fakeredis.FakeRedis(server=server, decode_responses=False))
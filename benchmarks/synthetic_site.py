@@ -0,0 +1,156 @@
+"""Deterministic synthetic website served from a local aiohttp server
+
+Pages are generated on request from their index and a seed, so a site of
+any size costs no disk space and every run sees byte-identical content.
+"""
+import random
+import asyncio
+import threading
+from contextlib import contextmanager
+from typing import List, Optional
+
+from aiohttp import web
+
+VOCABULARY = (
+    'health population research africa policy evidence data survey urban rural '
+    'maternal child nutrition education gender youth climate water sanitation '
+    'fertility mortality programme analysis community women systems capacity '
+    'development funding impact study findings report cohort district county '
+    'services access quality care wellbeing adolescent migration poverty'
+).split()
+
+
+def make_pdf(text: str) -> bytes:
+    """A minimal single-page PDF showing ``text``, with a valid xref table"""
+    stream = f"BT /F1 12 Tf 72 720 Td ({text}) Tj ET".encode('latin-1')
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        b"<< /Type /Pages /Kids [3 0 R] /Count 1 >>",
+        b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] /Contents 4 0 R "
+        b"/Resources << /Font << /F1 5 0 R >> >> >>",
+        b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream),
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    body = b"%PDF-1.4\n"
+    offsets = []
+    for number, obj in enumerate(objects, start=1):
+        offsets.append(len(body))
+        body += b"%d 0 obj\n%s\nendobj\n" % (number, obj)
+    xref = len(body)
+    body += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    body += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    body += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    return body
+
+
+class SyntheticSite:
+    """A site of ``pages`` article pages linked with ``fanout`` links each
+
+    Every ``1 / pdf_ratio``-th page links a PDF, and a ``js_ratio`` share
+    of pages are JavaScript app shells whose content comes from a lazy
+    JSON endpoint, which the static fetch tier should flag for rendering.
+    ``latency_ms`` adds a server-side delay to every response.
+    """
+
+    def __init__(self, pages: int = 2000, fanout: int = 8, words: int = 600, pdf_ratio: float = 0.05,
+                 js_ratio: float = 0.05, latency_ms: float = 0.0, seed: int = 42):
+        self.pages = pages
+        self.fanout = fanout
+        self.words = words
+        self.pdf_every = round(1 / pdf_ratio) if pdf_ratio > 0 else 0
+        self.js_every = round(1 / js_ratio) if js_ratio > 0 else 0
+        self.latency = latency_ms / 1000
+        self.seed = seed
+        self.base_url: Optional[str] = None
+        self.requests = 0
+
+    def is_js_page(self, index: int) -> bool:
+        return bool(self.js_every) and index % self.js_every == self.js_every - 1
+
+    def has_pdf(self, index: int) -> bool:
+        return bool(self.pdf_every) and index % self.pdf_every == 0
+
+    def links(self, index: int) -> List[int]:
+        rng = random.Random(self.seed * 7919 + index)
+        # Always link forward so every page is reachable from the home page
+        targets = [(index + 1) % self.pages] + [rng.randrange(self.pages) for _ in range(self.fanout - 1)]
+        return list(dict.fromkeys(targets))
+
+    def paragraphs(self, index: int) -> List[str]:
+        rng = random.Random(self.seed * 104729 + index)
+        words = [rng.choice(VOCABULARY) for _ in range(self.words)]
+        paragraphs = []
+        for start in range(0, len(words), 60):
+            sentences = [' '.join(words[i:i + 12]).capitalize() + '.' for i in range(start, min(start + 60, len(words)), 12)]
+            paragraphs.append(' '.join(sentences))
+        return paragraphs
+
+    def page_html(self, index: int) -> str:
+        nav = ''.join(f'<li><a href="/section/{n}">Section {n}</a></li>' for n in range(5))
+        links = ''.join(f'<li><a href="/page/{target}">Related article {target}</a></li>'
+                        for target in self.links(index))
+        if self.is_js_page(index):
+            main = (f'<div id="app"></div><noscript>This site requires JavaScript</noscript>'
+                    f'<script>fetch("/lazy/{index}.json").then(r => r.json()).then(render)</script>')
+        else:
+            body = ''.join(f'<p>{paragraph}</p>' for paragraph in self.paragraphs(index))
+            pdf = f'<p><a href="/files/report-{index}.pdf">Download the report</a></p>' if self.has_pdf(index) else ''
+            main = f'<article><h1>Article {index}</h1>{body}{pdf}<ul>{links}</ul></article>'
+        return (
+            f'<!DOCTYPE html><html><head><title>Article {index} | Synthetic Site</title>'
+            f'<style>body {{ font-family: sans-serif; }}</style><script>window.dataLayer = [];</script></head>'
+            f'<body><nav><ul>{nav}</ul></nav><main>{main}</main>'
+            f'<footer>Copyright Synthetic Site. <a href="/">Home</a></footer></body></html>'
+        )
+
+    async def _respond(self, request: web.Request) -> web.Response:
+        self.requests += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        path = request.path
+        if path == '/robots.txt':
+            return web.Response(text=f"User-agent: *\nDisallow: /private/\nSitemap: {self.base_url}/sitemap.xml\n")
+        if path == '/sitemap.xml':
+            urls = ''.join(f'<url><loc>{self.base_url}/page/{i}</loc></url>' for i in range(self.pages))
+            return web.Response(
+                text=f'<?xml version="1.0"?><urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">{urls}</urlset>',
+                content_type='application/xml'
+            )
+        if path in ('/', '/index.html'):
+            return web.Response(text=self.page_html(0), content_type='text/html')
+        if path.startswith('/page/') and path[6:].isdigit() and int(path[6:]) < self.pages:
+            return web.Response(text=self.page_html(int(path[6:])), content_type='text/html')
+        if path.startswith('/section/'):
+            links = ''.join(f'<a href="/page/{i}">Article {i}</a> ' for i in range(0, self.pages, max(self.pages // 50, 1)))
+            return web.Response(text=f'<html><head><title>Section</title></head><body>{links}</body></html>',
+                                content_type='text/html')
+        if path.startswith('/lazy/'):
+            index = int(path[6:].split('.')[0])
+            return web.json_response({'paragraphs': self.paragraphs(index)})
+        if path.startswith('/files/report-'):
+            index = path[len('/files/report-'):-len('.pdf')]
+            return web.Response(body=make_pdf(f"Synthetic report {index}"), content_type='application/pdf')
+        return web.Response(status=404, text='Not found')
+
+    @contextmanager
+    def serve(self, host: str = '127.0.0.1', port: int = 0):
+        """Serve the site from a background thread; yields the base URL"""
+        loop = asyncio.new_event_loop()
+        app = web.Application()
+        app.router.add_route('GET', '/{tail:.*}', self._respond)
+        app.router.add_route('HEAD', '/{tail:.*}', self._respond)
+        runner = web.AppRunner(app, access_log=None)
+        loop.run_until_complete(runner.setup())
+        site = web.TCPSite(runner, host, port)
+        loop.run_until_complete(site.start())
+        bound_port = runner.addresses[0][1]
+        self.base_url = f"http://{host}:{bound_port}"
+        thread = threading.Thread(target=loop.run_forever, daemon=True)
+        thread.start()
+        try:
+            yield self.base_url
+        finally:
+            loop.call_soon_threadsafe(loop.stop)
+            thread.join()
+            loop.run_until_complete(runner.cleanup())
+            loop.close()
@@ -0,0 +1,22 @@
+import logging
+import click
+from src.config.settings import (
+    MODEL_NAME, EMBED_WORKER_ADDRESS, EMBED_WORKER_MAX_BATCH, EMBED_WORKER_MAX_WAIT_MS, EMBED_WORKER_ALLOW_REMOTE
+)
+from src.data_processing.embedding_worker import EmbeddingWorker
+
+@click.command()
+@click.option('--model', default=MODEL_NAME, help='Embedding model to keep loaded')
+@click.option('--address', default=EMBED_WORKER_ADDRESS, help='Unix socket path or host:port to listen on')
+@click.option('--max-batch', default=EMBED_WORKER_MAX_BATCH, help='Most texts coalesced into one encode call')
+@click.option('--max-wait-ms', default=EMBED_WORKER_MAX_WAIT_MS, help='How long to wait for requests to coalesce')
+@click.option('--allow-remote', is_flag=True, default=EMBED_WORKER_ALLOW_REMOTE,
+              help='Listen on a non-loopback host:port (needs EMBED_WORKER_AUTHKEY)')
+def main(model: str, address: str, max_batch: int, max_wait_ms: float, allow_remote: bool):
+    """Keep the embedding model loaded and serve encode requests to the other scripts"""
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    EmbeddingWorker(model, address, max_batch=max_batch, max_wait_ms=max_wait_ms,
+                    allow_remote=allow_remote).serve_forever()
+
+if __name__ == "__main__":
+    main()
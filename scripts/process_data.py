@@ -1,11 +1,14 @@
 import click
-from src.config.settings import REDIS_HOST, REDIS_PORT, REDIS_DB, MODEL_NAME
+from src.config.settings import REDIS_HOST, REDIS_PORT, REDIS_DB, MODEL_NAME, METRICS_FILE
+from src.monitoring.metrics import metrics
 from src.data_processing.text_processor import TextProcessingPipeline
+from src.storage.crawl_output import iter_crawl_records
 
 @click.command()
 @click.option('--pdf-folder', default='data/pdf_files', help='PDF files folder')
-@click.option('--scraped-data', default='data/scraped_data/scraped_data.json', help='Scraped data JSON file')
-def main(pdf_folder: str, scraped_data: str):
+@click.option('--scraped-data', default='data/scraped_data', help='Crawl output directory, JSONL file or legacy JSON file')
+@click.option('--run-id', default=None, help='Crawl run to process (defaults to the latest)')
+def main(pdf_folder: str, scraped_data: str, run_id: str):
     """Process PDFs and scraped data"""
     pipeline = TextProcessingPipeline(
         redis_host=REDIS_HOST,
@@ -17,10 +20,10 @@ def main(pdf_folder: str, scraped_data: str):
     # Process PDFs
     pipeline.process_all_pdfs(pdf_folder)
     
-    # Process scraped data
-    with open(scraped_data, 'r') as f:
-        data = json.load(f)
-        pipeline.process_scraped_data(data)
+    # Process scraped data, one record at a time
+    pipeline.process_scraped_data(iter_crawl_records(scraped_data, run_id=run_id))
+    pipeline.close()
+    metrics.report(METRICS_FILE)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
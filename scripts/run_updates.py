@@ -1,20 +1,46 @@
 import click
-from src.config.settings import REDIS_HOST, REDIS_PORT, REDIS_DB
+from src.config.settings import REDIS_HOST, REDIS_PORT, REDIS_DB, REDIS_FLUSH_SIZE
 from src.storage.version_manager import DataVersionManager
 from src.data_processing.update_monitor import ContentUpdateMonitor
 
+def stored_texts(client, batch_size: int = REDIS_FLUSH_SIZE):
+    """(content_id, text) for every stored text, fetched with pipelined HGETs"""
+    keys = []
+    for key in client.scan_iter(match='text:*', count=batch_size):
+        keys.append(key)
+        if len(keys) >= batch_size:
+            yield from _fetch_texts(client, keys)
+            keys = []
+    yield from _fetch_texts(client, keys)
+
+def _fetch_texts(client, keys):
+    pipe = client.pipeline(transaction=False)
+    for key in keys:
+        pipe.hget(key, 'text')
+    for key, text in zip(keys, pipe.execute()):
+        if text is not None:
+            yield key[len('text:'):], text
+
 @click.command()
 @click.option('--force', is_flag=True, help='Force update check')
-def main(force: bool):
+@click.option('--full-check', is_flag=True, help='Diff every stored text against the current version')
+def main(force: bool, full_check: bool):
     """Check and process content updates"""
     version_manager = DataVersionManager()
     update_monitor = ContentUpdateMonitor(version_manager)
-    
+
     # Get current version info
     current_version = version_manager.get_current_version()
     if current_version:
         click.echo(f"Current version: {current_version}")
-    
+
+    if full_check:
+        diff = update_monitor.track_content_updates(stored_texts(version_manager.redis), detect_removed=True)
+        click.echo(
+            f"{len(diff.added)} added, {len(diff.changed)} changed, "
+            f"{len(diff.unchanged)} unchanged, {len(diff.removed)} removed"
+        )
+
     # Process any pending updates
     if update_monitor.process_updates() or force:
         click.echo("Updates processed successfully")
@@ -22,4 +48,4 @@ def main(force: bool):
         click.echo("No updates needed")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,45 @@
+import time
+import click
+from src.config.settings import (
+    REDIS_HOST, REDIS_PORT, REDIS_DB, MODEL_NAME,
+    EMBEDDING_BACKEND, EMBEDDING_STORE_DIR, EMBEDDING_STORE_DTYPE
+)
+from src.storage.redis_manager import RedisKeyManager
+from src.storage.embedding_store import EmbeddingSegmentStore
+from src.data_processing.search import SemanticSearchIndex
+from src.data_processing.embedding_worker import load_model
+
+@click.command()
+@click.argument('queries', nargs=-1)
+@click.option('-k', '--top-k', default=10, help='Number of chunks to return per query')
+@click.option('--model', default=MODEL_NAME, help='Embedding model used for the stored vectors')
+def main(queries, top_k: int, model: str):
+    """Semantic search over stored chunk embeddings (reads queries from stdin when none are given)"""
+    if EMBEDDING_BACKEND == 'segments':
+        # Searches the memory-mapped segments in place, sharing them with other processes
+        index = EmbeddingSegmentStore(EMBEDDING_STORE_DIR, EMBEDDING_STORE_DTYPE)
+    else:
+        key_manager = RedisKeyManager(REDIS_HOST, REDIS_PORT, REDIS_DB)
+        index = SemanticSearchIndex(key_manager.redis_binary)
+
+    started = time.perf_counter()
+    index.refresh()
+    click.echo(f"Loaded {len(index)} chunks in {time.perf_counter() - started:.2f}s")
+
+    encoder = load_model(model)
+    interactive = not queries
+    queries = queries or iter(lambda: click.prompt('query', default='', show_default=False), '')
+
+    for query in queries:
+        if interactive:
+            index.refresh()
+        vector = encoder.encode(query)
+        started = time.perf_counter()
+        results = index.search(vector, top_k)
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        click.echo(f"\n{query!r}: {len(results)} results in {elapsed_ms:.1f} ms")
+        for key, chunk, score in results:
+            click.echo(f"  {score:.4f}  {key}  chunk_{chunk}")
+
+if __name__ == "__main__":
+    main()
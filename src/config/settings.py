@@ -8,4 +8,109 @@ REDIS_PORT = int(os.getenv('REDIS_PORT', 6379))
 REDIS_DB = int(os.getenv('REDIS_DB', 0))
 WEBSITE_URL = os.getenv('WEBSITE_URL', 'https://aphrc.org')
 CHECK_INTERVAL_HOURS = int(os.getenv('CHECK_INTERVAL_HOURS', 24))
-MODEL_NAME = os.getenv('MODEL_NAME', 'all-MiniLM-L6-v2')
\ No newline at end of file
+MODEL_NAME = os.getenv('MODEL_NAME', 'all-MiniLM-L6-v2')
+
+# Static-first fetch tier
+FETCH_CONCURRENCY = int(os.getenv('FETCH_CONCURRENCY', 32))
+FETCH_PER_HOST_CONCURRENCY = int(os.getenv('FETCH_PER_HOST_CONCURRENCY', 8))
+FETCH_TIMEOUT = float(os.getenv('FETCH_TIMEOUT', 20))
+RENDER_URL_PATTERNS = [p for p in os.getenv('RENDER_URL_PATTERNS', '').split(',') if p]
+STATIC_URL_PATTERNS = [p for p in os.getenv('STATIC_URL_PATTERNS', '').split(',') if p]
+
+# Headless browser pool for JS-dependent pages
+BROWSER_POOL_SIZE = int(os.getenv('BROWSER_POOL_SIZE', 2))
+BROWSER_MAX_PAGES = int(os.getenv('BROWSER_MAX_PAGES', 50))
+BROWSER_PAGE_TIMEOUT = int(os.getenv('BROWSER_PAGE_TIMEOUT', 60))
+
+# Crawl frontier budgets and checkpointing
+MAX_SCRAPED_PAGES = int(os.getenv('MAX_SCRAPED_PAGES', 1000))
+MAX_CRAWL_DEPTH = int(os.getenv('MAX_CRAWL_DEPTH', 4))
+CRAWL_CHECKPOINT_EVERY = int(os.getenv('CRAWL_CHECKPOINT_EVERY', 100))
+
+# Sitemap/feed-driven incremental discovery
+INCREMENTAL_DISCOVERY = os.getenv('INCREMENTAL_DISCOVERY', 'true').lower() == 'true'
+FULL_CRAWL_INTERVAL_DAYS = float(os.getenv('FULL_CRAWL_INTERVAL_DAYS', 7))
+
+# Render readiness for browser-rendered pages
+RENDER_BUDGET_SECONDS = float(os.getenv('RENDER_BUDGET_SECONDS', 10))
+RENDER_QUIET_MS = int(os.getenv('RENDER_QUIET_MS', 500))
+RENDER_PROFILES_FILE = os.getenv('RENDER_PROFILES_FILE')
+
+# PDF downloads
+PDF_DOWNLOAD_WORKERS = int(os.getenv('PDF_DOWNLOAD_WORKERS', 4))
+PDF_MAX_SIZE_MB = float(os.getenv('PDF_MAX_SIZE_MB', 50))
+
+# PDF text extraction
+PDF_TEXT_CACHE = os.getenv('PDF_TEXT_CACHE', 'data/pdf_text_cache.db')
+PDF_EXTRACT_WORKERS = int(os.getenv('PDF_EXTRACT_WORKERS', os.cpu_count() or 1))
+PDF_EXTRACT_TIMEOUT = float(os.getenv('PDF_EXTRACT_TIMEOUT', 120))
+
+# Batched embedding
+EMBED_BATCH_SIZE = int(os.getenv('EMBED_BATCH_SIZE', 64))
+EMBED_PROCESSES = int(os.getenv('EMBED_PROCESSES', 0))
+EMBED_MAX_CHUNKS_PER_PASS = int(os.getenv('EMBED_MAX_CHUNKS_PER_PASS', 4096))
+
+# Resident embedding worker: a Unix socket path or host:port; processes encode
+# through it when it is listening instead of loading the model themselves
+EMBED_WORKER_ADDRESS = os.getenv('EMBED_WORKER_ADDRESS', 'data/embed_worker.sock')
+# Connections carry pickles, so the authkey guards code execution in the worker.
+# Left empty, a Unix socket gets a random key in a 0600 file beside it; TCP
+# addresses need it set, and only loopback is bound unless remote is allowed
+EMBED_WORKER_AUTHKEY = os.getenv('EMBED_WORKER_AUTHKEY', '')
+EMBED_WORKER_ALLOW_REMOTE = os.getenv('EMBED_WORKER_ALLOW_REMOTE', 'false').lower() == 'true'
+EMBED_WORKER_SPAWN = os.getenv('EMBED_WORKER_SPAWN', 'true').lower() == 'true'
+EMBED_WORKER_MAX_BATCH = int(os.getenv('EMBED_WORKER_MAX_BATCH', 4096))
+EMBED_WORKER_MAX_WAIT_MS = float(os.getenv('EMBED_WORKER_MAX_WAIT_MS', 10))
+EMBED_WORKER_START_TIMEOUT = float(os.getenv('EMBED_WORKER_START_TIMEOUT', 300))
+
+# Chunk embedding cache: 'redis', 'memory' or 'none'
+EMBED_CACHE_BACKEND = os.getenv('EMBED_CACHE_BACKEND', 'redis').lower()
+EMBED_CACHE_MAX_ENTRIES = int(os.getenv('EMBED_CACHE_MAX_ENTRIES', 200000))
+
+# Pipelined Redis writes
+REDIS_FLUSH_SIZE = int(os.getenv('REDIS_FLUSH_SIZE', 1000))
+REDIS_ATOMIC_WRITES = os.getenv('REDIS_ATOMIC_WRITES', 'false').lower() == 'true'
+
+# Chunk embedding storage: 'redis' hashes or memory-mapped 'segments' on disk
+EMBEDDING_BACKEND = os.getenv('EMBEDDING_BACKEND', 'redis').lower()
+EMBEDDING_STORE_DIR = os.getenv('EMBEDDING_STORE_DIR', 'data/embeddings')
+EMBEDDING_STORE_DTYPE = os.getenv('EMBEDDING_STORE_DTYPE', 'float16')
+EMBEDDING_COMPACT_SEGMENTS = int(os.getenv('EMBEDDING_COMPACT_SEGMENTS', 8))
+
+# Token-aware chunking; CHUNK_MAX_TOKENS=0 uses the model's max_seq_length
+CHUNK_MAX_TOKENS = int(os.getenv('CHUNK_MAX_TOKENS', 0))
+CHUNK_OVERLAP_TOKENS = int(os.getenv('CHUNK_OVERLAP_TOKENS', 0))
+
+# HTML extraction backend: 'lxml', 'stdlib' or 'auto'
+HTML_PARSER_BACKEND = os.getenv('HTML_PARSER_BACKEND', 'auto')
+
+# Near-duplicate pages: max SimHash Hamming distance to alias a page, 0 disables
+NEAR_DUPLICATE_DISTANCE = int(os.getenv('NEAR_DUPLICATE_DISTANCE', 6))
+
+# Data versions: snapshot every N deltas, keep the newest N versions
+VERSION_SNAPSHOT_EVERY = int(os.getenv('VERSION_SNAPSHOT_EVERY', 10))
+VERSION_RETENTION = int(os.getenv('VERSION_RETENTION', 20))
+VERSION_CACHE_TTL = float(os.getenv('VERSION_CACHE_TTL', 60))
+
+# Bulk change detection: items hashed and looked up per batch, hashing threads
+CHANGE_DIFF_BATCH_SIZE = int(os.getenv('CHANGE_DIFF_BATCH_SIZE', 1000))
+CHANGE_HASH_WORKERS = int(os.getenv('CHANGE_HASH_WORKERS', min(4, os.cpu_count() or 1)))
+
+# Adaptive per-URL recrawl: global check budget and interval bounds
+ADAPTIVE_RECRAWL = os.getenv('ADAPTIVE_RECRAWL', 'true').lower() == 'true'
+RECRAWL_PAGES_PER_HOUR = float(os.getenv('RECRAWL_PAGES_PER_HOUR', 200))
+RECRAWL_MIN_INTERVAL_HOURS = float(os.getenv('RECRAWL_MIN_INTERVAL_HOURS', 1))
+RECRAWL_MAX_INTERVAL_HOURS = float(os.getenv('RECRAWL_MAX_INTERVAL_HOURS', 168))
+RECRAWL_TICK_MINUTES = int(os.getenv('RECRAWL_TICK_MINUTES', 15))
+
+# Per-host politeness: adaptive request rate and concurrency, robots.txt rules
+RESPECT_ROBOTS_TXT = os.getenv('RESPECT_ROBOTS_TXT', 'true').lower() == 'true'
+ROBOTS_CACHE_HOURS = float(os.getenv('ROBOTS_CACHE_HOURS', 24))
+HOST_INITIAL_RATE = float(os.getenv('HOST_INITIAL_RATE', 2))
+HOST_MAX_RATE = float(os.getenv('HOST_MAX_RATE', 20))
+HOST_MAX_RETRIES = int(os.getenv('HOST_MAX_RETRIES', 2))
+
+# Pipeline metrics: written after each check (.prom or .json), optional HTTP port, optional per-URL trace log
+METRICS_FILE = os.getenv('METRICS_FILE', 'logs/metrics.prom')
+METRICS_PORT = int(os.getenv('METRICS_PORT', 0))
+METRICS_TRACE_FILE = os.getenv('METRICS_TRACE_FILE')
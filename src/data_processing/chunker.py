@@ -0,0 +1,139 @@
+import re
+import hashlib
+from bisect import bisect_left
+from typing import List, NamedTuple, Tuple
+
+from src.monitoring.metrics import metrics
+
+# Paragraph breaks, or whitespace after sentence-ending punctuation
+BOUNDARY_RE = re.compile(r'\n\s*\n|(?<=[.!?])\s+')
+# Rough token approximation when no fast tokenizer is available
+WORD_RE = re.compile(r'\w+|[^\w\s]')
+
+
+class Chunk(NamedTuple):
+    id: str
+    index: int
+    text: str
+    start: int
+    end: int
+    tokens: int
+
+
+def chunk_id(key: str, text: str) -> str:
+    """Id from the document key and the chunk's content hash, stable while the chunk text is unchanged
+
+    The key keeps boilerplate chunks shared by many documents apart.
+    """
+    content_hash = hashlib.sha256(text.encode('utf-8')).hexdigest()
+    return hashlib.sha256(f"{key}\0{content_hash}".encode('utf-8')).hexdigest()[:16]
+
+
+class TokenChunker:
+    """Pack sentences into chunks that fill the model's token budget
+
+    The whole text is tokenized once and the tokenizer's offset mapping is
+    used to count tokens per sentence, so chunks end on sentence or
+    paragraph boundaries unless a single sentence is longer than the budget,
+    in which case it is cut at token boundaries. ``overlap_tokens`` carries
+    trailing sentences of one chunk into the next.
+    """
+
+    def __init__(self, tokenizer=None, max_tokens: int = 254, overlap_tokens: int = 0):
+        self.tokenizer = tokenizer
+        self.max_tokens = max_tokens
+        self.overlap_tokens = min(overlap_tokens, max_tokens // 2)
+
+    @classmethod
+    def for_model(cls, model, max_tokens: int = 0, overlap_tokens: int = 0) -> 'TokenChunker':
+        """Chunker sized to a SentenceTransformer's max_seq_length, leaving room for special tokens"""
+        budget = (getattr(model, 'max_seq_length', None) or 256) - 2
+        if max_tokens:
+            budget = min(max_tokens, budget)
+        return cls(getattr(model, 'tokenizer', None), budget, overlap_tokens)
+
+    def _token_offsets(self, text: str) -> List[Tuple[int, int]]:
+        if self.tokenizer is not None and getattr(self.tokenizer, 'is_fast', False):
+            encoding = self.tokenizer(
+                text, add_special_tokens=False, return_offsets_mapping=True, verbose=False
+            )
+            return [span for span in encoding['offset_mapping'] if span[1] > span[0]]
+        return [match.span() for match in WORD_RE.finditer(text)]
+
+    @staticmethod
+    def _sentences(text: str) -> List[Tuple[int, int]]:
+        spans = []
+        position = 0
+        for match in BOUNDARY_RE.finditer(text):
+            if match.start() > position:
+                spans.append((position, match.start()))
+            position = match.end()
+        if position < len(text):
+            spans.append((position, len(text)))
+        return spans
+
+    def _units(self, text: str, offsets: List[Tuple[int, int]], starts: List[int]) -> List[Tuple[int, int]]:
+        """Token index ranges of sentences, with over-long sentences cut to the budget"""
+        units = []
+        for start, end in self._sentences(text):
+            low, high = bisect_left(starts, start), bisect_left(starts, end)
+            while high - low > self.max_tokens:
+                # Back off to a word start so subword pieces stay together
+                cut = low + self.max_tokens
+                while cut > low + 1 and offsets[cut][0] == offsets[cut - 1][1]:
+                    cut -= 1
+                if cut == low + 1:
+                    cut = low + self.max_tokens
+                units.append((low, cut))
+                low = cut
+            if high > low:
+                units.append((low, high))
+        return units
+
+    def chunk(self, text: str, key: str = '') -> List[Chunk]:
+        """Chunks of a document's text, with ids derived from its key"""
+        with metrics.time('chunk', bytes=len(text)) as span:
+            chunks = self._chunk(text, key)
+            span.items = len(chunks)
+        return chunks
+
+    def _chunk(self, text: str, key: str) -> List[Chunk]:
+        offsets = self._token_offsets(text)
+        if not offsets:
+            return []
+        starts = [start for start, _ in offsets]
+
+        groups: List[List[Tuple[int, int]]] = []
+        current: List[Tuple[int, int]] = []
+        current_tokens = 0
+        for unit in self._units(text, offsets, starts):
+            size = unit[1] - unit[0]
+            if current and current_tokens + size > self.max_tokens:
+                groups.append(current)
+                carried: List[Tuple[int, int]] = []
+                carried_tokens = 0
+                for previous in reversed(current):
+                    previous_size = previous[1] - previous[0]
+                    if carried_tokens + previous_size > self.overlap_tokens:
+                        break
+                    carried.insert(0, previous)
+                    carried_tokens += previous_size
+                while carried and carried_tokens + size > self.max_tokens:
+                    carried_tokens -= carried[0][1] - carried[0][0]
+                    carried.pop(0)
+                current, current_tokens = carried, carried_tokens
+            current.append(unit)
+            current_tokens += size
+        if current:
+            groups.append(current)
+
+        chunks = []
+        for index, group in enumerate(groups):
+            first, last = group[0][0], group[-1][1]
+            start, end = offsets[first][0], offsets[last - 1][1]
+            chunk_text = ' '.join(text[start:end].split())
+            chunks.append(Chunk(chunk_id(key, chunk_text), index, chunk_text, start, end, last - first))
+        return chunks
+
+    def chunk_text(self, text: str) -> List[str]:
+        return [chunk.text for chunk in self.chunk(text)]
@@ -0,0 +1,345 @@
+import os
+import time
+import queue
+import socket
+import logging
+import secrets
+import tempfile
+import ipaddress
+import threading
+import multiprocessing
+from multiprocessing.connection import Client, Listener
+from typing import Dict, List, Optional, Tuple, Union
+
+import numpy as np
+
+from src.config.settings import (
+    EMBED_BATCH_SIZE, EMBED_WORKER_ADDRESS, EMBED_WORKER_AUTHKEY, EMBED_WORKER_ALLOW_REMOTE,
+    EMBED_WORKER_MAX_BATCH, EMBED_WORKER_MAX_WAIT_MS, EMBED_WORKER_START_TIMEOUT
+)
+
+Address = Union[str, Tuple[str, int]]
+
+
+def parse_address(value: str) -> Address:
+    """(host, port) for 'host:port', otherwise a Unix socket path"""
+    host, _, port = value.rpartition(':')
+    if host and port.isdigit() and '/' not in value:
+        return host, int(port)
+    return value
+
+
+def is_loopback(host: str) -> bool:
+    """Whether every address the host resolves to is a loopback address"""
+    try:
+        return all(ipaddress.ip_address(info[4][0]).is_loopback for info in socket.getaddrinfo(host, None))
+    except (OSError, ValueError):
+        return False
+
+
+def key_path(address: str) -> str:
+    return f"{address}.key"
+
+
+def resolve_authkey(address: Address, authkey: str = EMBED_WORKER_AUTHKEY) -> bytes:
+    """The configured authkey, or for a Unix socket the one in the key file beside it
+
+    A missing key file raises FileNotFoundError, as a worker that is not
+    running yet has not written it.
+    """
+    if authkey:
+        return authkey.encode('utf-8')
+    if not isinstance(address, str):
+        raise ValueError("EMBED_WORKER_AUTHKEY must be set for an embedding worker on a TCP address")
+    with open(key_path(address), 'rb') as f:
+        return f.read().strip()
+
+
+def create_authkey(address: str) -> bytes:
+    """Write a fresh random authkey into a 0600 file beside a Unix socket"""
+    key = secrets.token_hex(32).encode('ascii')
+    # mkstemp creates the file readable by its owner only
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(address) or '.', suffix='.key.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(key)
+        os.replace(tmp_path, key_path(address))
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+    return key
+
+
+def load_sentence_transformer(model_name: str):
+    """Load the model in this process; importing sentence-transformers alone takes seconds"""
+    from sentence_transformers import SentenceTransformer
+
+    return SentenceTransformer(model_name)
+
+
+class EmbeddingWorker:
+    """Keeps one model warm and serves encode requests over a local socket
+
+    Every client connection is served by its own thread, which queues
+    encode requests for a single encoder thread. The encoder drains the
+    queue, coalescing requests that arrive within ``max_wait_ms`` of each
+    other (up to ``max_batch`` texts) into one ``model.encode`` call, and
+    hands each client back its own rows. Clients also get the model's
+    token offsets, so chunking matches a locally loaded model exactly.
+
+    Requests are pickled, so whoever holds the authkey can run code in the
+    worker. Without a configured key a Unix socket gets a fresh random one
+    in a 0600 file beside it on every start; a TCP address must have one
+    configured and is refused unless it is loopback or ``allow_remote``.
+    """
+
+    def __init__(self, model_name: str, address: str = EMBED_WORKER_ADDRESS,
+                 authkey: str = EMBED_WORKER_AUTHKEY, batch_size: int = EMBED_BATCH_SIZE,
+                 max_batch: int = EMBED_WORKER_MAX_BATCH, max_wait_ms: float = EMBED_WORKER_MAX_WAIT_MS,
+                 allow_remote: bool = EMBED_WORKER_ALLOW_REMOTE):
+        self.model_name = model_name
+        self.address = parse_address(address)
+        self.configured_authkey = authkey
+        self.authkey: Optional[bytes] = None
+        if not isinstance(self.address, str):
+            # Checked up front rather than after the model has loaded
+            host = self.address[0]
+            if not allow_remote and not is_loopback(host):
+                raise RuntimeError(
+                    f"Refusing to listen on {host}, which is not a loopback address; "
+                    f"set EMBED_WORKER_ALLOW_REMOTE=true to serve other hosts"
+                )
+            self.authkey = resolve_authkey(self.address, authkey)
+        self.batch_size = batch_size
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000
+        self.logger = logging.getLogger(__name__)
+        self.model = None
+        self._requests: queue.Queue = queue.Queue()
+        self._tokenizer_lock = threading.Lock()
+
+    def _info(self) -> Dict:
+        tokenizer = getattr(self.model, 'tokenizer', None)
+        return {
+            'model_name': self.model_name,
+            'max_seq_length': getattr(self.model, 'max_seq_length', None),
+            'dimension': self.model.get_sentence_embedding_dimension(),
+            'fast_tokenizer': bool(getattr(tokenizer, 'is_fast', False)),
+            'pid': os.getpid()
+        }
+
+    def _offsets(self, text: str) -> List[Tuple[int, int]]:
+        with self._tokenizer_lock:
+            encoding = self.model.tokenizer(
+                text, add_special_tokens=False, return_offsets_mapping=True, verbose=False
+            )
+        return [tuple(span) for span in encoding['offset_mapping']]
+
+    def _handle(self, conn):
+        try:
+            while True:
+                try:
+                    op, *args = conn.recv()
+                except EOFError:
+                    return
+                try:
+                    if op == 'encode':
+                        reply: queue.Queue = queue.Queue(maxsize=1)
+                        self._requests.put((args[0], reply))
+                        conn.send(reply.get())
+                    elif op == 'offsets':
+                        conn.send(('ok', self._offsets(args[0])))
+                    elif op == 'info':
+                        conn.send(('ok', self._info()))
+                    else:
+                        conn.send(('error', f"unknown operation {op!r}"))
+                except (OSError, EOFError):
+                    return
+                except Exception as e:
+                    conn.send(('error', f"{type(e).__name__}: {e}"))
+        finally:
+            conn.close()
+
+    def _next_batch(self) -> List[Tuple[List[str], queue.Queue]]:
+        """Block for one request, then gather those arriving within max_wait"""
+        batch = [self._requests.get()]
+        pending = len(batch[0][0])
+        deadline = time.monotonic() + self.max_wait
+        while pending < self.max_batch:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                request = self._requests.get(timeout=remaining)
+            except queue.Empty:
+                break
+            batch.append(request)
+            pending += len(request[0])
+        return batch
+
+    def _encode_loop(self):
+        while True:
+            batch = self._next_batch()
+            texts = [text for request_texts, _ in batch for text in request_texts]
+            try:
+                vectors = self.model.encode(
+                    texts, batch_size=self.batch_size, convert_to_numpy=True, show_progress_bar=False
+                )
+            except Exception as e:
+                self.logger.error(f"Failed to encode {len(texts)} texts: {e}")
+                for _, reply in batch:
+                    reply.put(('error', f"{type(e).__name__}: {e}"))
+                continue
+
+            if len(batch) > 1:
+                self.logger.debug(f"Encoded {len(texts)} texts from {len(batch)} requests in one pass")
+            offset = 0
+            for request_texts, reply in batch:
+                reply.put(('ok', vectors[offset:offset + len(request_texts)]))
+                offset += len(request_texts)
+
+    def _listen(self) -> Listener:
+        if not isinstance(self.address, str):
+            return Listener(self.address, authkey=self.authkey)
+
+        directory = os.path.dirname(self.address)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        if os.path.exists(self.address):
+            if worker_running(self.address, self.configured_authkey):
+                raise RuntimeError(f"An embedding worker is already listening on {self.address}")
+            # Left behind by a worker that did not shut down cleanly
+            os.unlink(self.address)
+        if self.configured_authkey:
+            self.authkey = resolve_authkey(self.address, self.configured_authkey)
+        else:
+            self.authkey = create_authkey(self.address)
+        return Listener(self.address, authkey=self.authkey)
+
+    def serve_forever(self):
+        started = time.monotonic()
+        self.model = load_sentence_transformer(self.model_name)
+        self.logger.info(f"Loaded {self.model_name} in {time.monotonic() - started:.1f}s")
+
+        listener = self._listen()
+        threading.Thread(target=self._encode_loop, daemon=True).start()
+        self.logger.info(f"Embedding worker serving {self.model_name} on {self.address}")
+        try:
+            while True:
+                try:
+                    conn = listener.accept()
+                except (OSError, EOFError, multiprocessing.AuthenticationError) as e:
+                    self.logger.warning(f"Rejected embedding worker connection: {e}")
+                    continue
+                threading.Thread(target=self._handle, args=(conn,), daemon=True).start()
+        finally:
+            listener.close()
+
+
+class RemoteTokenizer:
+    """Fast-tokenizer stand-in returning the worker model's token offsets"""
+
+    is_fast = True
+
+    def __init__(self, model: 'RemoteEmbeddingModel'):
+        self.model = model
+
+    def __call__(self, text: str, **kwargs) -> Dict:
+        return {'offset_mapping': self.model.call('offsets', text)}
+
+
+class RemoteEmbeddingModel:
+    """The part of the SentenceTransformer API the pipeline uses, served by an EmbeddingWorker"""
+
+    def __init__(self, address: str = EMBED_WORKER_ADDRESS, authkey: str = EMBED_WORKER_AUTHKEY):
+        self.address = parse_address(address)
+        self._conn = Client(self.address, authkey=resolve_authkey(self.address, authkey))
+        self._lock = threading.Lock()
+        info = self.call('info')
+        self.model_name = info['model_name']
+        self.max_seq_length = info['max_seq_length']
+        self.dimension = info['dimension']
+        self.tokenizer = RemoteTokenizer(self) if info['fast_tokenizer'] else None
+
+    def call(self, op: str, *args):
+        with self._lock:
+            self._conn.send((op, *args))
+            status, payload = self._conn.recv()
+        if status != 'ok':
+            raise RuntimeError(f"Embedding worker at {self.address} failed: {payload}")
+        return payload
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return self.dimension
+
+    def encode(self, sentences, batch_size: int = 32, convert_to_numpy: bool = True,
+               show_progress_bar: bool = False, **kwargs) -> np.ndarray:
+        if isinstance(sentences, str):
+            return self.encode([sentences])[0]
+        sentences = list(sentences)
+        if not sentences:
+            return np.empty((0, self.dimension), dtype=np.float32)
+        return self.call('encode', sentences)
+
+    def close(self):
+        self._conn.close()
+
+
+def worker_running(address: str = EMBED_WORKER_ADDRESS, authkey: str = EMBED_WORKER_AUTHKEY) -> bool:
+    parsed = parse_address(address)
+    try:
+        Client(parsed, authkey=resolve_authkey(parsed, authkey)).close()
+    except (OSError, EOFError, multiprocessing.AuthenticationError):
+        return False
+    return True
+
+
+def load_model(model_name: str, address: str = EMBED_WORKER_ADDRESS, authkey: str = EMBED_WORKER_AUTHKEY):
+    """The resident worker's model when one serves ``model_name``, else a locally loaded one"""
+    logger = logging.getLogger(__name__)
+    if address:
+        try:
+            model = RemoteEmbeddingModel(address, authkey)
+        except (OSError, EOFError, multiprocessing.AuthenticationError):
+            logger.info(f"No embedding worker on {address}, loading {model_name} in this process")
+        except ValueError as e:
+            logger.warning(f"Not using the embedding worker on {address}: {e}")
+        else:
+            if model.model_name == model_name:
+                logger.info(f"Encoding through the embedding worker on {address}")
+                return model
+            logger.warning(
+                f"Embedding worker on {address} serves {model.model_name}, not {model_name}; "
+                f"loading {model_name} in this process"
+            )
+            model.close()
+    return load_sentence_transformer(model_name)
+
+
+def _run_worker(model_name: str, address: str, authkey: str):
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    EmbeddingWorker(model_name, address, authkey).serve_forever()
+
+
+def start_worker(model_name: str, address: str = EMBED_WORKER_ADDRESS, authkey: str = EMBED_WORKER_AUTHKEY,
+                 timeout: float = EMBED_WORKER_START_TIMEOUT) -> Optional[multiprocessing.Process]:
+    """Start a worker as a daemon child process unless one is already listening; waits until it is"""
+    logger = logging.getLogger(__name__)
+    if worker_running(address, authkey):
+        logger.info(f"Using the embedding worker already running on {address}")
+        return None
+
+    process = multiprocessing.Process(
+        target=_run_worker, args=(model_name, address, authkey), name='embedding-worker', daemon=True
+    )
+    process.start()
+    deadline = time.monotonic() + timeout
+    while not worker_running(address, authkey):
+        if not process.is_alive():
+            raise RuntimeError(f"Embedding worker exited with code {process.exitcode} before listening")
+        if time.monotonic() > deadline:
+            process.terminate()
+            raise RuntimeError(f"Embedding worker did not start listening on {address} within {timeout:.0f}s")
+        time.sleep(0.5)
+    logger.info(f"Started embedding worker (pid {process.pid}) on {address}")
+    return process
@@ -0,0 +1,228 @@
+import time
+import hashlib
+import logging
+from collections import OrderedDict
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from src.monitoring.metrics import metrics
+
+
+def chunk_hash(text: str) -> str:
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+class EmbeddingCache:
+    """Chunk embeddings keyed by (model name, chunk hash) with LRU eviction
+
+    With a binary Redis client the vectors are shared across runs and
+    processes, and recency is tracked in a sorted set so the oldest entries
+    are dropped past ``max_entries``. Without one, an in-process LRU is used.
+    """
+
+    def __init__(self, model_name: str, max_entries: int = 200000, redis_client=None,
+                 prefix: str = 'embcache'):
+        self.model_name = model_name
+        self.max_entries = max_entries
+        self.redis = redis_client
+        self.prefix = f"{prefix}:{model_name}"
+        self.lru_key = f"{self.prefix}:lru"
+        self.logger = logging.getLogger(__name__)
+        self.hits = 0
+        self.misses = 0
+        self._memory: "OrderedDict[str, bytes]" = OrderedDict()
+
+    @classmethod
+    def for_backend(cls, backend: str, model_name: str, max_entries: int,
+                    redis_client=None) -> Optional['EmbeddingCache']:
+        """Build the cache named by a config value: 'redis', 'memory' or 'none'"""
+        if backend == 'none':
+            return None
+        return cls(model_name, max_entries, redis_client if backend == 'redis' else None)
+
+    def _key(self, digest: str) -> str:
+        return f"{self.prefix}:{digest}"
+
+    def get_many(self, texts: List[str]) -> List[Optional[np.ndarray]]:
+        """Cached vectors for texts, None where missing"""
+        digests = [chunk_hash(text) for text in texts]
+        if self.redis is not None:
+            values = self.redis.mget([self._key(d) for d in digests]) if digests else []
+            found = {d: time.time() for d, value in zip(digests, values) if value is not None}
+            if found:
+                self.redis.zadd(self.lru_key, found)
+        else:
+            values = []
+            for digest in digests:
+                value = self._memory.get(digest)
+                if value is not None:
+                    self._memory.move_to_end(digest)
+                values.append(value)
+
+        hits = sum(value is not None for value in values)
+        self.hits += hits
+        self.misses += len(values) - hits
+        metrics.incr('embed_cache_hit', hits)
+        metrics.incr('embed_cache_miss', len(values) - hits)
+        return [np.frombuffer(value, dtype=np.float32) if value is not None else None for value in values]
+
+    def put_many(self, texts: List[str], embeddings: Iterable[np.ndarray]):
+        entries = {chunk_hash(text): np.asarray(embedding, dtype=np.float32).tobytes()
+                   for text, embedding in zip(texts, embeddings)}
+        if not entries:
+            return
+        if self.redis is not None:
+            now = time.time()
+            pipe = self.redis.pipeline(transaction=False)
+            for digest, value in entries.items():
+                pipe.set(self._key(digest), value)
+            pipe.zadd(self.lru_key, {digest: now for digest in entries})
+            pipe.zcard(self.lru_key)
+            size = pipe.execute()[-1]
+            if size > self.max_entries:
+                self._evict_redis(size - self.max_entries)
+        else:
+            self._memory.update(entries)
+            for digest in entries:
+                self._memory.move_to_end(digest)
+            while len(self._memory) > self.max_entries:
+                self._memory.popitem(last=False)
+
+    def _evict_redis(self, count: int):
+        oldest = self.redis.zrange(self.lru_key, 0, count - 1)
+        if oldest:
+            pipe = self.redis.pipeline(transaction=False)
+            pipe.delete(*[self._key(d.decode() if isinstance(d, bytes) else d) for d in oldest])
+            pipe.zrem(self.lru_key, *oldest)
+            pipe.execute()
+
+    def stats(self) -> Dict:
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0
+        }
+
+    def log_stats(self):
+        stats = self.stats()
+        self.logger.info(
+            f"Embedding cache: {stats['hits']} hits, {stats['misses']} misses "
+            f"({stats['hit_rate']:.1%} hit rate)"
+        )
+
+
+class BatchEmbedder:
+    """Encode chunks from many documents together and scatter results back
+
+    Chunks are gathered across documents until ``max_chunks_per_pass`` is
+    reached, sorted by length so each batch pads to similar lengths, encoded
+    in ``batch_size`` batches (optionally on a multi-process pool) and then
+    regrouped per document in their original order. Identical chunks are
+    encoded once per pass, and with a cache only unseen chunks are encoded.
+    A pass that fails is retried one document at a time, so one bad
+    document doesn't cost the others their embeddings.
+    """
+
+    def __init__(self, model, batch_size: int = 64, num_processes: int = 0,
+                 max_chunks_per_pass: int = 4096, cache: Optional[EmbeddingCache] = None):
+        self.model = model
+        self.cache = cache
+        self.batch_size = batch_size
+        self.num_processes = num_processes
+        self.max_chunks_per_pass = max_chunks_per_pass
+        self.logger = logging.getLogger(__name__)
+        self._pool = None
+
+    def _get_pool(self):
+        if self._pool is None:
+            self._pool = self.model.start_multi_process_pool(target_devices=['cpu'] * self.num_processes)
+        return self._pool
+
+    def _encode_sorted(self, texts: List[str]) -> np.ndarray:
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]), reverse=True)
+        sorted_texts = [texts[i] for i in order]
+        with metrics.time('embed', items=len(texts), bytes=sum(map(len, texts))):
+            if self.num_processes > 1:
+                encoded = self.model.encode_multi_process(
+                    sorted_texts, self._get_pool(), batch_size=self.batch_size
+                )
+            else:
+                encoded = self.model.encode(
+                    sorted_texts, batch_size=self.batch_size, convert_to_numpy=True,
+                    show_progress_bar=False
+                )
+
+        embeddings = np.empty_like(encoded)
+        embeddings[order] = encoded
+        return embeddings
+
+    def encode_texts(self, texts: List[str]) -> np.ndarray:
+        """Encode texts as one length-sorted stream; rows follow the input order"""
+        if not texts:
+            return np.empty((0, 0), dtype=np.float32)
+
+        unique = list(dict.fromkeys(texts))
+        vectors = {}
+        if self.cache is not None:
+            vectors = {text: vector for text, vector in zip(unique, self.cache.get_many(unique))
+                       if vector is not None}
+
+        missing = [text for text in unique if text not in vectors]
+        if missing:
+            encoded = self._encode_sorted(missing)
+            vectors.update(zip(missing, encoded))
+            if self.cache is not None:
+                self.cache.put_many(missing, encoded)
+
+        return np.stack([vectors[text] for text in texts])
+
+    def _encode_group(self, group: List[Tuple[str, List[str]]]) -> Iterator[Tuple[str, Optional[List[np.ndarray]]]]:
+        texts = [chunk for _, chunks in group for chunk in chunks]
+        try:
+            embeddings = self.encode_texts(texts)
+        except Exception as e:
+            if len(group) == 1:
+                self.logger.error(f"Failed to encode {group[0][0]}: {e}")
+                yield group[0][0], None
+                return
+            self.logger.warning(
+                f"Failed to encode {len(texts)} chunks from {len(group)} documents, "
+                f"retrying one document at a time: {e}"
+            )
+            for document in group:
+                yield from self._encode_group([document])
+            return
+        self.logger.info(f"Encoded {len(texts)} chunks from {len(group)} documents")
+
+        offset = 0
+        for doc_id, chunks in group:
+            yield doc_id, list(embeddings[offset:offset + len(chunks)])
+            offset += len(chunks)
+
+    def iter_encode(self, documents: Iterable[Tuple[str, List[str]]]) -> Iterator[Tuple[str, Optional[List[np.ndarray]]]]:
+        """Yield (doc_id, chunk embeddings) for (doc_id, chunks) pairs, batching across documents
+
+        Embeddings are None for a document that failed to encode on its own.
+        """
+        group: List[Tuple[str, List[str]]] = []
+        pending = 0
+        for doc_id, chunks in documents:
+            group.append((doc_id, chunks))
+            pending += len(chunks)
+            if pending >= self.max_chunks_per_pass:
+                yield from self._encode_group(group)
+                group, pending = [], 0
+        if group:
+            yield from self._encode_group(group)
+
+    def encode_documents(self, documents: Dict[str, List[str]]) -> Dict[str, List[np.ndarray]]:
+        """Embeddings by doc_id, leaving out documents that failed to encode"""
+        return {doc_id: embeddings for doc_id, embeddings in self.iter_encode(documents.items())
+                if embeddings is not None}
+
+    def close(self):
+        if self._pool is not None:
+            self.model.stop_multi_process_pool(self._pool)
+            self._pool = None
@@ -0,0 +1,220 @@
+import re
+import hashlib
+import logging
+from collections import Counter
+from typing import Dict, List, Optional, Set, Tuple
+
+import numpy as np
+
+TOKEN_RE = re.compile(r'\w+')
+FINGERPRINT_BITS = 64
+
+
+def simhash(text: str, shingle_size: int = 3, min_shingles: int = 20) -> Optional[int]:
+    """64-bit SimHash over word shingles; None when the text is too short to fingerprint reliably"""
+    tokens = TOKEN_RE.findall(text.lower())
+    shingles = Counter(
+        ' '.join(tokens[i:i + shingle_size]) for i in range(max(len(tokens) - shingle_size + 1, 0))
+    )
+    if len(shingles) < min_shingles:
+        return None
+
+    hashes = np.array(
+        [int.from_bytes(hashlib.blake2b(s.encode('utf-8'), digest_size=8).digest(), 'big') for s in shingles],
+        dtype='>u8'
+    )
+    weights = np.array(list(shingles.values()), dtype=np.int64)
+    bits = np.unpackbits(hashes.view(np.uint8)).reshape(-1, FINGERPRINT_BITS)
+    votes = weights @ (bits.astype(np.int64) * 2 - 1)
+    return int(''.join('1' if vote > 0 else '0' for vote in votes), 2)
+
+
+def format_fingerprint(fingerprint: Optional[int]) -> Optional[str]:
+    return None if fingerprint is None else f"{fingerprint:016x}"
+
+
+def parse_fingerprint(value) -> Optional[int]:
+    if value is None or value == '':
+        return None
+    return value if isinstance(value, int) else int(value, 16)
+
+
+def hamming(a: int, b: int) -> int:
+    return bin(a ^ b).count('1')
+
+
+def preference(key: str) -> Tuple[int, str]:
+    """Sort key choosing the canonical page of a group: the shortest key, then the first in order"""
+    return len(key), key
+
+
+class SimHashIndex:
+    """LSH over SimHash fingerprints for Hamming-distance lookups
+
+    The fingerprint is split into ``max_distance + 1`` bands; two
+    fingerprints within ``max_distance`` bits must agree exactly on at least
+    one band, so only keys sharing a band are compared.
+    """
+
+    def __init__(self, max_distance: int = 3):
+        self.max_distance = max_distance
+        bands = max_distance + 1
+        width = FINGERPRINT_BITS // bands
+        self._bands = [(i * width, FINGERPRINT_BITS if i == bands - 1 else (i + 1) * width)
+                       for i in range(bands)]
+        self._tables: List[Dict[int, Set[str]]] = [{} for _ in self._bands]
+        self._fingerprints: Dict[str, int] = {}
+
+    def __len__(self):
+        return len(self._fingerprints)
+
+    def __contains__(self, key: str):
+        return key in self._fingerprints
+
+    def get(self, key: str) -> Optional[int]:
+        return self._fingerprints.get(key)
+
+    def _band_values(self, fingerprint: int) -> List[int]:
+        return [(fingerprint >> start) & ((1 << (stop - start)) - 1) for start, stop in self._bands]
+
+    def add(self, key: str, fingerprint: int):
+        self.remove(key)
+        self._fingerprints[key] = fingerprint
+        for table, value in zip(self._tables, self._band_values(fingerprint)):
+            table.setdefault(value, set()).add(key)
+
+    def remove(self, key: str):
+        fingerprint = self._fingerprints.pop(key, None)
+        if fingerprint is None:
+            return
+        for table, value in zip(self._tables, self._band_values(fingerprint)):
+            bucket = table.get(value)
+            if bucket is not None:
+                bucket.discard(key)
+                if not bucket:
+                    del table[value]
+
+    def within(self, fingerprint: int, exclude: Optional[str] = None) -> List[Tuple[str, int]]:
+        """Every (key, distance) within max_distance"""
+        candidates = set()
+        for table, value in zip(self._tables, self._band_values(fingerprint)):
+            candidates.update(table.get(value, ()))
+        candidates.discard(exclude)
+        matches = []
+        for key in candidates:
+            distance = hamming(fingerprint, self._fingerprints[key])
+            if distance <= self.max_distance:
+                matches.append((key, distance))
+        return matches
+
+    def nearest(self, fingerprint: int, exclude: Optional[str] = None) -> Optional[Tuple[str, int]]:
+        """Closest (key, distance) within max_distance, or None"""
+        matches = self.within(fingerprint, exclude)
+        return min(matches, key=lambda match: (match[1], match[0])) if matches else None
+
+
+class NearDuplicateRegistry:
+    """Canonical pages and their near-duplicate aliases, persisted in Redis
+
+    Fingerprints of canonical pages live in ``simhash:fingerprints`` and
+    alias -> canonical links in ``simhash:aliases``; both are loaded into a
+    ``SimHashIndex`` at start-up and updated through a ``RedisBulkWriter``.
+    Whatever order pages arrive in, the canonical page of a group is the
+    one ``preference`` ranks first, so a short article URL wins over tag
+    pages and print views of it. Aliases are released whenever their
+    canonical page stops standing for them (it is removed, its content
+    moves beyond ``max_distance``, it becomes an alias itself or a
+    preferred page displaces it); those orphans are returned so callers
+    can store them again from their own text.
+    """
+
+    FINGERPRINTS_KEY = 'simhash:fingerprints'
+    ALIASES_KEY = 'simhash:aliases'
+
+    def __init__(self, redis_text, max_distance: int = 3):
+        self.redis = redis_text
+        self.index = SimHashIndex(max_distance)
+        self.logger = logging.getLogger(__name__)
+        for key, value in self.redis.hgetall(self.FINGERPRINTS_KEY).items():
+            self.index.add(key, parse_fingerprint(value))
+        self.aliases: Dict[str, str] = self.redis.hgetall(self.ALIASES_KEY)
+        self.members: Dict[str, Set[str]] = {}
+        for alias, canonical in self.aliases.items():
+            self.members.setdefault(canonical, set()).add(alias)
+        self.aliased = 0
+
+    def canonical_for(self, key: str, fingerprint: Optional[int]) -> Optional[str]:
+        """The canonical page a key duplicates, if any is preferred over the key itself"""
+        if fingerprint is None:
+            return None
+        matches = [match for match, _ in self.index.within(fingerprint, exclude=key)]
+        if not matches:
+            return None
+        canonical = min(matches, key=preference)
+        return canonical if preference(canonical) < preference(key) else None
+
+    def _unlink_alias(self, key: str, writer):
+        canonical = self.aliases.pop(key, None)
+        if canonical is None:
+            return
+        writer.hdel(self.ALIASES_KEY, key)
+        members = self.members.get(canonical)
+        if members is not None:
+            members.discard(key)
+            if not members:
+                del self.members[canonical]
+
+    def _release(self, canonical: str, writer) -> List[str]:
+        """Drop every alias of a canonical page; returns them"""
+        orphans = sorted(self.members.pop(canonical, ()))
+        for alias in orphans:
+            del self.aliases[alias]
+            writer.hdel(self.ALIASES_KEY, alias)
+        return orphans
+
+    def add_canonical(self, key: str, fingerprint: Optional[int], writer) -> List[str]:
+        """Register a page as canonical
+
+        Returns the pages to store again: aliases its new content no longer
+        stands for, and canonical pages it displaces, which will become its
+        aliases.
+        """
+        self._unlink_alias(key, writer)
+        previous = self.index.get(key)
+        orphans = []
+        if fingerprint is None or (previous is not None and hamming(previous, fingerprint) > self.index.max_distance):
+            orphans = self._release(key, writer)
+        if fingerprint is None:
+            self.remove_canonical(key, writer)
+            return orphans
+        orphans += sorted(match for match, _ in self.index.within(fingerprint, exclude=key)
+                          if preference(key) < preference(match))
+        self.index.add(key, fingerprint)
+        writer.hset(self.FINGERPRINTS_KEY, key, format_fingerprint(fingerprint))
+        return orphans
+
+    def remove_canonical(self, key: str, writer):
+        if key in self.index:
+            self.index.remove(key)
+            writer.hdel(self.FINGERPRINTS_KEY, key)
+
+    def add_alias(self, key: str, canonical: str, writer) -> List[str]:
+        """Link a page to its canonical page; returns the page's own former aliases"""
+        self.remove_canonical(key, writer)
+        orphans = self._release(key, writer)
+        self._unlink_alias(key, writer)
+        self.aliases[key] = canonical
+        self.members.setdefault(canonical, set()).add(key)
+        writer.hset(self.ALIASES_KEY, key, canonical)
+        self.aliased += 1
+        return orphans
+
+    def remove(self, keys: List[str], writer) -> List[str]:
+        """Forget keys; returns aliases left without a canonical page"""
+        removed = set(keys)
+        orphans = []
+        for key in keys:
+            self.remove_canonical(key, writer)
+            self._unlink_alias(key, writer)
+            orphans += self._release(key, writer)
+        return [alias for alias in orphans if alias not in removed]
@@ -0,0 +1,172 @@
+import os
+import re
+import time
+import sqlite3
+import hashlib
+import logging
+import multiprocessing
+from collections import deque
+from multiprocessing.connection import wait
+from typing import Dict, Iterator, List, Optional
+
+HEX_DIGEST_RE = re.compile(r'^[0-9a-f]{64}$')
+
+
+def extract_pdf_pages(path: str) -> List[str]:
+    """Extract the text of every page of a PDF"""
+    from PyPDF2 import PdfReader
+
+    reader = PdfReader(path)
+    return [page.extract_text() or '' for page in reader.pages]
+
+
+def _extract_worker(path: str, conn):
+    try:
+        conn.send(('ok', extract_pdf_pages(path)))
+    except Exception as e:
+        conn.send(('error', f"{type(e).__name__}: {e}"))
+    finally:
+        conn.close()
+
+
+def file_sha256(path: str) -> str:
+    """Content hash of a file; content-addressed downloads already carry it in their name"""
+    stem = os.path.splitext(os.path.basename(path))[0]
+    if HEX_DIGEST_RE.match(stem):
+        return stem
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class PDFTextCache:
+    """SQLite cache of extracted text keyed by (file hash, page number)"""
+
+    def __init__(self, path: str):
+        self.conn = sqlite3.connect(path)
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS pdf_files (
+                file_hash TEXT PRIMARY KEY,
+                page_count INTEGER NOT NULL,
+                extracted_at TEXT DEFAULT CURRENT_TIMESTAMP
+            );
+            CREATE TABLE IF NOT EXISTS pdf_pages (
+                file_hash TEXT NOT NULL,
+                page INTEGER NOT NULL,
+                text TEXT NOT NULL,
+                PRIMARY KEY (file_hash, page)
+            );
+        """)
+
+    def get_pages(self, file_hash: str) -> Optional[List[str]]:
+        row = self.conn.execute(
+            "SELECT page_count FROM pdf_files WHERE file_hash = ?", (file_hash,)
+        ).fetchone()
+        if row is None:
+            return None
+        pages = self.conn.execute(
+            "SELECT text FROM pdf_pages WHERE file_hash = ? ORDER BY page", (file_hash,)
+        ).fetchall()
+        if len(pages) != row[0]:
+            return None
+        return [text for (text,) in pages]
+
+    def put_pages(self, file_hash: str, pages: List[str]):
+        with self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO pdf_pages (file_hash, page, text) VALUES (?, ?, ?)",
+                [(file_hash, number, text) for number, text in enumerate(pages)]
+            )
+            self.conn.execute(
+                "INSERT OR REPLACE INTO pdf_files (file_hash, page_count) VALUES (?, ?)",
+                (file_hash, len(pages))
+            )
+
+    def close(self):
+        self.conn.close()
+
+
+class PDFTextExtractor:
+    """Parallel, incremental PDF text extraction
+
+    Each uncached PDF is extracted in its own worker process, at most
+    ``max_workers`` at a time. A worker that runs past ``timeout`` seconds
+    is terminated, so one malformed file cannot stall the batch. Results are
+    cached per page by file content hash, so reruns only parse new or
+    changed PDFs.
+    """
+
+    def __init__(self, cache_path: str, max_workers: Optional[int] = None, timeout: float = 120.0):
+        self.cache = PDFTextCache(cache_path)
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.timeout = timeout
+        self.logger = logging.getLogger(__name__)
+
+    def _extract_uncached(self, jobs: Dict[str, str]) -> Iterator[tuple]:
+        """Run extraction for {path: file_hash}, yielding (path, pages or None)"""
+        pending = deque(jobs)
+        running = {}
+
+        while pending or running:
+            while pending and len(running) < self.max_workers:
+                path = pending.popleft()
+                parent_conn, child_conn = multiprocessing.Pipe(duplex=False)
+                process = multiprocessing.Process(target=_extract_worker, args=(path, child_conn), daemon=True)
+                process.start()
+                child_conn.close()
+                running[path] = (process, parent_conn, time.monotonic())
+
+            wait([conn for _, conn, _ in running.values()], timeout=0.5)
+
+            for path, (process, conn, started) in list(running.items()):
+                pages = None
+                if conn.poll():
+                    try:
+                        status, payload = conn.recv()
+                    except EOFError:
+                        status, payload = 'error', 'worker exited without a result'
+                    if status == 'ok':
+                        pages = payload
+                    else:
+                        self.logger.error(f"Failed to extract {path}: {payload}")
+                elif process.is_alive() and time.monotonic() - started < self.timeout:
+                    continue
+                elif process.is_alive():
+                    self.logger.error(f"Timed out extracting {path} after {self.timeout}s")
+                    process.terminate()
+                else:
+                    self.logger.error(f"Extraction worker crashed on {path}")
+
+                process.join()
+                conn.close()
+                del running[path]
+                yield path, pages
+
+    def extract_folder(self, folder: str) -> Iterator[Dict]:
+        """Yield {'path', 'file_hash', 'pages', 'cached'} for every readable PDF in a folder"""
+        paths = sorted(
+            os.path.join(folder, name) for name in os.listdir(folder)
+            if name.lower().endswith('.pdf')
+        )
+
+        uncached = {}
+        for path in paths:
+            file_hash = file_sha256(path)
+            pages = self.cache.get_pages(file_hash)
+            if pages is None:
+                uncached[path] = file_hash
+            else:
+                yield {'path': path, 'file_hash': file_hash, 'pages': pages, 'cached': True}
+
+        if uncached:
+            self.logger.info(f"Extracting text from {len(uncached)} new or changed PDFs")
+        for path, pages in self._extract_uncached(uncached):
+            if pages is None:
+                continue
+            self.cache.put_pages(uncached[path], pages)
+            yield {'path': path, 'file_hash': uncached[path], 'pages': pages, 'cached': False}
+
+    def close(self):
+        self.cache.close()
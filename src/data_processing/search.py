@@ -0,0 +1,148 @@
+import re
+import logging
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+CHUNK_FIELD_RE = re.compile(rb'^chunk_(\d+)$')
+
+
+class SemanticSearchIndex:
+    """In-memory cosine search over the chunk embeddings stored in Redis
+
+    All chunk vectors live in one contiguous, L2-normalized float32 matrix
+    with a row -> (key, chunk) map, so a query is a single matrix-vector
+    product followed by ``argpartition``. ``refresh()`` reads the
+    ``url_updates`` hash and only reloads keys whose timestamp moved; rows
+    of removed or replaced keys are tombstoned and reclaimed by compaction.
+    """
+
+    def __init__(self, redis_binary, updates_key: str = 'url_updates',
+                 load_batch_size: int = 500, compact_ratio: float = 0.25):
+        self.redis = redis_binary
+        self.updates_key = updates_key
+        self.load_batch_size = load_batch_size
+        self.compact_ratio = compact_ratio
+        self.logger = logging.getLogger(__name__)
+
+        self._matrix: Optional[np.ndarray] = None
+        self._live = np.zeros(0, dtype=bool)
+        self._size = 0
+        self._row_refs: List[Tuple[str, int]] = []
+        self._rows_by_key: Dict[str, List[int]] = {}
+        self._versions: Dict[str, str] = {}
+
+    def __len__(self):
+        return int(self._live[:self._size].sum())
+
+    @property
+    def dimension(self) -> Optional[int]:
+        return None if self._matrix is None else self._matrix.shape[1]
+
+    def _load_embeddings(self, keys: List[str]) -> Dict[str, Tuple[List[int], np.ndarray]]:
+        """Fetch {key: (chunk numbers, chunks x dim matrix)} with one pipelined round trip per batch"""
+        loaded = {}
+        for start in range(0, len(keys), self.load_batch_size):
+            batch = keys[start:start + self.load_batch_size]
+            pipe = self.redis.pipeline(transaction=False)
+            for key in batch:
+                pipe.hgetall(f"embedding:{key}")
+            for key, fields in zip(batch, pipe.execute()):
+                chunks = sorted(
+                    (int(match.group(1)), value) for match, value in
+                    ((CHUNK_FIELD_RE.match(field), value) for field, value in fields.items()) if match
+                )
+                if chunks:
+                    loaded[key] = (
+                        [number for number, _ in chunks],
+                        np.vstack([np.frombuffer(value, dtype=np.float32) for _, value in chunks])
+                    )
+        return loaded
+
+    def _reserve(self, rows: int, dim: int):
+        if self._matrix is None:
+            self._matrix = np.empty((max(rows, 1024), dim), dtype=np.float32)
+            self._live = np.zeros(self._matrix.shape[0], dtype=bool)
+        needed = self._size + rows
+        if needed > self._matrix.shape[0]:
+            capacity = max(needed, self._matrix.shape[0] * 2)
+            matrix = np.empty((capacity, dim), dtype=np.float32)
+            matrix[:self._size] = self._matrix[:self._size]
+            live = np.zeros(capacity, dtype=bool)
+            live[:self._size] = self._live[:self._size]
+            self._matrix, self._live = matrix, live
+
+    def _remove(self, key: str):
+        for row in self._rows_by_key.pop(key, []):
+            self._live[row] = False
+        self._versions.pop(key, None)
+
+    def _add(self, key: str, chunk_numbers: List[int], vectors: np.ndarray):
+        if self.dimension is not None and vectors.shape[1] != self.dimension:
+            self.logger.warning(f"Skipping {key}: dimension {vectors.shape[1]} != {self.dimension}")
+            return
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        vectors = vectors / np.where(norms == 0, 1, norms)
+
+        self._reserve(len(vectors), vectors.shape[1])
+        start = self._size
+        self._matrix[start:start + len(vectors)] = vectors
+        self._live[start:start + len(vectors)] = True
+        self._size += len(vectors)
+        self._row_refs.extend((key, chunk) for chunk in chunk_numbers)
+        self._rows_by_key[key] = list(range(start, self._size))
+
+    def compact(self):
+        """Drop tombstoned rows so the matrix is contiguous again"""
+        keep = np.flatnonzero(self._live[:self._size])
+        self._matrix = np.ascontiguousarray(self._matrix[keep])
+        self._live = np.ones(len(keep), dtype=bool)
+        self._row_refs = [self._row_refs[row] for row in keep]
+        self._size = len(keep)
+        self._rows_by_key = {}
+        for row, (key, _) in enumerate(self._row_refs):
+            self._rows_by_key.setdefault(key, []).append(row)
+
+    def refresh(self) -> Tuple[int, int]:
+        """Sync with Redis via url_updates; returns (keys loaded, keys removed)"""
+        updates = {
+            (key.decode() if isinstance(key, bytes) else key): (ts.decode() if isinstance(ts, bytes) else ts)
+            for key, ts in self.redis.hgetall(self.updates_key).items()
+        }
+        removed = [key for key in self._versions if key not in updates]
+        changed = [key for key, ts in updates.items() if self._versions.get(key) != ts]
+
+        for key in removed:
+            self._remove(key)
+        loaded = self._load_embeddings(changed)
+        for key in changed:
+            self._remove(key)
+            if key in loaded:
+                self._add(key, *loaded[key])
+            # Remember the version even without vectors so it isn't refetched every refresh
+            self._versions[key] = updates[key]
+
+        dead = self._size - len(self)
+        if self._size and dead / self._size > self.compact_ratio:
+            self.compact()
+        if changed or removed:
+            self.logger.info(f"Search index: {len(changed)} keys loaded, {len(removed)} removed, {len(self)} chunks")
+        return len(changed), len(removed)
+
+    def search(self, query: np.ndarray, k: int = 10) -> List[Tuple[str, int, float]]:
+        """Top-k (key, chunk index, cosine score) for a query vector"""
+        live_count = len(self)
+        if not live_count or k <= 0:
+            return []
+        query = np.asarray(query, dtype=np.float32).ravel()
+        norm = np.linalg.norm(query)
+        if norm:
+            query = query / norm
+
+        scores = self._matrix[:self._size] @ query
+        if live_count < self._size:
+            scores[~self._live[:self._size]] = -np.inf
+        k = min(k, live_count)
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(*self._row_refs[row], float(scores[row])) for row in top]
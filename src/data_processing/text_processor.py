@@ -1,33 +1,277 @@
+import os
+import json
+import logging
+from datetime import datetime
+from itertools import islice
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+import redis
+
+from src.config.settings import (
+    REDIS_HOST, REDIS_PORT, REDIS_DB,
+    PDF_TEXT_CACHE, PDF_EXTRACT_WORKERS, PDF_EXTRACT_TIMEOUT,
+    EMBED_BATCH_SIZE, EMBED_PROCESSES, EMBED_MAX_CHUNKS_PER_PASS,
+    EMBED_CACHE_BACKEND, EMBED_CACHE_MAX_ENTRIES, REDIS_FLUSH_SIZE, REDIS_ATOMIC_WRITES,
+    EMBEDDING_BACKEND, EMBEDDING_STORE_DIR, EMBEDDING_STORE_DTYPE, EMBEDDING_COMPACT_SEGMENTS,
+    CHUNK_MAX_TOKENS, CHUNK_OVERLAP_TOKENS, NEAR_DUPLICATE_DISTANCE
+)
+from src.storage.redis_manager import RedisKeyManager, RedisBulkWriter
+from src.storage.version_manager import DataVersionManager
+from src.storage.embedding_store import EmbeddingSegmentStore
+from src.data_processing.update_monitor import ContentUpdateMonitor
+from src.data_processing.pdf_processor import PDFTextExtractor
+from src.data_processing.embeddings import BatchEmbedder, EmbeddingCache
+from src.data_processing.embedding_worker import RemoteEmbeddingModel, load_model
+from src.data_processing.chunker import TokenChunker
+from src.data_processing.near_duplicates import NearDuplicateRegistry, simhash, parse_fingerprint
+
 class TextProcessingPipeline:
-    def __init__(self, redis_host: str = REDIS_HOST, redis_port: int = REDIS_PORT, 
-                 redis_db: int = REDIS_DB, model_name: str = 'all-MiniLM-L6-v2'):
-        # ... (previous initialization)
-        self.version_manager = DataVersionManager(redis_host, redis_port, redis_db)
+    def __init__(self, redis_host: str = REDIS_HOST, redis_port: int = REDIS_PORT,
+                 redis_db: int = REDIS_DB, model_name: str = 'all-MiniLM-L6-v2',
+                 redis_text: Optional[redis.Redis] = None, redis_binary: Optional[redis.Redis] = None,
+                 model=None):
+        # Clients and a model can be passed in, e.g. in-process ones for the benchmarks
+        self.key_manager = RedisKeyManager(redis_host, redis_port, redis_db, redis_text, redis_binary)
+        self.model = model if model is not None else load_model(model_name)
+        self.chunker = TokenChunker.for_model(self.model, CHUNK_MAX_TOKENS, CHUNK_OVERLAP_TOKENS)
+        self.embedder = BatchEmbedder(
+            self.model,
+            batch_size=EMBED_BATCH_SIZE,
+            # The resident worker does its own batching; local process pools only apply in-process
+            num_processes=0 if isinstance(self.model, RemoteEmbeddingModel) else EMBED_PROCESSES,
+            max_chunks_per_pass=EMBED_MAX_CHUNKS_PER_PASS,
+            cache=EmbeddingCache.for_backend(
+                EMBED_CACHE_BACKEND, model_name, EMBED_CACHE_MAX_ENTRIES,
+                self.key_manager.redis_binary
+            )
+        )
+        self.embedding_store = None
+        if EMBEDDING_BACKEND == 'segments':
+            self.embedding_store = EmbeddingSegmentStore(
+                EMBEDDING_STORE_DIR, EMBEDDING_STORE_DTYPE, EMBEDDING_COMPACT_SEGMENTS
+            )
+        self.near_duplicates = None
+        if NEAR_DUPLICATE_DISTANCE > 0:
+            self.near_duplicates = NearDuplicateRegistry(self.key_manager.redis_text, NEAR_DUPLICATE_DISTANCE)
+        self._pending_alias_deletes = []
+        self._orphaned = set()
+        self.logger = logging.getLogger(__name__)
+        self.version_manager = DataVersionManager(redis_host, redis_port, redis_db, redis_client=redis_text)
         self.update_monitor = ContentUpdateMonitor(self.version_manager)
-        
+
+    def chunk_text(self, text: str) -> List[str]:
+        """Split text into chunks that fill the model's token budget"""
+        return self.chunker.chunk_text(text)
+
+    def create_embedding(self, text: str) -> np.ndarray:
+        return self.model.encode(text)
+
+    def _store_text(self, writer: RedisBulkWriter, key: str, text: str, source_type: str,
+                    metadata: Dict = None):
+        """Queue text for storage"""
+        # Store the original text with metadata
+        text_data = {
+            'text': text,
+            'source_type': source_type,
+            'metadata': json.dumps(metadata) if metadata else '{}',
+            'updated_at': datetime.now().isoformat()
+        }
+        writer.hset(f"text:{key}", mapping=text_data)
+        writer.hdel(f"text:{key}", 'alias_of')
+
+    def _store_if_alias(self, writer: RedisBulkWriter, key: str, text: str, metadata: Dict = None) -> bool:
+        """Store a near-duplicate page as an alias of its canonical page; returns whether it was one"""
+        if self.near_duplicates is None:
+            return False
+        # Crawl records carry the fingerprint taken at extraction time
+        if metadata and metadata.get('simhash'):
+            fingerprint = parse_fingerprint(metadata['simhash'])
+        else:
+            fingerprint = simhash(text)
+        canonical = self.near_duplicates.canonical_for(key, fingerprint)
+        if canonical is None:
+            self._orphaned.update(self.near_duplicates.add_canonical(key, fingerprint, writer))
+            return False
+
+        self.logger.info(f"{key} is a near-duplicate of {canonical}, storing as alias")
+        with writer.document():
+            writer.hset(f"text:{key}", 'alias_of', canonical)
+            writer.hdel(f"text:{key}", 'chunk_ids')
+            writer.delete(f"embedding:{key}")
+            writer.hdel("url_updates", key)
+            self._orphaned.update(self.near_duplicates.add_alias(key, canonical, writer))
+        if self.embedding_store is not None:
+            self._pending_alias_deletes.append(key)
+        return True
+
+    def _stored_documents(self, keys: List[str]) -> List[Tuple[str, str, str, Dict]]:
+        """(key, text, source_type, metadata) of already stored documents"""
+        pipe = self.key_manager.redis_text.pipeline(transaction=False)
+        for key in keys:
+            pipe.hgetall(f"text:{key}")
+        return [
+            (key, stored['text'], stored.get('source_type', 'webpage'), json.loads(stored.get('metadata') or '{}'))
+            for key, stored in zip(keys, pipe.execute()) if stored.get('text')
+        ]
+
+    def _store_documents(self, documents: Iterable[Tuple[str, str, str, Dict]], force: bool = False) -> int:
+        """Store (key, text, source_type, metadata) documents, embedding changed ones in shared batches
+
+        With ``force`` every document is stored, changed or not.
+        """
+        writer = self.key_manager.bulk_writer(REDIS_FLUSH_SIZE, REDIS_ATOMIC_WRITES)
+        chunk_ids: Dict[str, List[str]] = {}
+
+        def changed_chunks() -> Iterator[Tuple[str, List[str]]]:
+            batches = iter(documents)
+            while True:
+                # Diff a batch against the current version in a few round trips
+                batch = list(islice(batches, self.update_monitor.batch_size))
+                if not batch:
+                    break
+                if not force:
+                    diff = self.update_monitor.track_content_updates((key, text) for key, text, _, _ in batch)
+                for key, text, source_type, metadata in batch:
+                    if not force and key not in diff.hashes:
+                        continue
+                    # Stored again now, whatever happened to its canonical page earlier
+                    self._orphaned.discard(key)
+                    self._store_text(writer, key, text, source_type, metadata)
+                    if source_type == 'webpage' and self._store_if_alias(writer, key, text, metadata):
+                        continue
+                    chunks = self.chunker.chunk(text, key)
+                    chunk_ids[key] = [chunk.id for chunk in chunks]
+                    yield key, [chunk.text for chunk in chunks]
+
+        stored = 0
+        segment_rows = []
+        with writer:
+            for key, embeddings in self.embedder.iter_encode(changed_chunks()):
+                if embeddings is None:
+                    # Leave it out of the next version so the next run tries it again
+                    self.update_monitor.current_updates.pop(key, None)
+                    continue
+                with writer.document():
+                    writer.delete(f"embedding:{key}")
+                    if self.embedding_store is not None:
+                        segment_rows.append((key, embeddings))
+                    else:
+                        writer.hset(f"embedding:{key}", mapping={
+                            f"chunk_{i}": embedding.tobytes() for i, embedding in enumerate(embeddings)
+                        })
+                    # Ids in chunk order, so chunk_i of either embedding backend has id i
+                    writer.hset(f"text:{key}", 'chunk_ids', json.dumps(chunk_ids.pop(key, [])))
+                    writer.hset("url_updates", key, datetime.now().isoformat())
+                stored += 1
+            if self.embedding_store is not None:
+                self.embedding_store.delete(self._pending_alias_deletes)
+                self._pending_alias_deletes = []
+            if segment_rows:
+                self.embedding_store.append(segment_rows)
+                self.embedding_store.maybe_compact_async()
+        # Aliases whose canonical page changed or became an alias need their own embeddings now
+        if self._orphaned:
+            orphans, self._orphaned = sorted(self._orphaned), set()
+            self.logger.info(f"Re-processing {len(orphans)} aliases of changed pages")
+            stored += self._store_documents(self._stored_documents(orphans), force=True)
+        elif self.embedder.cache is not None:
+            self.embedder.cache.log_stats()
+        return stored
+
     def store_text_and_embedding(self, key: str, text: str, source_type: str, metadata: Dict = None):
         """Store text and embedding with version tracking"""
-        # Check if content has changed
-        if self.update_monitor.track_content_update(key, text):
-            # Store the original text with metadata
-            text_data = {
-                'text': text,
-                'source_type': source_type,
-                'metadata': json.dumps(metadata) if metadata else '{}',
-                'updated_at': datetime.now().isoformat()
-            }
-            
-            # Store text
-            self.key_manager.redis_text.hset(f"text:{key}", mapping=text_data)
-            
-            # Create and store embeddings for chunks
-            chunks = self.chunk_text(text)
-            for i, chunk in enumerate(chunks):
-                embedding = self.create_embedding(chunk)
-                self.key_manager.redis_binary.hset(
-                    f"embedding:{key}",
-                    f"chunk_{i}",
-                    embedding.tobytes()
-                )
-                
-        return self.update_monitor.process_updates()
\ No newline at end of file
+        self._store_documents([(key, text, source_type, metadata)])
+        return self.update_monitor.process_updates()
+
+    def process_all_pdfs(self, pdf_folder: str, cache_path: str = PDF_TEXT_CACHE) -> int:
+        """Extract text from every PDF in a folder and store it; returns the number stored"""
+        if not os.path.isdir(pdf_folder):
+            self.logger.warning(f"PDF folder not found: {pdf_folder}")
+            return 0
+
+        extractor = PDFTextExtractor(
+            cache_path,
+            max_workers=PDF_EXTRACT_WORKERS,
+            timeout=PDF_EXTRACT_TIMEOUT
+        )
+
+        present = set()
+
+        def documents():
+            for document in extractor.extract_folder(pdf_folder):
+                present.add(f"pdf:{document['file_hash']}")
+                text = '\n'.join(document['pages'])
+                if not text.strip():
+                    continue
+                metadata = {
+                    'file': os.path.basename(document['path']),
+                    'file_hash': document['file_hash'],
+                    'page_count': len(document['pages'])
+                }
+                yield f"pdf:{document['file_hash']}", text, 'pdf', metadata
+
+        try:
+            stored = self._store_documents(documents())
+        finally:
+            extractor.close()
+
+        # PDFs are keyed by content, so a changed or deleted file leaves its old key behind
+        stale = [
+            key[len('text:'):] for key in self.key_manager.redis_text.scan_iter(match='text:pdf:*')
+            if key[len('text:'):] not in present
+        ]
+        if stale:
+            self.logger.info(f"Removing {len(stale)} PDFs no longer in {pdf_folder}")
+            self.remove_documents(stale)
+
+        self.update_monitor.process_updates()
+        self.logger.info(f"Stored {stored} new or changed PDFs")
+        return stored
+
+    def remove_documents(self, keys: List[str]):
+        """Remove stored documents and queue their removal for the next version"""
+        orphans = []
+        with self.key_manager.bulk_writer(REDIS_FLUSH_SIZE, REDIS_ATOMIC_WRITES) as writer:
+            for key in keys:
+                with writer.document():
+                    writer.delete(f"text:{key}", f"embedding:{key}")
+                    writer.hdel("url_updates", key)
+            if self.near_duplicates is not None:
+                orphans = self.near_duplicates.remove(keys, writer)
+        if self.embedding_store is not None:
+            self.embedding_store.delete(keys)
+        for key in keys:
+            self.update_monitor.current_updates.pop(key, None)
+        self.update_monitor.current_removals.update(keys)
+
+        # Aliases whose canonical page is gone need their own embeddings now
+        if orphans:
+            self.logger.info(f"Re-processing {len(orphans)} aliases of removed pages")
+            self._store_documents(self._stored_documents(orphans), force=True)
+
+    def process_scraped_data(self, records: Iterable[Dict]) -> int:
+        """Store streamed crawl records; returns the number of pages stored"""
+        def documents():
+            for record in records:
+                # Pages that answered 304 carry no content and were stored before
+                if not record.get('content'):
+                    continue
+                metadata = {
+                    'depth': record.get('depth'),
+                    'parent_url': record.get('parent_url'),
+                    'pdf_links': record.get('pdf_links', []),
+                    'simhash': record.get('simhash')
+                }
+                yield record['url'], record['content'], 'webpage', metadata
+
+        stored = self._store_documents(documents())
+        self.update_monitor.process_updates()
+        return stored
+
+    def close(self):
+        self.embedder.close()
+        if isinstance(self.model, RemoteEmbeddingModel):
+            self.model.close()
+        if self.embedding_store is not None:
+            self.embedding_store.wait()
@@ -1,48 +1,129 @@
 import hashlib
-from typing import Dict, Set
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+from typing import Dict, Iterable, NamedTuple, Optional, Set, Tuple
 import json
 import logging
 from datetime import datetime
+from src.config.settings import CHANGE_DIFF_BATCH_SIZE, CHANGE_HASH_WORKERS
+from src.storage.version_manager import DataVersionManager
+
+class ContentDiff(NamedTuple):
+    added: Set[str]
+    changed: Set[str]
+    unchanged: Set[str]
+    removed: Set[str]
+    # New hashes of added and changed content ids
+    hashes: Dict[str, str]
 
 class ContentUpdateMonitor:
-    def __init__(self, version_manager: DataVersionManager):
+    def __init__(self, version_manager: DataVersionManager, batch_size: int = CHANGE_DIFF_BATCH_SIZE,
+                 hash_workers: int = CHANGE_HASH_WORKERS):
         self.version_manager = version_manager
+        self.batch_size = batch_size
+        self.hash_workers = hash_workers
         self.logger = logging.getLogger(__name__)
         self.current_updates: Dict[str, str] = {}
-        
+        self.current_removals: Set[str] = set()
+
     def calculate_content_hash(self, content: str) -> str:
         """Calculate hash for content"""
         return hashlib.sha256(content.encode()).hexdigest()
-    
+
+    def diff_contents(self, items: Iterable[Tuple[str, str]], detect_removed: bool = False,
+                      version_id: Optional[str] = None) -> ContentDiff:
+        """Diff (content_id, content) pairs against one version in batches
+
+        Each batch is hashed on a thread pool (hashlib releases the GIL on
+        large inputs) and looked up with chunked HMGETs against the same
+        version, so a full-corpus check costs a few round trips per batch.
+        ``removed`` is only filled when ``detect_removed`` is set, i.e. when
+        ``items`` is the whole corpus.
+        """
+        if version_id is None:
+            version_id = self.version_manager.get_current_version()
+        diff = ContentDiff(set(), set(), set(), set(), {})
+        seen: Set[str] = set()
+        items = iter(items)
+
+        executor = None
+        try:
+            while True:
+                # Later duplicates of an id within a batch win
+                batch = dict(islice(items, self.batch_size))
+                if not batch:
+                    break
+                if len(batch) > 1 and self.hash_workers > 1:
+                    executor = executor or ThreadPoolExecutor(max_workers=self.hash_workers)
+                    hashes = executor.map(self.calculate_content_hash, batch.values())
+                else:
+                    hashes = map(self.calculate_content_hash, batch.values())
+                new_hashes = dict(zip(batch, hashes))
+                old_hashes = self.version_manager.get_content_hashes(list(new_hashes), version_id)
+                for content_id, new_hash in new_hashes.items():
+                    old_hash = old_hashes[content_id]
+                    if old_hash == new_hash:
+                        diff.unchanged.add(content_id)
+                        diff.hashes.pop(content_id, None)
+                        continue
+                    diff.unchanged.discard(content_id)
+                    if old_hash is None:
+                        diff.added.add(content_id)
+                    else:
+                        diff.changed.add(content_id)
+                    diff.hashes[content_id] = new_hash
+                seen.update(new_hashes)
+        finally:
+            if executor is not None:
+                executor.shutdown()
+
+        if detect_removed and version_id:
+            diff.removed.update(set(self.version_manager.resolve_all(version_id)) - seen)
+        self.logger.debug(
+            f"Diffed {len(seen)} items against {version_id}: {len(diff.added)} added, "
+            f"{len(diff.changed)} changed, {len(diff.unchanged)} unchanged, {len(diff.removed)} removed"
+        )
+        return diff
+
+    def track_content_updates(self, items: Iterable[Tuple[str, str]], detect_removed: bool = False) -> ContentDiff:
+        """Diff items and queue added, changed and removed ids for the next version"""
+        diff = self.diff_contents(items, detect_removed)
+        self.current_updates.update(diff.hashes)
+        for content_id in diff.unchanged:
+            self.current_updates.pop(content_id, None)
+        self.current_removals.difference_update(diff.hashes)
+        self.current_removals.update(diff.removed)
+        return diff
+
     def track_content_update(self, content_id: str, content: str) -> bool:
         """Track content update and return whether it has changed"""
-        new_hash = self.calculate_content_hash(content)
-        has_changed = self.version_manager.has_content_changed(content_id, new_hash)
-        
+        diff = self.track_content_updates([(content_id, content)])
+        has_changed = content_id in diff.hashes
+
         if has_changed:
-            self.current_updates[content_id] = new_hash
             self.logger.info(f"Content change detected for {content_id}")
-            
+
         return has_changed
-    
+
     def process_updates(self) -> bool:
         """Process all tracked updates"""
-        if not self.current_updates:
+        if not self.current_updates and not self.current_removals:
             return False
-            
+
         try:
             # Create new version
             new_version = self.version_manager.create_new_version()
-            
+
             # Finalize version with updates
-            self.version_manager.finalize_version(new_version, self.current_updates)
-            
+            self.version_manager.finalize_version(new_version, self.current_updates, self.current_removals)
+
             # Clear tracked updates
             self.current_updates.clear()
-            
+            self.current_removals.clear()
+
             self.logger.info(f"Successfully processed updates in version {new_version}")
             return True
-            
+
         except Exception as e:
             self.logger.error(f"Error processing updates: {e}")
             raise
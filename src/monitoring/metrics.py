@@ -0,0 +1,239 @@
+import os
+import json
+import time
+import bisect
+import logging
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+
+from src.config.settings import METRICS_TRACE_FILE
+
+# Latency bucket upper bounds in seconds, from in-memory steps to page renders
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+
+class Histogram:
+    def __init__(self, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, q: float) -> float:
+        """Upper bound of the bucket holding the q-th observation"""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return float('inf')
+
+
+class StageSpan:
+    """Mutable view of a timed stage; callers fill in items, bytes and trace fields"""
+
+    def __init__(self, items: int = 1, bytes: int = 0, fields: Optional[Dict] = None):
+        self.items = items
+        self.bytes = bytes
+        self.fields = fields or {}
+
+
+class PipelineMetrics:
+    """Latency histograms, item/byte counts and event counters per pipeline stage
+
+    Stages are free-form names (fetch, render_wait, parse, hash,
+    pdf_download, chunk, embed, redis_write); events are labelled counters
+    such as cache hits and misses. Everything is kept in process and
+    exported as Prometheus text or JSON, to a file or over HTTP. With a
+    trace path, every observation tied to a URL is also appended to a JSONL
+    trace log.
+    """
+
+    def __init__(self, trace_path: Optional[str] = None):
+        self.trace_path = trace_path
+        self.started_at = datetime.now().isoformat()
+        self.logger = logging.getLogger(__name__)
+        self._histograms: Dict[str, Histogram] = {}
+        self._items: Dict[str, int] = {}
+        self._bytes: Dict[str, int] = {}
+        self._events: Dict[Tuple[str, Tuple], float] = {}
+        self._lock = threading.Lock()
+        self._trace_file = None
+
+    def observe(self, stage: str, seconds: float, items: int = 1, bytes: int = 0,
+                url: Optional[str] = None, **fields):
+        with self._lock:
+            histogram = self._histograms.get(stage)
+            if histogram is None:
+                histogram = self._histograms[stage] = Histogram()
+            histogram.observe(seconds)
+            self._items[stage] = self._items.get(stage, 0) + items
+            self._bytes[stage] = self._bytes.get(stage, 0) + bytes
+        if url is not None and self.trace_path:
+            self.trace(url, stage, seconds, items=items, bytes=bytes, **fields)
+
+    @contextmanager
+    def time(self, stage: str, url: Optional[str] = None, items: int = 1, bytes: int = 0, **fields):
+        """Time a block as one observation of ``stage``"""
+        span = StageSpan(items, bytes, fields)
+        started = time.perf_counter()
+        try:
+            yield span
+        except Exception:
+            self.incr('stage_errors', stage=stage)
+            span.fields['error'] = True
+            raise
+        finally:
+            self.observe(stage, time.perf_counter() - started, span.items, span.bytes, url, **span.fields)
+
+    def incr(self, event: str, value: float = 1, **labels):
+        key = (event, tuple(sorted(labels.items())))
+        with self._lock:
+            self._events[key] = self._events.get(key, 0) + value
+
+    def trace(self, url: str, stage: str, seconds: float, **fields):
+        entry = {'ts': datetime.now().isoformat(), 'url': url, 'stage': stage,
+                 'seconds': round(seconds, 6), **fields}
+        line = json.dumps(entry, default=str) + '\n'
+        with self._lock:
+            if self._trace_file is None:
+                directory = os.path.dirname(self.trace_path)
+                if directory:
+                    os.makedirs(directory, exist_ok=True)
+                self._trace_file = open(self.trace_path, 'a', encoding='utf-8', buffering=1)
+            self._trace_file.write(line)
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            stages = {
+                stage: {
+                    'count': histogram.count,
+                    'seconds_total': histogram.sum,
+                    'seconds_avg': histogram.sum / histogram.count if histogram.count else 0.0,
+                    'seconds_p50': histogram.quantile(0.5),
+                    'seconds_p95': histogram.quantile(0.95),
+                    'items': self._items.get(stage, 0),
+                    'bytes': self._bytes.get(stage, 0),
+                    'buckets': dict(zip([str(b) for b in histogram.buckets] + ['+Inf'], histogram.counts))
+                }
+                for stage, histogram in self._histograms.items()
+            }
+            events = [{'event': event, 'labels': dict(labels), 'value': value}
+                      for (event, labels), value in self._events.items()]
+
+        # Hit rates for every <name>_hit / <name>_miss event pair
+        totals: Dict[str, float] = {}
+        for entry in events:
+            totals[entry['event']] = totals.get(entry['event'], 0) + entry['value']
+        hit_rates = {}
+        for event, hits in totals.items():
+            if event.endswith('_hit'):
+                name = event[:-len('_hit')]
+                lookups = hits + totals.get(f"{name}_miss", 0)
+                hit_rates[name] = hits / lookups if lookups else 0.0
+        return {'started_at': self.started_at, 'stages': stages, 'events': events, 'hit_rates': hit_rates}
+
+    def to_prometheus(self) -> str:
+        snapshot = self.snapshot()
+        lines: List[str] = [
+            '# HELP pipeline_stage_seconds Time spent per pipeline stage',
+            '# TYPE pipeline_stage_seconds histogram'
+        ]
+        for stage, stats in snapshot['stages'].items():
+            cumulative = 0
+            for bound, count in stats['buckets'].items():
+                cumulative += count
+                lines.append(f'pipeline_stage_seconds_bucket{{stage="{stage}",le="{bound}"}} {cumulative}')
+            lines.append(f'pipeline_stage_seconds_sum{{stage="{stage}"}} {stats["seconds_total"]}')
+            lines.append(f'pipeline_stage_seconds_count{{stage="{stage}"}} {stats["count"]}')
+        for metric, field, help_text in (
+            ('pipeline_stage_items_total', 'items', 'Items processed per pipeline stage'),
+            ('pipeline_stage_bytes_total', 'bytes', 'Bytes processed per pipeline stage'),
+        ):
+            lines += [f'# HELP {metric} {help_text}', f'# TYPE {metric} counter']
+            lines += [f'{metric}{{stage="{stage}"}} {stats[field]}' for stage, stats in snapshot['stages'].items()]
+        lines += ['# HELP pipeline_events_total Labelled pipeline events', '# TYPE pipeline_events_total counter']
+        for entry in snapshot['events']:
+            labels = ''.join(f',{key}="{value}"' for key, value in entry['labels'].items())
+            lines.append(f'pipeline_events_total{{event="{entry["event"]}"{labels}}} {entry["value"]}')
+        lines += ['# HELP pipeline_cache_hit_ratio Cache hit ratio', '# TYPE pipeline_cache_hit_ratio gauge']
+        lines += [f'pipeline_cache_hit_ratio{{cache="{name}"}} {rate}' for name, rate in snapshot['hit_rates'].items()]
+        return '\n'.join(lines) + '\n'
+
+    def to_json(self) -> str:
+        return json.dumps(self.snapshot(), indent=2)
+
+    def write(self, path: str):
+        """Atomically write Prometheus text, or JSON when the path ends in .json"""
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        body = self.to_json() if path.endswith('.json') else self.to_prometheus()
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(body)
+        os.replace(tmp_path, path)
+
+    def summary(self) -> str:
+        """One line per stage, slowest total first"""
+        stages = sorted(self.snapshot()['stages'].items(), key=lambda item: -item[1]['seconds_total'])
+        return '\n'.join(
+            f"{stage:<14} {stats['count']:>7} calls {stats['seconds_total']:>9.2f}s total "
+            f"{stats['seconds_avg'] * 1000:>8.1f}ms avg  p95<={stats['seconds_p95']}s "
+            f"{stats['items']:>8} items {stats['bytes'] / 1024:>10.0f} KiB"
+            for stage, stats in stages
+        )
+
+    def report(self, path: Optional[str] = None):
+        """Log the per-stage summary and write the metrics file"""
+        summary = self.summary()
+        if summary:
+            self.logger.info(f"Pipeline stage timings:\n{summary}")
+        if path:
+            try:
+                self.write(path)
+            except OSError as e:
+                self.logger.warning(f"Could not write metrics to {path}: {e}")
+
+    def serve(self, port: int, host: str = '0.0.0.0') -> ThreadingHTTPServer:
+        """Serve /metrics (Prometheus text) and /metrics.json from a background thread"""
+        registry = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.startswith('/metrics.json'):
+                    body, content_type = registry.to_json(), 'application/json'
+                elif self.path.startswith('/metrics'):
+                    body, content_type = registry.to_prometheus(), 'text/plain; version=0.0.4'
+                else:
+                    self.send_error(404)
+                    return
+                data = body.encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, format, *args):
+                pass
+
+        server = ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.logger.info(f"Serving pipeline metrics on port {port}")
+        return server
+
+
+# Process-wide registry the pipeline stages report to
+metrics = PipelineMetrics(trace_path=METRICS_TRACE_FILE)
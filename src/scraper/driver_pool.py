@@ -0,0 +1,128 @@
+import queue
+import logging
+import threading
+from typing import Callable, Dict, Iterable, List, Optional
+
+
+class PooledDriver:
+    def __init__(self, driver):
+        self.driver = driver
+        self.pages_served = 0
+
+
+class DriverPool:
+    """Pool of reusable headless browsers sharing one work queue
+
+    Each worker thread checks a driver out of the pool, renders pages until
+    the queue is empty, and hands the driver back. Drivers are health
+    checked before use and recycled after ``max_pages_per_driver`` pages or
+    as soon as a page crashes or times out, so one hung page only costs a
+    browser restart instead of the whole run.
+    """
+
+    def __init__(self, driver_factory: Callable, size: int = 2,
+                 max_pages_per_driver: int = 50, page_timeout: int = 60):
+        self.driver_factory = driver_factory
+        self.size = max(1, size)
+        self.max_pages_per_driver = max_pages_per_driver
+        self.page_timeout = page_timeout
+        self.logger = logging.getLogger(__name__)
+
+        self._idle: List[PooledDriver] = []
+        self._lock = threading.Lock()
+
+    def _create(self) -> PooledDriver:
+        driver = self.driver_factory()
+        driver.set_page_load_timeout(self.page_timeout)
+        driver.set_script_timeout(self.page_timeout)
+        return PooledDriver(driver)
+
+    def _is_healthy(self, pooled: PooledDriver) -> bool:
+        try:
+            pooled.driver.execute_script("return document.readyState")
+            return True
+        except Exception:
+            return False
+
+    def _discard(self, pooled: Optional[PooledDriver]):
+        if pooled is None:
+            return
+        try:
+            pooled.driver.quit()
+        except Exception as e:
+            self.logger.warning(f"Error shutting down browser: {e}")
+
+    def _checkout(self) -> PooledDriver:
+        while True:
+            with self._lock:
+                pooled = self._idle.pop() if self._idle else None
+            if pooled is None:
+                return self._create()
+            if self._is_healthy(pooled):
+                return pooled
+            self.logger.warning("Discarding unhealthy browser")
+            self._discard(pooled)
+
+    def _checkin(self, pooled: PooledDriver):
+        if pooled.pages_served >= self.max_pages_per_driver:
+            self.logger.info(f"Recycling browser after {pooled.pages_served} pages")
+            self._discard(pooled)
+            return
+        with self._lock:
+            self._idle.append(pooled)
+
+    def _worker(self, work: queue.Queue, render_fn: Callable, results: Dict[str, str]):
+        pooled = None
+        while True:
+            try:
+                url = work.get_nowait()
+            except queue.Empty:
+                break
+
+            try:
+                if pooled is None:
+                    pooled = self._checkout()
+                results[url] = render_fn(pooled.driver, url)
+                pooled.pages_served += 1
+            except Exception as e:
+                # The browser may be wedged after a crash or timeout; start fresh
+                self.logger.error(f"Error rendering {url}: {e}")
+                self._discard(pooled)
+                pooled = None
+                continue
+
+            if pooled.pages_served >= self.max_pages_per_driver:
+                self._checkin(pooled)
+                pooled = None
+
+        if pooled is not None:
+            self._checkin(pooled)
+
+    def render_all(self, urls: Iterable[str], render_fn: Callable) -> Dict[str, str]:
+        """Render URLs in parallel with render_fn(driver, url) and return url -> result
+
+        URLs that fail to render are left out of the result.
+        """
+        work = queue.Queue()
+        for url in dict.fromkeys(urls):
+            work.put(url)
+        if work.empty():
+            return {}
+
+        results: Dict[str, str] = {}
+        workers = [
+            threading.Thread(target=self._worker, args=(work, render_fn, results), daemon=True)
+            for _ in range(min(self.size, work.qsize()))
+        ]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        return results
+
+    def close(self):
+        """Quit all idle browsers"""
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for pooled in idle:
+            self._discard(pooled)
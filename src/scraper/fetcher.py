@@ -0,0 +1,243 @@
+import asyncio
+import re
+import time
+import logging
+from fnmatch import fnmatch
+from typing import Dict, Iterable, List, Optional
+from urllib.parse import urlparse
+
+import aiohttp
+
+from src.monitoring.metrics import metrics
+from src.scraper.politeness import BACKOFF_STATUSES, Politeness, origin_of, parse_retry_after
+from src.storage.page_state import PageStateStore
+
+DEFAULT_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (compatible; WebsiteMonitor/1.0)',
+    'Accept': 'text/html,application/xhtml+xml;q=0.9,*/*;q=0.8',
+}
+
+# Markers of pages that only produce their content once JavaScript has run
+JS_SHELL_PATTERNS = [
+    re.compile(r'<noscript[^>]*>[^<]*(enable|requires?)\s+javascript', re.I),
+    re.compile(r'<div[^>]+id=["\'](root|app|__next|__nuxt)["\'][^>]*>\s*</div>', re.I),
+]
+SCRIPT_RE = re.compile(r'<script\b[^>]*>.*?</script>', re.I | re.S)
+STYLE_RE = re.compile(r'<style\b[^>]*>.*?</style>', re.I | re.S)
+TAG_RE = re.compile(r'<[^>]+>')
+
+
+class RenderRules:
+    """Per-URL rules deciding whether a page must go through the browser"""
+
+    def __init__(self, always_render: Optional[List[str]] = None,
+                 never_render: Optional[List[str]] = None):
+        self.always_render = always_render or []
+        self.never_render = never_render or []
+
+    @staticmethod
+    def _matches(url: str, patterns: List[str]) -> bool:
+        return any(fnmatch(url, pattern) for pattern in patterns)
+
+    def forced(self, url: str) -> Optional[bool]:
+        """Return True/False when a rule decides, None to fall back to detection"""
+        if self._matches(url, self.never_render):
+            return False
+        if self._matches(url, self.always_render):
+            return True
+        return None
+
+
+class FetchResult:
+    def __init__(self, url: str, status: int = 0, html: str = '',
+                 headers: Optional[Dict[str, str]] = None, final_url: Optional[str] = None,
+                 needs_render: bool = False, error: Optional[str] = None, elapsed: float = 0.0):
+        self.url = url
+        self.status = status
+        self.html = html
+        self.headers = headers or {}
+        self.final_url = final_url or url
+        self.needs_render = needs_render
+        self.error = error
+        self.elapsed = elapsed
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None and 200 <= self.status < 300
+
+    @property
+    def not_modified(self) -> bool:
+        return self.status == 304
+
+
+def looks_js_dependent(html: str, min_text_length: int = 200) -> bool:
+    """Heuristically detect pages whose content is produced client-side"""
+    if any(pattern.search(html) for pattern in JS_SHELL_PATTERNS):
+        return True
+
+    scripts = SCRIPT_RE.findall(html)
+    stripped = STYLE_RE.sub(' ', SCRIPT_RE.sub(' ', html))
+    text = ' '.join(TAG_RE.sub(' ', stripped).split())
+    if len(text) < min_text_length and scripts:
+        return True
+
+    # Mostly script payload with very little readable text
+    script_length = sum(len(s) for s in scripts)
+    return script_length > 20 * max(len(text), 1)
+
+
+class StaticFetcher:
+    """Concurrent HTTP fetch tier over a pooled keep-alive session
+
+    Pages are fetched without a browser. Results are flagged with
+    ``needs_render`` when a rule or the JS heuristic says the static HTML
+    is not enough, so callers only pay for Selenium on those pages. With a
+    page-state store, revisits are conditional requests and unchanged pages
+    come back as 304 without a body. With a ``Politeness`` policy, requests
+    wait on their host's adaptive limiter instead of a fixed per-host
+    semaphore, robots.txt-disallowed URLs are skipped, and 429/5xx answers
+    are retried up to ``max_retries`` times once the host has backed off.
+    """
+
+    def __init__(self, max_concurrency: int = 32, per_host_concurrency: int = 8,
+                 timeout: float = 20.0, render_rules: Optional[RenderRules] = None,
+                 headers: Optional[Dict[str, str]] = None,
+                 page_state: Optional[PageStateStore] = None,
+                 politeness: Optional[Politeness] = None, max_retries: int = 2):
+        self.max_concurrency = max_concurrency
+        self.per_host_concurrency = per_host_concurrency
+        self.timeout = timeout
+        self.render_rules = render_rules or RenderRules()
+        self.headers = {**DEFAULT_HEADERS, **(headers or {})}
+        self.page_state = page_state
+        self.politeness = politeness
+        self.max_retries = max_retries
+        self.logger = logging.getLogger(__name__)
+
+        # A dedicated loop keeps the session (and its keep-alive connections)
+        # alive across the synchronous fetch_many() calls made by the crawler
+        self._loop = asyncio.new_event_loop()
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._host_semaphores: Dict[str, asyncio.Semaphore] = {}
+
+    async def _get_session(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=self.max_concurrency,
+                limit_per_host=self.per_host_concurrency,
+                keepalive_timeout=30
+            )
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                headers=self.headers,
+                timeout=aiohttp.ClientTimeout(total=self.timeout)
+            )
+        return self._session
+
+    def _host_semaphore(self, url: str) -> asyncio.Semaphore:
+        host = urlparse(url).netloc
+        if host not in self._host_semaphores:
+            self._host_semaphores[host] = asyncio.Semaphore(self.per_host_concurrency)
+        return self._host_semaphores[host]
+
+    async def _request(self, session: aiohttp.ClientSession, url: str,
+                       conditional: Dict[str, str]) -> FetchResult:
+        started = time.monotonic()
+        limiter = self.politeness.limiter(url) if self.politeness is not None else None
+        try:
+            if limiter is not None:
+                await limiter.acquire_async()
+                started = time.monotonic()
+                result = await self._get(session, url, conditional, started)
+            else:
+                async with self._host_semaphore(url):
+                    result = await self._get(session, url, conditional, started)
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            if limiter is not None:
+                limiter.release(error=True)
+            self.logger.warning(f"Static fetch failed for {url}: {e}")
+            metrics.observe('fetch', time.monotonic() - started, url=url, error=str(e))
+            metrics.incr('http_responses', status='error')
+            # Let the browser have a go before giving up on the page
+            return FetchResult(url, needs_render=True, error=str(e),
+                               elapsed=time.monotonic() - started)
+        metrics.observe('fetch', result.elapsed, bytes=len(result.html), url=url, status=result.status)
+        metrics.incr('http_responses', status=result.status)
+        if limiter is not None:
+            retry_after = None
+            if result.status in BACKOFF_STATUSES:
+                retry_after = parse_retry_after(result.headers.get('Retry-After'))
+            limiter.release(result.status, result.elapsed, retry_after=retry_after)
+        return result
+
+    async def _get(self, session: aiohttp.ClientSession, url: str, conditional: Dict[str, str],
+                   started: float) -> FetchResult:
+        async with session.get(url, allow_redirects=True, headers=conditional) as response:
+            content_type = response.headers.get('Content-Type', '')
+            html = ''
+            if 'html' in content_type and response.status != 304:
+                html = await response.text(errors='replace')
+            return FetchResult(
+                url,
+                status=response.status,
+                html=html,
+                headers=dict(response.headers),
+                final_url=str(response.url),
+                elapsed=time.monotonic() - started
+            )
+
+    async def _fetch(self, url: str) -> FetchResult:
+        if self.politeness is not None and not self.politeness.allowed(url):
+            self.logger.info(f"Skipping {url}: disallowed by robots.txt")
+            return FetchResult(url, error='disallowed by robots.txt')
+
+        forced = self.render_rules.forced(url)
+        conditional = self.page_state.conditional_headers(url) if self.page_state else {}
+        if forced and not conditional:
+            return FetchResult(url, needs_render=True)
+
+        session = await self._get_session()
+        attempts = self.max_retries + 1 if self.politeness is not None else 1
+        for attempt in range(attempts):
+            result = await self._request(session, url, conditional)
+            if result.status not in BACKOFF_STATUSES or attempt == attempts - 1:
+                break
+            self.logger.info(f"HTTP {result.status} from {url}, retrying after backoff")
+        if result.error:
+            return result
+
+        if result.not_modified:
+            return result
+        if forced:
+            # Only revalidated here; the body still has to come from the browser
+            result.needs_render = True
+        elif result.ok and result.html and forced is None:
+            result.needs_render = looks_js_dependent(result.html)
+        return result
+
+    async def _fetch_all(self, urls: List[str]) -> List[FetchResult]:
+        if self.politeness is not None:
+            # robots.txt is fetched once per new origin, off the event loop
+            origins = {origin_of(url): url for url in urls if not self.politeness.is_ready(url)}
+            await asyncio.gather(*(
+                self._loop.run_in_executor(None, self.politeness.prepare, url) for url in origins.values()
+            ))
+        return await asyncio.gather(*(self._fetch(url) for url in urls))
+
+    def fetch_many(self, urls: Iterable[str]) -> Dict[str, FetchResult]:
+        """Fetch URLs concurrently and return results keyed by URL"""
+        urls = list(dict.fromkeys(urls))
+        if not urls:
+            return {}
+        results = self._loop.run_until_complete(self._fetch_all(urls))
+        return {result.url: result for result in results}
+
+    def fetch(self, url: str) -> FetchResult:
+        return self.fetch_many([url])[url]
+
+    def close(self):
+        """Release pooled connections; the fetcher can still be reused afterwards"""
+        if self._session is not None and not self._session.closed:
+            self._loop.run_until_complete(self._session.close())
+        self._session = None
+        self._host_semaphores.clear()
@@ -0,0 +1,140 @@
+import os
+import json
+import logging
+from collections import deque
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from src.scraper.scraper_utils import canonicalize_url, same_domain
+
+
+class CrawlFrontier:
+    """Iterative crawl queue with canonical-URL dedupe, budgets and checkpoints
+
+    URLs are canonicalized and deduplicated when they are enqueued, so the
+    queue never holds the same page twice and never grows past the page
+    budget. The queue, the seen set and any pages that were handed out but
+    not yet marked done can be checkpointed to disk, letting an interrupted
+    crawl pick up where it left off.
+    """
+
+    def __init__(self, start_url: str, max_pages: int = 1000, max_depth: Optional[int] = None,
+                 allowed_domain: Optional[str] = None, checkpoint_path: Optional[str] = None,
+                 checkpoint_every: int = 100, seeds: Optional[List[str]] = None):
+        self.start_url = canonicalize_url(start_url)
+        self.max_pages = max_pages
+        self.max_depth = max_depth
+        self.allowed_domain = allowed_domain
+        self.checkpoint_path = checkpoint_path
+        self.checkpoint_every = checkpoint_every
+        self.logger = logging.getLogger(__name__)
+
+        self.queue: deque = deque()
+        self.seen = set()
+        self.in_progress: Dict[str, Tuple[int, Optional[str]]] = {}
+        self.completed = 0
+        self.meta: Dict = {}
+        self._since_checkpoint = 0
+
+        self.resumed = self._load_checkpoint()
+        if not self.resumed:
+            self.add_links(seeds if seeds is not None else [self.start_url], 0)
+
+    def __len__(self):
+        return len(self.queue)
+
+    def __bool__(self):
+        return bool(self.queue)
+
+    def add(self, url: str, depth: int, parent: Optional[str] = None) -> bool:
+        """Enqueue a URL unless it was seen before or falls outside the budgets"""
+        if self.max_depth is not None and depth > self.max_depth:
+            return False
+        url = canonicalize_url(url)
+        if not url.startswith(('http://', 'https://')):
+            return False
+        if self.allowed_domain and not same_domain(url, self.allowed_domain):
+            return False
+        if url in self.seen or len(self.seen) >= self.max_pages:
+            return False
+
+        self.seen.add(url)
+        self.queue.append((url, depth, parent))
+        return True
+
+    def add_links(self, links: List[str], depth: int, parent: Optional[str] = None) -> int:
+        return sum(self.add(link, depth, parent) for link in links)
+
+    def pop(self) -> Optional[Tuple[str, int, Optional[str]]]:
+        """Take the next (url, depth, parent) off the queue"""
+        if not self.queue:
+            return None
+        url, depth, parent = self.queue.popleft()
+        self.in_progress[url] = (depth, parent)
+        return url, depth, parent
+
+    def pop_batch(self, size: int) -> List[Tuple[str, int, Optional[str]]]:
+        batch = []
+        while self.queue and len(batch) < size:
+            batch.append(self.pop())
+        return batch
+
+    def done(self, url: str):
+        """Mark a popped URL as fully processed"""
+        if self.in_progress.pop(canonicalize_url(url), None) is not None:
+            self.completed += 1
+            self._since_checkpoint += 1
+
+    @property
+    def checkpoint_due(self) -> bool:
+        return bool(self.checkpoint_path) and self._since_checkpoint >= self.checkpoint_every
+
+    def checkpoint(self):
+        """Atomically write the frontier state to disk"""
+        if not self.checkpoint_path:
+            return
+        # Pages handed out but not finished are put back at the front on resume
+        pending = [(url, depth, parent) for url, (depth, parent) in self.in_progress.items()]
+        state = {
+            'start_url': self.start_url,
+            'saved_at': datetime.now().isoformat(),
+            'completed': self.completed,
+            'queue': pending + list(self.queue),
+            'seen': list(self.seen),
+            'meta': self.meta
+        }
+        tmp_path = f"{self.checkpoint_path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(state, f)
+        os.replace(tmp_path, self.checkpoint_path)
+        self._since_checkpoint = 0
+
+    def clear_checkpoint(self):
+        """Remove the checkpoint once a crawl has finished"""
+        if self.checkpoint_path and os.path.exists(self.checkpoint_path):
+            os.remove(self.checkpoint_path)
+
+    def _load_checkpoint(self) -> bool:
+        if not self.checkpoint_path:
+            return False
+        try:
+            with open(self.checkpoint_path, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+        except FileNotFoundError:
+            return False
+        except (ValueError, OSError) as e:
+            self.logger.warning(f"Ignoring unreadable crawl checkpoint: {e}")
+            return False
+
+        if state.get('start_url') != self.start_url:
+            return False
+
+        self.queue = deque(tuple(item) for item in state['queue'])
+        self.seen = set(state['seen'])
+        self.completed = state.get('completed', 0)
+        self.meta = state.get('meta', {})
+        self.logger.info(
+            f"Resuming crawl from checkpoint saved at {state.get('saved_at')}: "
+            f"{self.completed} pages done, {len(self.queue)} queued"
+        )
+        return True
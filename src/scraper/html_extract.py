@@ -0,0 +1,142 @@
+from functools import lru_cache
+from html.parser import HTMLParser
+from typing import Dict, FrozenSet, List, NamedTuple, Optional
+from urllib.parse import urljoin, urlparse
+
+from src.monitoring.metrics import metrics
+
+DEFAULT_SKIP_TAGS = frozenset({'script', 'style', 'noscript', 'template'})
+
+
+class PageExtract(NamedTuple):
+    title: Optional[str]
+    text: str
+    links: List[str]
+    pdf_links: List[str]
+
+
+def is_pdf_link(url: str) -> bool:
+    return urlparse(url).path.lower().endswith('.pdf')
+
+
+class _ExtractTarget:
+    """Parser target that collects text, title and links as events stream past"""
+
+    def __init__(self, base_url: str, skip_tags: FrozenSet[str]):
+        self.base_url = base_url
+        self.skip_tags = skip_tags
+        self.skip_depth = 0
+        self.in_title = False
+        self.title_parts: List[str] = []
+        self.text_parts: List[str] = []
+        self.pending: List[str] = []
+        self.links: Dict[str, None] = {}
+
+    def _flush_text(self):
+        # Parsers may hand one text node over in pieces (lxml splits at every
+        # entity), so pieces are joined before the node is stripped
+        if self.pending:
+            stripped = ''.join(self.pending).strip()
+            if stripped:
+                self.text_parts.append(stripped)
+            self.pending = []
+
+    def start(self, tag: str, attrib):
+        self._flush_text()
+        if tag in self.skip_tags:
+            self.skip_depth += 1
+        elif tag == 'title':
+            self.in_title = True
+        elif tag == 'a':
+            href = attrib.get('href')
+            if href and href.strip():
+                self.links.setdefault(urljoin(self.base_url, href.strip()), None)
+
+    def end(self, tag: str):
+        self._flush_text()
+        if tag in self.skip_tags:
+            self.skip_depth = max(self.skip_depth - 1, 0)
+        elif tag == 'title':
+            self.in_title = False
+
+    def data(self, data: str):
+        if self.skip_depth:
+            return
+        if self.in_title:
+            self.title_parts.append(data)
+        self.pending.append(data)
+
+    def comment(self, text: str):
+        self._flush_text()
+
+    def close(self) -> PageExtract:
+        self._flush_text()
+        title = ''.join(self.title_parts).strip() or None
+        links = list(self.links)
+        return PageExtract(title, ' '.join(self.text_parts), links, [link for link in links if is_pdf_link(link)])
+
+
+class _StdlibParser(HTMLParser):
+    def __init__(self, target: _ExtractTarget):
+        super().__init__(convert_charrefs=True)
+        self.target = target
+
+    def handle_starttag(self, tag, attrs):
+        self.target.start(tag, dict(attrs))
+
+    def handle_startendtag(self, tag, attrs):
+        # Self-closing tags have no content to skip
+        if tag not in self.target.skip_tags:
+            self.target.start(tag, dict(attrs))
+
+    def handle_endtag(self, tag):
+        self.target.end(tag)
+
+    def handle_data(self, data):
+        self.target.data(data)
+
+    def handle_comment(self, data):
+        self.target.comment(data)
+
+
+def _extract_stdlib(html: str, target: _ExtractTarget) -> PageExtract:
+    parser = _StdlibParser(target)
+    parser.feed(html)
+    parser.close()
+    return target.close()
+
+
+def _extract_lxml(html: str, target: _ExtractTarget) -> PageExtract:
+    from lxml import etree
+
+    parser = etree.HTMLParser(target=target)
+    parser.feed(html)
+    return parser.close()
+
+
+@lru_cache(maxsize=None)
+def lxml_available() -> bool:
+    try:
+        import lxml.etree  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def extract_page(html: str, base_url: str, skip_tags: FrozenSet[str] = DEFAULT_SKIP_TAGS,
+                 backend: str = 'auto') -> PageExtract:
+    """Title, visible text, links and PDF links from one streaming pass over the HTML
+
+    ``backend`` is 'lxml', 'stdlib' or 'auto' (lxml when installed). Text
+    inside ``skip_tags`` is dropped; the remaining text nodes are stripped
+    and joined with single spaces, matching BeautifulSoup's
+    ``get_text(' ', strip=True)``.
+    """
+    target = _ExtractTarget(base_url, frozenset(skip_tags))
+    if backend == 'auto':
+        backend = 'lxml' if lxml_available() else 'stdlib'
+    extract = {'lxml': _extract_lxml, 'stdlib': _extract_stdlib}.get(backend)
+    if extract is None:
+        raise ValueError(f"Unknown HTML parser backend {backend!r}")
+    with metrics.time('parse', url=base_url, bytes=len(html), backend=backend):
+        return extract(html, target)
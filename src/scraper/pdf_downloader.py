@@ -0,0 +1,227 @@
+import os
+import json
+import hashlib
+import logging
+import tempfile
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime
+from typing import Dict, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from src.monitoring.metrics import metrics
+from src.scraper.politeness import Politeness
+
+CHUNK_SIZE = 64 * 1024
+
+
+class PDFDownloader:
+    """Concurrent, streaming, content-addressed PDF downloads
+
+    Downloads run on a thread pool so the crawl only has to submit URLs.
+    Bodies are streamed through a temp file in ``pdf_dir`` while being
+    hashed, then atomically renamed to ``<sha256>.pdf``. A manifest maps
+    each URL to its file and HTTP validators so unchanged PDFs are skipped
+    on later runs. With a ``Politeness`` policy, requests wait on their
+    host's adaptive limiter and robots.txt-disallowed PDFs are skipped.
+    """
+
+    def __init__(self, pdf_dir: str, max_workers: int = 4, max_size_mb: float = 50,
+                 timeout: float = 60.0, manifest_path: Optional[str] = None,
+                 politeness: Optional[Politeness] = None):
+        self.pdf_dir = pdf_dir
+        self.max_bytes = int(max_size_mb * 1024 * 1024)
+        self.timeout = timeout
+        self.politeness = politeness
+        self.manifest_path = manifest_path or os.path.join(pdf_dir, 'manifest.json')
+        self.logger = logging.getLogger(__name__)
+        os.makedirs(pdf_dir, exist_ok=True)
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=max_workers, pool_maxsize=max_workers)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+        self.max_workers = max_workers
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._futures: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+        self.manifest: Dict[str, Dict] = self._load_manifest()
+
+    def _load_manifest(self) -> Dict[str, Dict]:
+        try:
+            with open(self.manifest_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return {}
+
+    def save_manifest(self):
+        with self._lock:
+            data = json.dumps(self.manifest)
+        tmp_path = f"{self.manifest_path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(data)
+        os.replace(tmp_path, self.manifest_path)
+
+    def path_for(self, url: str) -> Optional[str]:
+        entry = self.manifest.get(url)
+        return os.path.join(self.pdf_dir, entry['file']) if entry else None
+
+    def submit(self, url: str) -> Future:
+        """Queue a download; repeated URLs share one future"""
+        with self._lock:
+            if url not in self._futures:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(max_workers=self.max_workers)
+                self._futures[url] = self._executor.submit(self._download, url)
+            return self._futures[url]
+
+    def wait(self) -> Dict[str, Dict]:
+        """Wait for queued downloads, persist the manifest and return results by URL"""
+        with self._lock:
+            futures, self._futures = self._futures, {}
+        results = {url: future.result() for url, future in futures.items()}
+        if results:
+            self.save_manifest()
+        return results
+
+    def close(self):
+        self.wait()
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+    def _result(self, url: str, status: str, entry: Optional[Dict] = None) -> Dict:
+        result = {'url': url, 'status': status, 'path': None, 'sha256': None}
+        if entry:
+            result['path'] = os.path.join(self.pdf_dir, entry['file'])
+            result['sha256'] = entry['sha256']
+        return result
+
+    def _request(self, method: str, url: str, **kwargs) -> requests.Response:
+        if self.politeness is None:
+            return self.session.request(method, url, **kwargs)
+        with self.politeness.request(url) as slot:
+            response = self.session.request(method, url, **kwargs)
+            slot.response(response.status_code, response.headers)
+        return response
+
+    def _is_unchanged(self, url: str, entry: Dict) -> bool:
+        """HEAD check for servers that send no ETag/Last-Modified"""
+        response = self._request('HEAD', url, timeout=self.timeout, allow_redirects=True)
+        length = response.headers.get('Content-Length')
+        if not response.ok or length is None:
+            return False
+        try:
+            return int(length) == entry.get('content_length')
+        except ValueError:
+            # A malformed length proves nothing; download the PDF again
+            self.logger.warning(f"Invalid Content-Length {length!r} for {url}, treating it as changed")
+            return False
+
+    def _download(self, url: str) -> Dict:
+        with metrics.time('pdf_download', url=url) as span:
+            result = self._fetch_pdf(url)
+            span.fields['status'] = result['status']
+            if result['status'] in ('downloaded', 'duplicate'):
+                span.bytes = os.path.getsize(result['path'])
+        metrics.incr('pdf_downloads', status=result['status'])
+        return result
+
+    def _fetch_pdf(self, url: str) -> Dict:
+        with self._lock:
+            entry = dict(self.manifest.get(url) or {})
+        have_file = bool(entry) and os.path.exists(os.path.join(self.pdf_dir, entry['file']))
+
+        headers = {}
+        if have_file:
+            if entry.get('etag'):
+                headers['If-None-Match'] = entry['etag']
+            if entry.get('last_modified'):
+                headers['If-Modified-Since'] = entry['last_modified']
+
+        try:
+            if self.politeness is not None and not self.politeness.allowed(url):
+                self.logger.info(f"Skipping {url}: disallowed by robots.txt")
+                return self._result(url, 'skipped')
+
+            if have_file and not headers and self._is_unchanged(url, entry):
+                return self._result(url, 'unchanged', entry)
+
+            with self._request('GET', url, headers=headers, stream=True, timeout=self.timeout) as response:
+                if response.status_code == 304:
+                    return self._result(url, 'unchanged', entry)
+                if response.status_code != 200:
+                    self.logger.warning(f"Failed to download {url}: HTTP {response.status_code}")
+                    return self._result(url, 'failed')
+
+                length = response.headers.get('Content-Length')
+                if length and length.isdigit() and int(length) > self.max_bytes:
+                    self.logger.warning(f"Skipping {url}: {length} bytes exceeds size cap")
+                    return self._result(url, 'skipped')
+
+                sha256, size, tmp_path = self._stream_to_temp(response)
+                if tmp_path is None:
+                    self.logger.warning(f"Skipping {url}: body exceeds size cap")
+                    return self._result(url, 'skipped')
+
+                filename = f"{sha256}.pdf"
+                final_path = os.path.join(self.pdf_dir, filename)
+                entry = {
+                    'file': filename,
+                    'sha256': sha256,
+                    'content_length': size,
+                    'etag': response.headers.get('ETag'),
+                    'last_modified': response.headers.get('Last-Modified'),
+                    'downloaded_at': datetime.now().isoformat()
+                }
+                # Under the lock so a superseded file can't be removed as another URL claims it
+                with self._lock:
+                    if os.path.exists(final_path):
+                        # Same bytes already stored under another URL or an earlier run
+                        os.remove(tmp_path)
+                        status = 'duplicate'
+                    else:
+                        os.replace(tmp_path, final_path)
+                        status = 'downloaded'
+                    previous = self.manifest.get(url)
+                    self.manifest[url] = entry
+                    self._remove_superseded(previous)
+                return self._result(url, status, entry)
+
+        except (requests.RequestException, OSError) as e:
+            self.logger.error(f"Failed to download {url}: {e}")
+            return self._result(url, 'failed')
+
+    def _remove_superseded(self, previous: Optional[Dict]):
+        """Delete a URL's previous file once no manifest entry points to it; call with the lock held"""
+        if not previous or any(entry['file'] == previous['file'] for entry in self.manifest.values()):
+            return
+        try:
+            os.remove(os.path.join(self.pdf_dir, previous['file']))
+            self.logger.info(f"Removed superseded {previous['file']}")
+        except FileNotFoundError:
+            pass
+
+    def _stream_to_temp(self, response):
+        """Write the body to a temp file in chunks; returns (sha256, size, path)"""
+        digest = hashlib.sha256()
+        size = 0
+        fd, tmp_path = tempfile.mkstemp(dir=self.pdf_dir, suffix='.part')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+                    size += len(chunk)
+                    if size > self.max_bytes:
+                        raise OverflowError
+                    digest.update(chunk)
+                    f.write(chunk)
+        except OverflowError:
+            os.remove(tmp_path)
+            return None, size, None
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+        return digest.hexdigest(), size, tmp_path
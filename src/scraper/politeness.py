@@ -0,0 +1,275 @@
+import time
+import asyncio
+import logging
+import threading
+from contextlib import contextmanager
+from email.utils import parsedate_to_datetime
+from typing import Dict, Optional
+from urllib.parse import urlsplit
+from urllib.robotparser import RobotFileParser
+
+import requests
+
+ROBOTS_USER_AGENT = 'WebsiteMonitor'
+# Responses that mean the server wants us to slow down
+BACKOFF_STATUSES = (429, 500, 502, 503, 504)
+
+
+def origin_of(url: str) -> str:
+    parts = urlsplit(url)
+    return f"{parts.scheme}://{parts.netloc}"
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Seconds to wait from a Retry-After header (delta-seconds or HTTP date)"""
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        return max(parsedate_to_datetime(value).timestamp() - time.time(), 0.0)
+    except (TypeError, ValueError):
+        return None
+
+
+class RobotsCache:
+    """robots.txt rules per origin, fetched once and kept for ``ttl_hours``
+
+    An unreachable robots.txt or a 5xx allows everything but is retried
+    after ``retry_seconds``; 401/403 disallow the whole origin, any other
+    4xx allows it, as the robots exclusion standard describes.
+    """
+
+    def __init__(self, user_agent: str = ROBOTS_USER_AGENT, ttl_hours: float = 24,
+                 timeout: float = 10.0, retry_seconds: float = 600,
+                 session: Optional[requests.Session] = None):
+        self.user_agent = user_agent
+        self.ttl = ttl_hours * 3600
+        self.timeout = timeout
+        self.retry_seconds = retry_seconds
+        self.session = session or requests.Session()
+        self.logger = logging.getLogger(__name__)
+        self._parsers: Dict[str, RobotFileParser] = {}
+        self._expires: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def is_loaded(self, url: str) -> bool:
+        return self._expires.get(origin_of(url), 0) > time.monotonic()
+
+    def load(self, url: str) -> RobotFileParser:
+        """The parser for a URL's origin, fetching robots.txt when missing or stale"""
+        origin = origin_of(url)
+        with self._lock:
+            if self._expires.get(origin, 0) > time.monotonic():
+                return self._parsers[origin]
+
+        parser = RobotFileParser(f"{origin}/robots.txt")
+        ttl = self.ttl
+        try:
+            response = self.session.get(parser.url, timeout=self.timeout)
+            if response.status_code in (401, 403):
+                parser.disallow_all = True
+            elif 400 <= response.status_code < 500:
+                parser.allow_all = True
+            elif response.status_code >= 500:
+                parser.allow_all = True
+                ttl = self.retry_seconds
+            else:
+                parser.parse(response.text.splitlines())
+        except requests.RequestException as e:
+            self.logger.warning(f"Could not fetch {parser.url}, allowing all for now: {e}")
+            parser.allow_all = True
+            ttl = self.retry_seconds
+        parser.modified()
+
+        with self._lock:
+            self._parsers[origin] = parser
+            self._expires[origin] = time.monotonic() + ttl
+        return parser
+
+    def allowed(self, url: str) -> bool:
+        return self.load(url).can_fetch(self.user_agent, url)
+
+    def crawl_delay(self, url: str) -> Optional[float]:
+        """Seconds between requests asked for by Crawl-delay or Request-rate, if any"""
+        parser = self.load(url)
+        delay = parser.crawl_delay(self.user_agent)
+        rate = parser.request_rate(self.user_agent)
+        delays = [float(delay)] if delay else []
+        if rate and rate.requests:
+            delays.append(rate.seconds / rate.requests)
+        return max(delays) if delays else None
+
+
+class HostLimiter:
+    """Token bucket plus AIMD concurrency window for one host
+
+    Requests take a token (refilled at ``rate`` per second, up to a burst
+    of the current window) and a slot in the concurrency window. Successful
+    responses with normal latency grow the window by ``1/window`` and the
+    rate by ``1/rate`` per response, so both rise by about one per round
+    trip. A 429/5xx, a timeout or a latency spike (the latency average
+    above ``latency_factor`` times the best seen, or ``min_latency`` if
+    that is higher) halves both, at most once per round trip, and
+    Retry-After pauses the host. A robots.txt Crawl-delay caps the rate and
+    pins the window to one request.
+    """
+
+    def __init__(self, host: str, max_concurrency: int = 8, initial_rate: float = 2.0,
+                 max_rate: float = 20.0, crawl_delay: Optional[float] = None,
+                 latency_factor: float = 3.0, min_rate: float = 0.1, min_latency: float = 0.1):
+        self.host = host
+        self.max_concurrency = max(1, max_concurrency)
+        self.max_rate = max_rate
+        self.min_rate = min_rate
+        if crawl_delay:
+            self.max_concurrency = 1
+            self.max_rate = min(max_rate, 1.0 / crawl_delay)
+        self.rate = min(initial_rate, self.max_rate)
+        self.window = min(2.0, float(self.max_concurrency))
+        self.latency_factor = latency_factor
+        self.min_latency = min_latency
+        self.logger = logging.getLogger(__name__)
+
+        self.in_flight = 0
+        self.tokens = 1.0
+        self.paused_until = 0.0
+        self.latency_avg: Optional[float] = None
+        self.latency_best: Optional[float] = None
+        self._refilled = time.monotonic()
+        self._last_decrease = 0.0
+        self._lock = threading.Lock()
+
+    def try_acquire(self) -> float:
+        """Take a slot and a token, or return how long to wait before trying again"""
+        with self._lock:
+            now = time.monotonic()
+            if now < self.paused_until:
+                return self.paused_until - now
+            self.tokens = min(self.tokens + (now - self._refilled) * self.rate, max(self.window, 1.0))
+            self._refilled = now
+            if self.in_flight >= int(self.window):
+                return 0.05
+            if self.tokens < 1:
+                return (1 - self.tokens) / self.rate
+            self.tokens -= 1
+            self.in_flight += 1
+            return 0.0
+
+    def acquire(self):
+        while True:
+            wait = self.try_acquire()
+            if not wait:
+                return
+            time.sleep(wait)
+
+    async def acquire_async(self):
+        while True:
+            wait = self.try_acquire()
+            if not wait:
+                return
+            await asyncio.sleep(wait)
+
+    def release(self, status: int = 0, latency: Optional[float] = None, error: bool = False,
+                retry_after: Optional[float] = None):
+        """Report how a request went and adapt the window and rate"""
+        with self._lock:
+            self.in_flight = max(self.in_flight - 1, 0)
+            now = time.monotonic()
+            if latency is not None and not error:
+                self.latency_avg = latency if self.latency_avg is None else 0.8 * self.latency_avg + 0.2 * latency
+                self.latency_best = latency if self.latency_best is None else min(self.latency_best, latency)
+            slow = (self.latency_avg is not None
+                    and self.latency_avg > self.latency_factor * max(self.latency_best, self.min_latency))
+
+            if retry_after:
+                self.paused_until = max(self.paused_until, now + retry_after)
+            if error or status in BACKOFF_STATUSES or slow:
+                # One decrease per round trip, however many requests were in flight
+                if now - self._last_decrease >= max(self.latency_avg or 0, 1.0):
+                    self.window = max(self.window / 2, 1.0)
+                    self.rate = max(self.rate / 2, self.min_rate)
+                    self._last_decrease = now
+                    self.logger.info(
+                        f"Backing off {self.host} (status {status or 'error'}): "
+                        f"{self.window:.1f} concurrent, {self.rate:.2f} req/s"
+                    )
+                    if slow:
+                        # Measure the next spike from the current latency
+                        self.latency_best = self.latency_avg
+            elif status:
+                self.window = min(self.window + 1 / self.window, float(self.max_concurrency))
+                self.rate = min(self.rate + 1 / max(self.rate, 1.0), self.max_rate)
+
+
+class RequestSlot:
+    """Outcome of one request made through ``Politeness.request``"""
+
+    def __init__(self):
+        self.status = 0
+        self.retry_after = None
+
+    def response(self, status: int, headers: Optional[Dict[str, str]] = None):
+        self.status = status
+        if headers and status in BACKOFF_STATUSES:
+            self.retry_after = parse_retry_after(headers.get('Retry-After'))
+
+
+class Politeness:
+    """Per-host adaptive rate limits and robots.txt rules shared by every fetch path"""
+
+    def __init__(self, max_concurrency: int = 8, initial_rate: float = 2.0, max_rate: float = 20.0,
+                 respect_robots: bool = True, robots: Optional[RobotsCache] = None):
+        self.max_concurrency = max_concurrency
+        self.initial_rate = initial_rate
+        self.max_rate = max_rate
+        self.respect_robots = respect_robots
+        self.robots = robots or RobotsCache()
+        self._limiters: Dict[str, HostLimiter] = {}
+        self._lock = threading.Lock()
+
+    def allowed(self, url: str) -> bool:
+        return not self.respect_robots or self.robots.allowed(url)
+
+    def limiter(self, url: str) -> HostLimiter:
+        host = urlsplit(url).netloc
+        with self._lock:
+            limiter = self._limiters.get(host)
+        if limiter is None:
+            crawl_delay = self.robots.crawl_delay(url) if self.respect_robots else None
+            with self._lock:
+                limiter = self._limiters.setdefault(host, HostLimiter(
+                    host, self.max_concurrency, self.initial_rate, self.max_rate, crawl_delay
+                ))
+        return limiter
+
+    def is_ready(self, url: str) -> bool:
+        """Whether requests to a URL can be checked and limited without network I/O"""
+        return urlsplit(url).netloc in self._limiters and (not self.respect_robots or self.robots.is_loaded(url))
+
+    def prepare(self, url: str):
+        """Fetch robots.txt and set up the host's limiter ahead of non-blocking use"""
+        if self.respect_robots:
+            self.robots.load(url)
+        self.limiter(url)
+
+    @contextmanager
+    def request(self, url: str, timed: bool = True):
+        """Wait for the host's limiter around a blocking request; report via the yielded slot
+
+        With ``timed=False`` the request's duration is left out of the host's
+        latency estimate, for work such as browser renders that takes far
+        longer than a plain GET and would otherwise read as a latency spike.
+        """
+        limiter = self.limiter(url)
+        limiter.acquire()
+        slot = RequestSlot()
+        started = time.monotonic()
+        try:
+            yield slot
+        except Exception:
+            limiter.release(error=True)
+            raise
+        latency = time.monotonic() - started if timed else None
+        limiter.release(slot.status, latency, retry_after=slot.retry_after)
@@ -0,0 +1,95 @@
+import math
+import logging
+from datetime import datetime, timedelta
+from typing import List, Optional
+
+from src.storage.page_state import PageStateStore
+
+
+class RecrawlScheduler:
+    """Per-URL recrawl times from observed change rates, within a global budget
+
+    Every check of a page feeds its change history (exponentially decayed
+    counts of checks, detected changes and hours between checks), from
+    which the page's change rate is estimated. The next check is due after
+    the expected time to the next change, clamped to
+    [min_interval, max_interval] and to at most doubling or halving the
+    previous interval. The pages table, indexed by next-due time, is the
+    priority queue; ``due_urls`` hands out the most overdue pages up to what
+    the pages-per-hour budget has left for the past hour, and intervals are
+    stretched when all of them together would exceed the budget.
+    """
+
+    def __init__(self, page_state: PageStateStore, pages_per_hour: float = 200,
+                 min_interval_hours: float = 1, max_interval_hours: float = 168,
+                 default_interval_hours: float = 24, decay: float = 0.8):
+        self.page_state = page_state
+        self.pages_per_hour = pages_per_hour
+        self.min_interval = min_interval_hours
+        self.max_interval = max_interval_hours
+        self.default_interval = min(max(default_interval_hours, min_interval_hours), max_interval_hours)
+        self.decay = decay
+        self.logger = logging.getLogger(__name__)
+        self.stretch = 1.0
+
+    @staticmethod
+    def estimate_rate(checks: float, changes: float, hours: float) -> float:
+        """Changes per hour from checks that can each see at most one change
+
+        Counting detected changes underestimates the rate of pages that
+        change more than once between checks; this is the bias-reduced
+        Poisson estimator of Cho and Garcia-Molina, -ln((n - X + 0.5) / (n + 0.5)) / I.
+        """
+        if checks <= 0 or hours <= 0:
+            return 0.0
+        changes = min(changes, checks)
+        return -math.log((checks - changes + 0.5) / (checks + 0.5)) / (hours / checks)
+
+    def record(self, url: str, changed: bool, checked_at: Optional[datetime] = None):
+        """Fold one check into a page's change history and schedule its next check"""
+        checked_at = checked_at or datetime.now()
+        page = self.page_state.get(url) or {}
+        previous = page.get('recrawl_interval') or self.default_interval
+        state = {'last_checked': checked_at.isoformat()}
+
+        if page.get('last_checked'):
+            elapsed = (checked_at - datetime.fromisoformat(page['last_checked'])).total_seconds() / 3600
+            state['check_count'] = (page.get('check_count') or 0) * self.decay + 1
+            state['change_count'] = (page.get('change_count') or 0) * self.decay + bool(changed)
+            state['observed_hours'] = (page.get('observed_hours') or 0) * self.decay + max(elapsed, 0)
+            rate = self.estimate_rate(state['check_count'], state['change_count'], state['observed_hours'])
+            interval = 1 / rate if rate > 0 else self.max_interval
+            interval = min(max(interval, previous / 2, self.min_interval), previous * 2, self.max_interval)
+        else:
+            # First check: nothing to compare against yet
+            interval = previous
+
+        state['recrawl_interval'] = interval
+        state['next_due'] = (checked_at + timedelta(hours=interval * self.stretch)).isoformat()
+        self.page_state.set_recrawl_state(url, state)
+
+    def available(self, now: Optional[datetime] = None) -> int:
+        """Checks the budget allows right now, given those made in the past hour"""
+        now = now or datetime.now()
+        used = self.page_state.checked_since((now - timedelta(hours=1)).isoformat())
+        return max(int(self.pages_per_hour) - used, 0)
+
+    def due_urls(self, now: Optional[datetime] = None, limit: Optional[int] = None) -> List[str]:
+        """Pages due for a check, most overdue first, within the remaining budget"""
+        now = now or datetime.now()
+        load = self.page_state.recrawl_load()
+        self.stretch = max(load / self.pages_per_hour, 1.0) if self.pages_per_hour > 0 else 1.0
+        if self.stretch > 1:
+            self.logger.info(f"Recrawl intervals need {load:.0f} pages/hour, stretching them {self.stretch:.1f}x")
+
+        allowed = self.available(now)
+        if limit is not None:
+            allowed = min(allowed, limit)
+        urls = self.page_state.due_urls(now.isoformat(), allowed) if allowed else []
+        if urls:
+            self.logger.info(f"{len(urls)} pages due for a recheck")
+        return urls
+
+    def next_due(self) -> Optional[datetime]:
+        value = self.page_state.next_due()
+        return datetime.fromisoformat(value) if value else None
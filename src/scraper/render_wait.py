@@ -0,0 +1,135 @@
+import json
+import time
+import logging
+from fnmatch import fnmatch
+from typing import Dict, Optional
+
+from src.monitoring.metrics import metrics
+
+DEFAULT_PROFILE = {
+    'budget': 10.0,        # overall seconds per page, including driver.get
+    'quiet_ms': 500,       # network idle + no DOM mutations for this long
+    'wait_for': [],        # CSS selectors that must be present
+    'scroll': True,        # scroll to trigger lazy-loaded sections
+    'max_scrolls': 5
+}
+
+# Resolves once the page has had no in-flight fetch/XHR, no new resource
+# timings and no DOM mutations for quiet_ms, or when timeout_ms elapses.
+QUIESCENCE_SCRIPT = """
+const quietMs = arguments[0], timeoutMs = arguments[1], done = arguments[arguments.length - 1];
+if (!window.__renderWatch) {
+    const w = window.__renderWatch = {last: performance.now(), inflight: 0};
+    const touch = () => { w.last = performance.now(); };
+    new MutationObserver(touch).observe(document, {
+        subtree: true, childList: true, attributes: true, characterData: true
+    });
+    if (window.fetch) {
+        const originalFetch = window.fetch;
+        window.fetch = function () {
+            w.inflight++; touch();
+            return originalFetch.apply(this, arguments).finally(() => { w.inflight--; touch(); });
+        };
+    }
+    const originalSend = XMLHttpRequest.prototype.send;
+    XMLHttpRequest.prototype.send = function () {
+        w.inflight++; touch();
+        this.addEventListener('loadend', () => { w.inflight--; touch(); });
+        return originalSend.apply(this, arguments);
+    };
+}
+const w = window.__renderWatch;
+const started = performance.now();
+(function check() {
+    const entries = performance.getEntriesByType('resource');
+    const lastResource = entries.length ? entries[entries.length - 1].responseEnd : 0;
+    const now = performance.now();
+    const idle = document.readyState === 'complete' && w.inflight === 0 &&
+        now - Math.max(w.last, lastResource) >= quietMs;
+    if (idle || now - started >= timeoutMs) {
+        done({idle: idle, height: document.body ? document.body.scrollHeight : 0});
+    } else {
+        setTimeout(check, 50);
+    }
+})();
+"""
+
+
+class RenderReadiness:
+    """Event-driven wait for a rendered page to settle, within a time budget
+
+    Instead of fixed sleeps, the browser itself reports when network
+    activity and DOM mutations have gone quiet. Profiles can be set per URL
+    pattern, e.g. to wait for a results container or to disable scrolling.
+    """
+
+    def __init__(self, default_profile: Optional[Dict] = None,
+                 site_profiles: Optional[Dict[str, Dict]] = None):
+        self.default_profile = {**DEFAULT_PROFILE, **(default_profile or {})}
+        self.site_profiles = site_profiles or {}
+        self.logger = logging.getLogger(__name__)
+
+    @classmethod
+    def from_file(cls, path: Optional[str], default_profile: Optional[Dict] = None):
+        """Load ``{"url glob": {profile overrides}}`` from a JSON file"""
+        site_profiles = {}
+        if path:
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    site_profiles = json.load(f)
+            except FileNotFoundError:
+                logging.getLogger(__name__).warning(f"Render profile file not found: {path}")
+        return cls(default_profile, site_profiles)
+
+    def profile_for(self, url: str) -> Dict:
+        for pattern, overrides in self.site_profiles.items():
+            if fnmatch(url, pattern):
+                return {**self.default_profile, **overrides}
+        return self.default_profile
+
+    def _wait_quiet(self, driver, profile: Dict, deadline: float) -> Dict:
+        remaining_ms = max(int((deadline - time.monotonic()) * 1000), 0)
+        if remaining_ms == 0:
+            return {'idle': False, 'height': 0}
+        return driver.execute_async_script(QUIESCENCE_SCRIPT, profile['quiet_ms'], remaining_ms) or {}
+
+    def wait(self, driver, url: str, started: Optional[float] = None) -> bool:
+        """Block until the page is ready or its budget runs out; return whether it settled"""
+        profile = self.profile_for(url)
+        waiting_since = time.monotonic()
+        started = started if started is not None else waiting_since
+        deadline = started + profile['budget']
+
+        if profile['wait_for']:
+            from selenium.common.exceptions import TimeoutException
+            from selenium.webdriver.common.by import By
+            from selenium.webdriver.support import expected_conditions as EC
+            from selenium.webdriver.support.ui import WebDriverWait
+
+        for selector in profile['wait_for']:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                WebDriverWait(driver, remaining).until(
+                    EC.presence_of_element_located((By.CSS_SELECTOR, selector))
+                )
+            except TimeoutException:
+                self.logger.warning(f"Selector {selector!r} not found on {url}")
+
+        state = self._wait_quiet(driver, profile, deadline)
+        scrolls = profile['max_scrolls'] if profile['scroll'] else 0
+        while scrolls > 0 and time.monotonic() < deadline:
+            driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
+            new_state = self._wait_quiet(driver, profile, deadline)
+            if new_state.get('height') == state.get('height'):
+                state = new_state
+                break
+            state = new_state
+            scrolls -= 1
+
+        settled = bool(state.get('idle'))
+        if not settled:
+            self.logger.info(f"Render budget of {profile['budget']}s reached for {url}")
+        metrics.observe('render_wait', time.monotonic() - waiting_since, url=url, settled=settled)
+        return settled
@@ -0,0 +1,46 @@
+from typing import Optional
+from urllib.parse import urljoin, urlsplit, urlunsplit, parse_qsl, urlencode
+
+# Query parameters that only carry campaign/click tracking
+TRACKING_PARAMS = {
+    'fbclid', 'gclid', 'dclid', 'msclkid', 'mc_cid', 'mc_eid',
+    '_ga', '_gl', 'igshid', 'ref', 'ref_src'
+}
+TRACKING_PREFIXES = ('utm_',)
+DEFAULT_PORTS = {'http': 80, 'https': 443}
+
+
+def is_tracking_param(name: str) -> bool:
+    name = name.lower()
+    return name in TRACKING_PARAMS or name.startswith(TRACKING_PREFIXES)
+
+
+def canonicalize_url(url: str, base_url: Optional[str] = None) -> str:
+    """Normalize a URL so equivalent spellings dedupe to one key
+
+    Resolves relative links, lowercases scheme and host, drops default
+    ports, fragments and tracking parameters, sorts the query string and
+    strips trailing slashes (except for the site root).
+    """
+    if base_url:
+        url = urljoin(base_url, url)
+    parts = urlsplit(url.strip())
+
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or '').lower()
+    if parts.port and parts.port != DEFAULT_PORTS.get(scheme):
+        host = f"{host}:{parts.port}"
+
+    path = parts.path or '/'
+    if len(path) > 1:
+        path = path.rstrip('/') or '/'
+
+    query = [(k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True)
+             if not is_tracking_param(k)]
+    query.sort()
+
+    return urlunsplit((scheme, host, path, urlencode(query), ''))
+
+
+def same_domain(url: str, domain: str) -> bool:
+    return (urlsplit(url).hostname or '').lower() == domain.lower().split(':')[0]
@@ -0,0 +1,254 @@
+import os
+import re
+import gzip
+import json
+import logging
+from datetime import datetime, timedelta, timezone
+from email.utils import parsedate_to_datetime
+from typing import Dict, Iterable, List, Optional, Set
+from urllib.parse import urljoin, urlsplit
+from xml.etree import ElementTree
+
+import requests
+
+from src.scraper.scraper_utils import canonicalize_url, same_domain
+
+DEFAULT_SITEMAP_PATHS = ['/sitemap.xml', '/sitemap_index.xml', '/wp-sitemap.xml']
+DEFAULT_FEED_PATHS = ['/feed/', '/rss.xml', '/atom.xml']
+FEED_LINK_RE = re.compile(
+    r'<link[^>]+type=["\']application/(?:rss|atom)\+xml["\'][^>]*>', re.I
+)
+HREF_RE = re.compile(r'href=["\']([^"\']+)["\']', re.I)
+
+
+def _local_name(tag: str) -> str:
+    return tag.rsplit('}', 1)[-1]
+
+
+def parse_datetime(value: Optional[str]) -> Optional[datetime]:
+    """Parse W3C (sitemap/Atom) or RFC 822 (RSS) dates into aware UTC datetimes"""
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    except ValueError:
+        try:
+            parsed = parsedate_to_datetime(value)
+        except (TypeError, ValueError):
+            return None
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.astimezone(timezone.utc)
+
+
+class SitemapDiscovery:
+    """Discover site URLs and their last-modified dates from sitemaps and feeds
+
+    Reads sitemaps listed in robots.txt (or the usual default locations),
+    follows sitemap indexes, transparently handles gzip sitemaps, and adds
+    entries from RSS/Atom feeds advertised by the home page.
+    """
+
+    def __init__(self, start_url: str, timeout: float = 20.0, max_sitemaps: int = 500,
+                 session: Optional[requests.Session] = None):
+        self.start_url = start_url
+        self.domain = urlsplit(canonicalize_url(start_url)).netloc
+        self.timeout = timeout
+        self.max_sitemaps = max_sitemaps
+        self.session = session or requests.Session()
+        self.logger = logging.getLogger(__name__)
+
+    def _get(self, url: str) -> Optional[bytes]:
+        try:
+            response = self.session.get(url, timeout=self.timeout)
+        except requests.RequestException as e:
+            self.logger.debug(f"Could not fetch {url}: {e}")
+            return None
+        if response.status_code != 200:
+            return None
+        body = response.content
+        if body[:2] == b'\x1f\x8b':
+            try:
+                body = gzip.decompress(body)
+            except OSError as e:
+                self.logger.warning(f"Corrupt gzip sitemap {url}: {e}")
+                return None
+        return body
+
+    def _parse_xml(self, url: str, body: bytes) -> Optional[ElementTree.Element]:
+        try:
+            return ElementTree.fromstring(body)
+        except ElementTree.ParseError as e:
+            self.logger.warning(f"Could not parse {url}: {e}")
+            return None
+
+    def sitemap_urls(self) -> List[str]:
+        """Sitemaps listed in robots.txt, or the default locations"""
+        robots = self._get(urljoin(self.start_url, '/robots.txt'))
+        listed = []
+        if robots:
+            for line in robots.decode('utf-8', errors='replace').splitlines():
+                if line.lower().startswith('sitemap:'):
+                    listed.append(line.split(':', 1)[1].strip())
+        return listed or [urljoin(self.start_url, path) for path in DEFAULT_SITEMAP_PATHS]
+
+    def feed_urls(self) -> List[str]:
+        """Feeds advertised by the home page, or the default locations"""
+        home = self._get(self.start_url)
+        feeds = []
+        if home:
+            for tag in FEED_LINK_RE.findall(home.decode('utf-8', errors='replace')):
+                href = HREF_RE.search(tag)
+                if href:
+                    feeds.append(urljoin(self.start_url, href.group(1)))
+        return feeds or [urljoin(self.start_url, path) for path in DEFAULT_FEED_PATHS]
+
+    def read_sitemaps(self, sitemap_urls: Iterable[str]) -> Dict[str, Optional[datetime]]:
+        """Walk sitemaps and sitemap indexes, returning url -> lastmod"""
+        entries: Dict[str, Optional[datetime]] = {}
+        pending = list(sitemap_urls)
+        visited: Set[str] = set()
+
+        while pending and len(visited) < self.max_sitemaps:
+            sitemap_url = pending.pop()
+            if sitemap_url in visited:
+                continue
+            visited.add(sitemap_url)
+
+            body = self._get(sitemap_url)
+            root = self._parse_xml(sitemap_url, body) if body else None
+            if root is None:
+                continue
+
+            is_index = _local_name(root.tag) == 'sitemapindex'
+            for node in root:
+                fields = {_local_name(child.tag): (child.text or '').strip() for child in node}
+                loc = fields.get('loc')
+                if not loc:
+                    continue
+                if is_index:
+                    pending.append(loc)
+                else:
+                    self._add_entry(entries, loc, parse_datetime(fields.get('lastmod')))
+        return entries
+
+    def read_feeds(self, feed_urls: Iterable[str]) -> Dict[str, Optional[datetime]]:
+        """Read RSS 2.0 and Atom feeds, returning url -> last updated"""
+        entries: Dict[str, Optional[datetime]] = {}
+        for feed_url in feed_urls:
+            body = self._get(feed_url)
+            root = self._parse_xml(feed_url, body) if body else None
+            if root is None:
+                continue
+
+            for node in root.iter():
+                name = _local_name(node.tag)
+                if name not in ('item', 'entry'):
+                    continue
+                link, updated = None, None
+                for child in node:
+                    child_name = _local_name(child.tag)
+                    if child_name == 'link':
+                        link = child.get('href') or (child.text or '').strip() or link
+                    elif child_name in ('updated', 'pubDate', 'date', 'published') and updated is None:
+                        updated = parse_datetime(child.text)
+                if link:
+                    self._add_entry(entries, link, updated)
+        return entries
+
+    def _add_entry(self, entries: Dict[str, Optional[datetime]], url: str,
+                   lastmod: Optional[datetime]):
+        url = canonicalize_url(url, self.start_url)
+        if not same_domain(url, self.domain):
+            return
+        previous = entries.get(url)
+        if previous is None or (lastmod is not None and lastmod > previous):
+            entries[url] = lastmod
+
+    def discover(self) -> Dict[str, Optional[datetime]]:
+        """All URLs found in the site's sitemaps and feeds, with lastmod dates"""
+        entries = self.read_sitemaps(self.sitemap_urls())
+        for url, lastmod in self.read_feeds(self.feed_urls()).items():
+            if url not in entries or (lastmod and (entries[url] is None or lastmod > entries[url])):
+                entries[url] = lastmod
+        self.logger.info(f"Discovered {len(entries)} URLs from sitemaps and feeds")
+        return entries
+
+    def changed_since(self, since: Optional[datetime], known_urls: Set[str]) -> Optional[List[str]]:
+        """URLs that are new or were modified after ``since``
+
+        Returns None when the site exposes no sitemap or feed, so callers
+        can fall back to a full crawl.
+        """
+        entries = self.discover()
+        if not entries:
+            return None
+        return [
+            url for url, lastmod in entries.items()
+            if url not in known_urls or since is None or lastmod is None or lastmod > since
+        ]
+
+
+class IncrementalCrawlPlanner:
+    """Decide between a sitemap-seeded incremental check and a full crawl
+
+    A full crawl runs when none has happened within ``full_crawl_interval``
+    or when the site has no usable sitemap/feed; otherwise only new and
+    recently modified URLs are seeded.
+    """
+
+    def __init__(self, discovery: SitemapDiscovery, state_path: str,
+                 full_crawl_interval_days: float = 7):
+        self.discovery = discovery
+        self.state_path = state_path
+        self.full_crawl_interval = timedelta(days=full_crawl_interval_days)
+        self.logger = logging.getLogger(__name__)
+        self.state = self._load()
+
+    def _load(self) -> Dict:
+        try:
+            with open(self.state_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return {}
+
+    def _save(self):
+        tmp_path = f"{self.state_path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.state, f, indent=4)
+        os.replace(tmp_path, self.state_path)
+
+    def plan(self, known_urls: Set[str], scheduled: Optional[List[str]] = None) -> Optional[List[str]]:
+        """Return the URLs to check, or None when a full crawl is due
+
+        ``scheduled`` are pages the recrawl scheduler has due; they are
+        checked alongside the sitemap's changes, and stand in for them on
+        sites without a sitemap or feed.
+        """
+        now = datetime.now(timezone.utc)
+        last_full = parse_datetime(self.state.get('last_full_crawl'))
+        if last_full is None or now - last_full >= self.full_crawl_interval:
+            self.logger.info("Full crawl due")
+            return None
+
+        since = parse_datetime(self.state.get('last_check'))
+        urls = self.discovery.changed_since(since, known_urls)
+        if urls is None:
+            if scheduled is None:
+                self.logger.info("No sitemap or feed found, falling back to full crawl")
+                return None
+            urls = []
+        self.logger.info(f"Incremental check of {len(urls)} new or modified URLs")
+        if scheduled:
+            urls = list(dict.fromkeys(urls + scheduled))
+            self.logger.info(f"Checking {len(scheduled)} scheduled pages as well")
+        return urls
+
+    def record_run(self, full_crawl: bool):
+        """Remember when the last (full) check completed"""
+        now = datetime.now(timezone.utc).isoformat()
+        self.state['last_check'] = now
+        if full_crawl:
+            self.state['last_full_crawl'] = now
+        self._save()
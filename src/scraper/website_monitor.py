@@ -1,47 +1,120 @@
-import requests
-from bs4 import BeautifulSoup
-import json
 import os
-from urllib.parse import urlparse, urljoin
+from urllib.parse import urlparse
 import time
-from selenium import webdriver
-from selenium.webdriver.common.keys import Keys
-from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.common.by import By
 import hashlib
 import schedule
 from datetime import datetime
+from src.config.settings import (
+    FETCH_CONCURRENCY, FETCH_PER_HOST_CONCURRENCY, FETCH_TIMEOUT,
+    RENDER_URL_PATTERNS, STATIC_URL_PATTERNS,
+    BROWSER_POOL_SIZE, BROWSER_MAX_PAGES, BROWSER_PAGE_TIMEOUT,
+    MAX_SCRAPED_PAGES, MAX_CRAWL_DEPTH, CRAWL_CHECKPOINT_EVERY,
+    INCREMENTAL_DISCOVERY, FULL_CRAWL_INTERVAL_DAYS,
+    RENDER_BUDGET_SECONDS, RENDER_QUIET_MS, RENDER_PROFILES_FILE,
+    PDF_DOWNLOAD_WORKERS, PDF_MAX_SIZE_MB, HTML_PARSER_BACKEND, CHECK_INTERVAL_HOURS,
+    RESPECT_ROBOTS_TXT, ROBOTS_CACHE_HOURS, HOST_INITIAL_RATE, HOST_MAX_RATE, HOST_MAX_RETRIES,
+    ADAPTIVE_RECRAWL, RECRAWL_PAGES_PER_HOUR, RECRAWL_MIN_INTERVAL_HOURS, RECRAWL_MAX_INTERVAL_HOURS,
+    RECRAWL_TICK_MINUTES, METRICS_FILE, METRICS_PORT
+)
+from src.scraper.fetcher import StaticFetcher, RenderRules
+from src.scraper.driver_pool import DriverPool
+from src.scraper.frontier import CrawlFrontier
+from src.scraper.sitemap import SitemapDiscovery, IncrementalCrawlPlanner
+from src.scraper.recrawl import RecrawlScheduler
+from src.scraper.politeness import Politeness, RobotsCache
+from src.scraper.render_wait import RenderReadiness
+from src.scraper.pdf_downloader import PDFDownloader
+from src.scraper.html_extract import extract_page
+from src.data_processing.near_duplicates import simhash, format_fingerprint
+from src.storage.crawl_output import JsonlCrawlWriter, new_run_id
+from src.storage.page_state import PageStateStore
+from src.monitoring.metrics import metrics
 
 class WebsiteMonitor:
     def __init__(self, start_url):
         self.start_url = start_url
         self.visited_urls = set()
         self.scraped_pages_count = 0
-        self.MAX_SCRAPED_PAGES = 1000
+        self.MAX_SCRAPED_PAGES = MAX_SCRAPED_PAGES
+        self.MAX_DEPTH = MAX_CRAWL_DEPTH
         self.PDF_FOLDER = 'pdf_files'
-        self.JSON_FILE = 'scraped_data.json'
+        self.OUTPUT_DIR = 'scraped_data'
         self.CHECKSUM_FILE = 'page_checksums.json'
         self.UPDATE_LOG = 'update_log.txt'
+        self.FRONTIER_FILE = 'crawl_frontier.json'
+        self.VALIDATOR_FILE = 'page_validators.json'
+        self.PAGE_STATE_FILE = 'page_state.db'
+        self.CRAWL_STATE_FILE = 'crawl_state.json'
         
         # Create necessary folders
         os.makedirs(self.PDF_FOLDER, exist_ok=True)
         
-        # Load existing checksums
-        self.page_checksums = self.load_checksums()
+        # Per-URL checksums, validators and status, imported once from the old JSON files
+        self.page_state = PageStateStore(self.PAGE_STATE_FILE)
+        self.page_state.migrate_json(self.CHECKSUM_FILE, self.VALIDATOR_FILE)
+        
+        # Per-URL recheck times learned from how often each page changes
+        self.scheduler = None
+        if ADAPTIVE_RECRAWL:
+            self.scheduler = RecrawlScheduler(
+                self.page_state,
+                pages_per_hour=RECRAWL_PAGES_PER_HOUR,
+                min_interval_hours=RECRAWL_MIN_INTERVAL_HOURS,
+                max_interval_hours=RECRAWL_MAX_INTERVAL_HOURS,
+                default_interval_hours=CHECK_INTERVAL_HOURS
+            )
+        
+        # One adaptive rate limit per host, shared by static fetches, renders and PDFs
+        self.politeness = Politeness(
+            max_concurrency=FETCH_PER_HOST_CONCURRENCY,
+            initial_rate=HOST_INITIAL_RATE,
+            max_rate=HOST_MAX_RATE,
+            respect_robots=RESPECT_ROBOTS_TXT,
+            robots=RobotsCache(ttl_hours=ROBOTS_CACHE_HOURS, timeout=FETCH_TIMEOUT)
+        )
+        self.pdf_downloader = PDFDownloader(
+            self.PDF_FOLDER,
+            max_workers=PDF_DOWNLOAD_WORKERS,
+            max_size_mb=PDF_MAX_SIZE_MB,
+            politeness=self.politeness
+        )
+        
+        # Static HTTP tier; Selenium is only started for JS-dependent pages
+        self.fetcher = StaticFetcher(
+            max_concurrency=FETCH_CONCURRENCY,
+            per_host_concurrency=FETCH_PER_HOST_CONCURRENCY,
+            timeout=FETCH_TIMEOUT,
+            render_rules=RenderRules(
+                always_render=RENDER_URL_PATTERNS,
+                never_render=STATIC_URL_PATTERNS
+            ),
+            page_state=self.page_state,
+            politeness=self.politeness,
+            max_retries=HOST_MAX_RETRIES
+        )
+        self.driver_pool = DriverPool(
+            self.setup_selenium,
+            size=BROWSER_POOL_SIZE,
+            max_pages_per_driver=BROWSER_MAX_PAGES,
+            page_timeout=BROWSER_PAGE_TIMEOUT
+        )
+        self.readiness = RenderReadiness.from_file(
+            RENDER_PROFILES_FILE,
+            {'budget': RENDER_BUDGET_SECONDS, 'quiet_ms': RENDER_QUIET_MS}
+        )
+        
+        # Sitemap/feed driven incremental checks with a periodic full crawl
+        self.planner = None
+        if INCREMENTAL_DISCOVERY:
+            self.planner = IncrementalCrawlPlanner(
+                SitemapDiscovery(start_url, timeout=FETCH_TIMEOUT),
+                self.CRAWL_STATE_FILE,
+                full_crawl_interval_days=FULL_CRAWL_INTERVAL_DAYS
+            )
         
-    def load_checksums(self):
-        try:
-            with open(self.CHECKSUM_FILE, 'r') as f:
-                return json.load(f)
-        except FileNotFoundError:
-            return {}
-    
-    def save_checksums(self):
-        with open(self.CHECKSUM_FILE, 'w') as f:
-            json.dump(self.page_checksums, f, indent=4)
-    
     def calculate_page_checksum(self, content):
-        return hashlib.md5(content.encode('utf-8')).hexdigest()
+        with metrics.time('hash', bytes=len(content)):
+            return hashlib.md5(content.encode('utf-8')).hexdigest()
     
     def log_update(self, message):
         timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
@@ -49,73 +122,80 @@ class WebsiteMonitor:
             f.write(f"[{timestamp}] {message}\n")
     
     def setup_selenium(self):
+        # Imported here so runs that never need a browser don't pay for selenium
+        from selenium import webdriver
+        from selenium.webdriver.chrome.options import Options
+
         options = Options()
         options.add_argument("--headless")
         options.add_argument("--no-sandbox")
         options.add_argument("--disable-dev-shm-usage")
         return webdriver.Chrome(options=options)
     
-    def extract_page_data(self, url, depth, driver, max_depth=4):
-        if url in self.visited_urls or depth > max_depth or self.scraped_pages_count >= self.MAX_SCRAPED_PAGES:
-            return None
+    def render_page(self, driver, url):
+        started = time.monotonic()
+        # Render time covers scripts and subresources, not just the server's response
+        with metrics.time('render', url=url), self.politeness.request(url, timed=False) as slot:
+            driver.get(url)
+            slot.response(200)
         
-        self.visited_urls.add(url)
+        # Handle dynamic content
+        self.readiness.wait(driver, url, started=started)
+        return driver.page_source
+    
+    def fetch_pages(self, urls):
+        """Fetch pages over HTTP, rendering JS-dependent ones on the browser pool
+
+        Returns HTML by URL along with the raw fetch results (304s, validators).
+        """
+        pages = {}
+        render_urls = []
+        results = self.fetcher.fetch_many(urls)
+        for url, result in results.items():
+            if result.not_modified:
+                continue
+            if result.needs_render:
+                render_urls.append(url)
+            elif result.ok:
+                pages[url] = result.html
+        if render_urls:
+            print(f"Rendering {len(render_urls)} pages with browser")
+            pages.update(self.driver_pool.render_all(render_urls, self.render_page))
+        return pages, results
+    
+    def extract_page_data(self, url, depth, html, parent_url=None):
         self.scraped_pages_count += 1
         print(f"Checking URL: {url} (Depth: {depth})")
         
         try:
-            driver.get(url)
-            
-            # Handle dynamic content
-            scroll_attempts = 5
-            last_height = driver.execute_script("return document.body.scrollHeight")
-            while scroll_attempts > 0:
-                driver.find_element(By.TAG_NAME, "body").send_keys(Keys.END)
-                time.sleep(2)
-                new_height = driver.execute_script("return document.body.scrollHeight")
-                if new_height == last_height:
-                    break
-                last_height = new_height
-                scroll_attempts -= 1
-            
-            soup = BeautifulSoup(driver.page_source, 'html.parser')
-            for tag in soup.find_all(['img', 'link', 'style', 'script']):
-                tag.decompose()
-            
-            page_text = soup.get_text(separator=" ", strip=True)
+            page = extract_page(html, url, frozenset({'style', 'script'}), HTML_PARSER_BACKEND)
+            page_text = page.text
             current_checksum = self.calculate_page_checksum(page_text)
             
             # Check if page has changed
-            if url in self.page_checksums:
-                if current_checksum != self.page_checksums[url]:
-                    self.log_update(f"Content changed: {url}")
+            previous_checksum = self.page_state.get_checksum(url)
+            if previous_checksum is not None and current_checksum != previous_checksum:
+                self.log_update(f"Content changed: {url}")
             
-            self.page_checksums[url] = current_checksum
-            
-            links = [urljoin(url, a['href']) for a in soup.find_all('a', href=True)]
-            pdf_links = [link for link in links if link.lower().endswith('.pdf')]
+            links = page.links
+            pdf_links = page.pdf_links
             
             page_data = {
                 "url": url,
+                "parent_url": parent_url,
                 "depth": depth,
                 "content": page_text,
+                "checksum": current_checksum,
+                "simhash": format_fingerprint(simhash(page_text)),
                 "links": links,
-                "children": [],
                 "pdf_links": [],
                 "last_updated": datetime.now().isoformat()
             }
             
-            # Handle PDFs
+            # Handle PDFs; downloads run in the background
             for pdf_link in pdf_links:
-                if self.download_pdf(pdf_link):
-                    page_data["pdf_links"].append(pdf_link)
-            
-            # Recursive crawling
-            for link in links:
-                if urlparse(link).netloc == urlparse(url).netloc and link not in self.visited_urls:
-                    child_data = self.extract_page_data(link, depth + 1, driver, max_depth)
-                    if child_data:
-                        page_data["children"].append(child_data)
+                self.download_pdf(pdf_link)
+                page_data["pdf_links"].append(pdf_link)
             
             return page_data
             
@@ -124,46 +204,124 @@ class WebsiteMonitor:
             return None
     
     def download_pdf(self, pdf_url):
-        pdf_name = os.path.basename(urlparse(pdf_url).path)
-        pdf_path = os.path.join(self.PDF_FOLDER, pdf_name)
-        try:
-            response = requests.get(pdf_url)
-            if response.status_code == 200:
-                with open(pdf_path, 'wb') as f:
-                    f.write(response.content)
-                return True
-        except Exception as e:
-            self.log_update(f"Failed to download {pdf_url}: {e}")
-        return False
+        return self.pdf_downloader.submit(pdf_url)
+    
+    def wait_for_pdfs(self):
+        for result in self.pdf_downloader.wait().values():
+            if result["status"] == "failed":
+                self.log_update(f"Failed to download {result['url']}")
     
-    def save_all_data_to_json(self, all_data):
-        with open(self.JSON_FILE, 'w') as f:
-            json.dump(all_data, f, indent=4)
-        self.save_checksums()
-        print(f"All data saved to {self.JSON_FILE}")
+    def check_due_pages(self):
+        """Recheck only the pages whose learned recrawl interval has come due"""
+        if self.scheduler is not None and (os.path.exists(self.FRONTIER_FILE) or self.scheduler.due_urls(limit=1)):
+            self.check_for_updates(due_only=True)
     
-    def check_for_updates(self):
+    def check_for_updates(self, due_only=False):
         print(f"Starting update check at {datetime.now()}")
         self.visited_urls.clear()
         self.scraped_pages_count = 0
         
-        driver = self.setup_selenium()
-        all_scraped_data = []
+        seeds = None
+        if not os.path.exists(self.FRONTIER_FILE):
+            scheduled = self.scheduler.due_urls() if self.scheduler is not None else None
+            if due_only:
+                seeds = scheduled or []
+            elif self.planner is not None:
+                seeds = self.planner.plan(set(self.page_state.current_urls()), scheduled)
+        
+        frontier = CrawlFrontier(
+            self.start_url,
+            max_pages=self.MAX_SCRAPED_PAGES,
+            max_depth=self.MAX_DEPTH,
+            allowed_domain=urlparse(self.start_url).netloc,
+            checkpoint_path=self.FRONTIER_FILE,
+            checkpoint_every=CRAWL_CHECKPOINT_EVERY,
+            seeds=seeds
+        )
+        if not frontier.resumed:
+            frontier.meta['full_crawl'] = seeds is None
+            frontier.meta['due_only'] = due_only
+        if not frontier.meta.get('full_crawl', True):
+            # Sitemaps already list every page, so don't follow links
+            frontier.max_depth = 0
+        if 'run_id' not in frontier.meta:
+            frontier.meta['run_id'] = new_run_id()
         
-        page_data = self.extract_page_data(self.start_url, 0, driver)
-        if page_data:
-            all_scraped_data.append(page_data)
+        # One flat record per page, appended as it is scraped
+        writer = JsonlCrawlWriter(self.OUTPUT_DIR, run_id=frontier.meta['run_id'])
         
-        driver.quit()
-        self.save_all_data_to_json(all_scraped_data)
+        try:
+            while frontier:
+                batch = frontier.pop_batch(self.fetcher.max_concurrency)
+                pages, results = self.fetch_pages([url for url, _, _ in batch])
+                
+                for url, depth, parent in batch:
+                    self.visited_urls.add(url)
+                    result = results[url]
+                    page_data = None
+                    if result.not_modified:
+                        # Unchanged since last run: no download, render, parse or hash
+                        self.page_state.touch(url)
+                        if self.scheduler is not None:
+                            self.scheduler.record(url, False)
+                        page_data = {
+                            "url": url,
+                            "parent_url": parent,
+                            "depth": depth,
+                            "not_modified": True,
+                            "links": self.page_state.get_links(url),
+                            "last_updated": datetime.now().isoformat()
+                        }
+                        writer.write(page_data)
+                    elif url in pages:
+                        page_data = self.extract_page_data(url, depth, pages[url], parent_url=parent)
+                        if page_data:
+                            content_ref = writer.write(page_data)
+                            changed = self.page_state.record_check(url, page_data["checksum"], result.headers,
+                                                                   links=page_data["links"],
+                                                                   content_ref=content_ref)
+                            if self.scheduler is not None:
+                                self.scheduler.record(url, changed)
+                    else:
+                        if result.status and not result.ok:
+                            self.page_state.mark_status(url, result.status)
+                        self.log_update(f"Error scraping {url}: page could not be fetched")
+                    
+                    if page_data:
+                        frontier.add_links(page_data["links"], depth + 1, parent=url)
+                    frontier.done(url)
+                
+                # Page state is committed per batch, before the frontier moves on
+                self.page_state.commit()
+                if frontier.checkpoint_due:
+                    frontier.checkpoint()
+        finally:
+            writer.close()
+            self.fetcher.close()
+            self.driver_pool.close()
+            self.wait_for_pdfs()
+        
+        self.page_state.commit()
+        print(f"{writer.records_written} pages written to {self.OUTPUT_DIR}")
+        frontier.clear_checkpoint()
+        # Due-only checks skip the sitemaps, so they don't move the planner's last check
+        if self.planner is not None and not frontier.meta.get('due_only'):
+            self.planner.record_run(full_crawl=frontier.meta.get('full_crawl', True))
         self.log_update("Update check completed")
+        metrics.report(METRICS_FILE)
 
 def run_monitor(start_url, check_interval_hours=24):
     monitor = WebsiteMonitor(start_url)
+    if METRICS_PORT:
+        metrics.serve(METRICS_PORT)
     
     # Schedule regular checks
     schedule.every(check_interval_hours).hours.do(monitor.check_for_updates)
     
+    # Recheck pages as their learned recrawl intervals come due
+    if ADAPTIVE_RECRAWL:
+        schedule.every(RECRAWL_TICK_MINUTES).minutes.do(monitor.check_due_pages)
+    
     # Do initial check
     monitor.check_for_updates()
     
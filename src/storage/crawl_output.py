@@ -0,0 +1,141 @@
+import os
+import re
+import gzip
+import json
+import shutil
+import logging
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional
+
+PART_RE = re.compile(r'^(?P<prefix>.+)-(?P<run>\d{8}T\d{6})-(?P<part>\d{4})\.jsonl(?:\.gz)?$')
+
+
+def new_run_id() -> str:
+    return datetime.now().strftime('%Y%m%dT%H%M%S')
+
+
+class JsonlCrawlWriter:
+    """Append-only JSONL writer for crawl records, one flat record per page
+
+    Records are flushed as they are written, so a crash loses at most the
+    line being written. Files rotate once they pass ``max_bytes`` and the
+    finished parts are gzip-compressed. Files are named
+    ``<prefix>-<run_id>-<part>.jsonl`` so an interrupted run can reopen its
+    own output and keep appending.
+    """
+
+    def __init__(self, output_dir: str, run_id: Optional[str] = None, prefix: str = 'crawl',
+                 max_bytes: int = 64 * 1024 * 1024, compress: bool = True):
+        self.output_dir = output_dir
+        self.run_id = run_id or new_run_id()
+        self.prefix = prefix
+        self.max_bytes = max_bytes
+        self.compress = compress
+        self.logger = logging.getLogger(__name__)
+        os.makedirs(output_dir, exist_ok=True)
+
+        self.records_written = 0
+        self._part = self._last_part()
+        self._file = None
+        self._line = 0
+
+    def _path(self, part: int) -> str:
+        return os.path.join(self.output_dir, f"{self.prefix}-{self.run_id}-{part:04d}.jsonl")
+
+    def _last_part(self) -> int:
+        parts = [int(m.group('part')) for m in map(PART_RE.match, os.listdir(self.output_dir))
+                 if m and m.group('prefix') == self.prefix and m.group('run') == self.run_id]
+        return max(parts) if parts else 0
+
+    def _open(self):
+        path = self._path(self._part)
+        if not os.path.exists(path) and os.path.exists(f"{path}.gz"):
+            # The part we'd resume into was already closed and compressed
+            self._part += 1
+            path = self._path(self._part)
+        self._line = 0
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                self._line = sum(1 for _ in f)
+        self._file = open(path, 'a', encoding='utf-8')
+
+    def _finish_part(self):
+        path = self._file.name
+        self._file.close()
+        self._file = None
+        if self.compress and os.path.getsize(path) > 0:
+            with open(path, 'rb') as src, gzip.open(f"{path}.gz", 'wb') as dst:
+                shutil.copyfileobj(src, dst)
+            os.remove(path)
+
+    def write(self, record: Dict) -> str:
+        """Append a record and return a ``<file>:<line>`` pointer to it"""
+        if self._file is None:
+            self._open()
+        self._file.write(json.dumps(record, ensure_ascii=False) + '\n')
+        self._file.flush()
+        self._line += 1
+        self.records_written += 1
+        ref = f"{os.path.basename(self._file.name)}:{self._line}"
+
+        if self._file.tell() >= self.max_bytes:
+            self._finish_part()
+            self._part += 1
+        return ref
+
+    def close(self):
+        if self._file is not None:
+            self._finish_part()
+
+    def run_files(self) -> List[str]:
+        return run_files(self.output_dir, self.run_id, self.prefix)
+
+
+def run_files(output_dir: str, run_id: Optional[str] = None, prefix: str = 'crawl') -> List[str]:
+    """Output files of one run (the latest when run_id is None), in write order"""
+    if not os.path.isdir(output_dir):
+        return []
+    matches = [(m, name) for m, name in ((PART_RE.match(n), n) for n in os.listdir(output_dir))
+               if m and m.group('prefix') == prefix]
+    if run_id is None and matches:
+        run_id = max(m.group('run') for m, _ in matches)
+    selected = sorted((int(m.group('part')), name) for m, name in matches if m.group('run') == run_id)
+    return [os.path.join(output_dir, name) for _, name in selected]
+
+
+def _iter_jsonl(path: str) -> Iterator[Dict]:
+    opener = gzip.open if path.endswith('.gz') else open
+    with opener(path, 'rt', encoding='utf-8') as f:
+        for line_number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line)
+            except ValueError:
+                # Typically a line cut short by a crash mid-write
+                logging.getLogger(__name__).warning(f"Skipping malformed record {path}:{line_number}")
+
+
+def _iter_legacy_tree(path: str) -> Iterator[Dict]:
+    """Flatten the old nested scraped_data.json page tree"""
+    with open(path, 'r', encoding='utf-8') as f:
+        roots = json.load(f)
+    stack = [(node, None) for node in reversed(roots)]
+    while stack:
+        node, parent_url = stack.pop()
+        children = node.pop('children', [])
+        node['parent_url'] = parent_url
+        yield node
+        stack.extend((child, node['url']) for child in reversed(children))
+
+
+def iter_crawl_records(path: str, run_id: Optional[str] = None, prefix: str = 'crawl') -> Iterator[Dict]:
+    """Stream crawl records from an output directory, a JSONL(.gz) file or a legacy JSON tree"""
+    if os.path.isdir(path):
+        for file_path in run_files(path, run_id, prefix):
+            yield from _iter_jsonl(file_path)
+    elif path.endswith('.json'):
+        yield from _iter_legacy_tree(path)
+    else:
+        yield from _iter_jsonl(path)
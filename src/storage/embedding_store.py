@@ -0,0 +1,252 @@
+import os
+import json
+import fcntl
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+DTYPES = ('float16', 'int8')
+
+
+class _Segment:
+    """A read-only, memory-mapped segment and its sidecar row index"""
+
+    def __init__(self, directory: str, info: Dict):
+        self.info = info
+        self.seq = info['seq']
+        base = os.path.join(directory, info['name'])
+        self.matrix = np.load(f"{base}.npy", mmap_mode='r')
+        self.scales = np.load(f"{base}.scale.npy", mmap_mode='r') if info['dtype'] == 'int8' else None
+        with open(f"{base}.keys.json", 'r', encoding='utf-8') as f:
+            self.refs: List[Tuple[str, int]] = [tuple(ref) for ref in json.load(f)]
+        self.live = np.ones(len(self.refs), dtype=bool)
+
+    def apply_tombstones(self, tombstones: Dict[str, int]):
+        self.live = np.fromiter(
+            (self.seq >= tombstones.get(key, 0) for key, _ in self.refs), dtype=bool, count=len(self.refs)
+        )
+
+    def vectors(self, start: int, stop: int) -> np.ndarray:
+        block = np.asarray(self.matrix[start:stop], dtype=np.float32)
+        if self.scales is not None:
+            block *= self.scales[start:stop, None]
+        return block
+
+
+class EmbeddingSegmentStore:
+    """On-disk chunk embeddings in append-only, memory-mapped segments
+
+    Each append writes a new segment: an L2-normalized float16 or int8
+    (per-row scaled) matrix saved as ``.npy``, plus a sidecar list of
+    (key, chunk) row ids. Segments are memory-mapped at load, so processes
+    on one host share them through the page cache. Replacing or deleting a
+    key records a tombstone instead of rewriting files; ``compact()`` merges
+    segments and drops dead rows, optionally on a background thread. The
+    manifest is replaced atomically under a file lock.
+    """
+
+    def __init__(self, directory: str, dtype: str = 'float16', compact_min_segments: int = 8,
+                 block_rows: int = 65536):
+        if dtype not in DTYPES:
+            raise ValueError(f"Unsupported embedding dtype {dtype!r}, expected one of {DTYPES}")
+        self.directory = directory
+        self.dtype = dtype
+        self.compact_min_segments = compact_min_segments
+        self.block_rows = block_rows
+        self.logger = logging.getLogger(__name__)
+        os.makedirs(directory, exist_ok=True)
+
+        self.manifest_path = os.path.join(directory, 'manifest.json')
+        self._segments: List[_Segment] = []
+        self._manifest_mtime = None
+        self._compaction: Optional[threading.Thread] = None
+        self.refresh()
+
+    @contextmanager
+    def _locked(self):
+        with open(os.path.join(self.directory, '.lock'), 'w') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def _read_manifest(self) -> Dict:
+        if not os.path.exists(self.manifest_path):
+            return {'next_seq': 1, 'generation': 0, 'segments': [], 'tombstones': {}}
+        with open(self.manifest_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def _write_manifest(self, manifest: Dict):
+        tmp_path = f"{self.manifest_path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f)
+        os.replace(tmp_path, self.manifest_path)
+
+    def refresh(self, force: bool = False) -> bool:
+        """Re-map segments if another writer changed the manifest; returns whether it did"""
+        mtime = os.stat(self.manifest_path).st_mtime_ns if os.path.exists(self.manifest_path) else None
+        if mtime == self._manifest_mtime and not force:
+            return False
+        manifest = self._read_manifest()
+        segments = [_Segment(self.directory, info) for info in manifest['segments']]
+        for segment in segments:
+            segment.apply_tombstones(manifest['tombstones'])
+        self._segments = segments
+        self._manifest_mtime = mtime
+        return True
+
+    def __len__(self):
+        return sum(int(segment.live.sum()) for segment in self._segments)
+
+    def _quantize(self, vectors: np.ndarray) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        vectors = vectors / np.where(norms == 0, 1, norms)
+        if self.dtype == 'float16':
+            return vectors.astype(np.float16), None
+        scales = np.abs(vectors).max(axis=1) / 127
+        scales[scales == 0] = 1
+        return np.round(vectors / scales[:, None]).astype(np.int8), scales.astype(np.float32)
+
+    def _write_segment(self, name: str, refs: List[Tuple[str, int]], matrix: np.ndarray,
+                       scales: Optional[np.ndarray]):
+        base = os.path.join(self.directory, name)
+        # np.save appends .npy, so temp names keep the suffix last
+        np.save(f"{base}.tmp.npy", matrix)
+        os.replace(f"{base}.tmp.npy", f"{base}.npy")
+        if scales is not None:
+            np.save(f"{base}.scale.tmp.npy", scales)
+            os.replace(f"{base}.scale.tmp.npy", f"{base}.scale.npy")
+        with open(f"{base}.keys.json.tmp", 'w', encoding='utf-8') as f:
+            json.dump(refs, f)
+        os.replace(f"{base}.keys.json.tmp", f"{base}.keys.json")
+
+    def _remove_segment_files(self, name: str):
+        base = os.path.join(self.directory, name)
+        for suffix in ('.npy', '.scale.npy', '.keys.json'):
+            if os.path.exists(base + suffix):
+                os.remove(base + suffix)
+
+    def append(self, documents: Iterable[Tuple[str, List[np.ndarray]]]) -> int:
+        """Write (key, chunk vectors) pairs as one new segment, replacing earlier rows of those keys"""
+        refs, blocks = [], []
+        for key, embeddings in documents:
+            if len(embeddings):
+                refs.extend((key, chunk) for chunk in range(len(embeddings)))
+                blocks.append(np.vstack(embeddings).astype(np.float32))
+        if not refs:
+            return 0
+        matrix, scales = self._quantize(np.vstack(blocks))
+
+        with self._locked():
+            manifest = self._read_manifest()
+            seq = manifest['next_seq']
+            name = f"seg-{seq:08d}-{manifest['generation']:04d}"
+            self._write_segment(name, refs, matrix, scales)
+            manifest['segments'].append({
+                'name': name, 'seq': seq, 'rows': len(refs), 'dim': matrix.shape[1], 'dtype': self.dtype
+            })
+            for key in {key for key, _ in refs}:
+                manifest['tombstones'][key] = seq
+            manifest['next_seq'] = seq + 1
+            self._write_manifest(manifest)
+        self.refresh(force=True)
+        return len(refs)
+
+    def delete(self, keys: Iterable[str]):
+        keys = list(keys)
+        if not keys:
+            return
+        with self._locked():
+            manifest = self._read_manifest()
+            for key in keys:
+                manifest['tombstones'][key] = manifest['next_seq']
+            manifest['next_seq'] += 1
+            self._write_manifest(manifest)
+        self.refresh(force=True)
+
+    def compact(self):
+        """Merge all current segments into one, dropping replaced and deleted rows"""
+        with self._locked():
+            manifest = self._read_manifest()
+        snapshot = manifest['segments']
+        if len(snapshot) < 2 and not manifest['tombstones']:
+            return
+
+        segments = [_Segment(self.directory, info) for info in snapshot]
+        refs, blocks = [], []
+        for segment in segments:
+            segment.apply_tombstones(manifest['tombstones'])
+            rows = np.flatnonzero(segment.live)
+            if len(rows):
+                refs.extend(segment.refs[row] for row in rows)
+                blocks.append(segment.vectors(0, len(segment.refs))[rows])
+
+        merged_seq = max(info['seq'] for info in snapshot) if snapshot else 0
+        snapshot_names = {info['name'] for info in snapshot}
+        with self._locked():
+            manifest = self._read_manifest()
+            if not snapshot_names <= {info['name'] for info in manifest['segments']}:
+                self.logger.info("Skipping compaction: segments were compacted by another process")
+                return
+            generation = manifest['generation'] + 1
+            merged = []
+            if refs:
+                name = f"seg-{merged_seq:08d}-{generation:04d}"
+                matrix, scales = self._quantize(np.vstack(blocks))
+                self._write_segment(name, refs, matrix, scales)
+                merged = [{'name': name, 'seq': merged_seq, 'rows': len(refs),
+                           'dim': matrix.shape[1], 'dtype': self.dtype}]
+            newer = [info for info in manifest['segments'] if info['name'] not in snapshot_names]
+            manifest['segments'] = merged + newer
+            manifest['generation'] = generation
+            # Tombstones at or below the merged seq can only hit rows that no longer exist
+            manifest['tombstones'] = {
+                key: seq for key, seq in manifest['tombstones'].items() if seq > merged_seq
+            }
+            self._write_manifest(manifest)
+            for name in snapshot_names:
+                self._remove_segment_files(name)
+
+        self.logger.info(f"Compacted {len(snapshot)} segments into {len(refs)} rows")
+        self.refresh(force=True)
+
+    def maybe_compact_async(self) -> bool:
+        """Start a background compaction once enough segments pile up"""
+        if self._compaction is not None and self._compaction.is_alive():
+            return False
+        if len(self._segments) < self.compact_min_segments:
+            return False
+        self._compaction = threading.Thread(target=self.compact, name='embedding-compaction', daemon=True)
+        self._compaction.start()
+        return True
+
+    def wait(self):
+        if self._compaction is not None:
+            self._compaction.join()
+
+    def search(self, query: np.ndarray, k: int = 10) -> List[Tuple[str, int, float]]:
+        """Top-k (key, chunk index, cosine score), scoring the mapped segments block by block"""
+        query = np.asarray(query, dtype=np.float32).ravel()
+        norm = np.linalg.norm(query)
+        if norm:
+            query = query / norm
+
+        candidates: List[Tuple[float, str, int]] = []
+        for segment in self._segments:
+            for start in range(0, len(segment.refs), self.block_rows):
+                stop = min(start + self.block_rows, len(segment.refs))
+                scores = segment.vectors(start, stop) @ query
+                scores[~segment.live[start:stop]] = -np.inf
+                top = min(k, stop - start)
+                if top <= 0:
+                    continue
+                for row in np.argpartition(-scores, top - 1)[:top]:
+                    if np.isfinite(scores[row]):
+                        candidates.append((float(scores[row]), *segment.refs[start + row]))
+
+        candidates.sort(key=lambda candidate: candidate[0], reverse=True)
+        return [(key, chunk, score) for score, key, chunk in candidates[:k]]
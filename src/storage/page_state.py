@@ -0,0 +1,212 @@
+import os
+import json
+import sqlite3
+import logging
+from datetime import datetime
+from typing import Dict, List, Optional
+
+# Change history and next-due time kept for the adaptive recrawl scheduler
+RECRAWL_COLUMNS = {
+    'check_count': 'REAL',
+    'change_count': 'REAL',
+    'observed_hours': 'REAL',
+    'recrawl_interval': 'REAL',
+    'last_checked': 'TEXT',
+    'next_due': 'TEXT'
+}
+COLUMNS = (
+    'checksum', 'etag', 'last_modified', 'content_length', 'links',
+    'status', 'http_status', 'content_ref', 'last_seen', 'last_changed', 'validated_at'
+) + tuple(RECRAWL_COLUMNS)
+GONE_STATUSES = (404, 410)
+LIVE = "(status IS NULL OR status != 'gone')"
+
+
+class PageStateStore:
+    """Per-URL crawl state in an embedded SQLite database
+
+    One row per canonical URL holds the content checksum, HTTP validators,
+    outgoing links, last-seen/last-changed timestamps, status, a pointer
+    to the page's record in the crawl output and the change history used to
+    schedule its next recrawl. Lookups and updates are point
+    queries, so nothing is loaded at startup, and updates are committed in
+    small WAL transactions, so a crash never leaves a half-written file.
+    """
+
+    def __init__(self, path: str, commit_every: int = 100):
+        self.path = path
+        self.commit_every = commit_every
+        self.logger = logging.getLogger(__name__)
+        self._pending = 0
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.conn = sqlite3.connect(path)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(f"""
+            CREATE TABLE IF NOT EXISTS pages (
+                url TEXT PRIMARY KEY,
+                checksum TEXT,
+                etag TEXT,
+                last_modified TEXT,
+                content_length INTEGER,
+                links TEXT,
+                status TEXT,
+                http_status INTEGER,
+                content_ref TEXT,
+                last_seen TEXT,
+                last_changed TEXT,
+                validated_at TEXT
+            )
+        """)
+        existing = {row[1] for row in self.conn.execute("PRAGMA table_info(pages)")}
+        for column, column_type in RECRAWL_COLUMNS.items():
+            if column not in existing:
+                self.conn.execute(f"ALTER TABLE pages ADD COLUMN {column} {column_type}")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS pages_next_due ON pages (next_due)")
+        self.conn.commit()
+
+    def __len__(self):
+        return self.conn.execute("SELECT COUNT(*) FROM pages").fetchone()[0]
+
+    def _upsert(self, url: str, fields: Dict):
+        if 'links' in fields and fields['links'] is not None:
+            fields['links'] = json.dumps(fields['links'])
+        columns = [c for c in fields if c in COLUMNS]
+        placeholders = ', '.join('?' for _ in columns)
+        assignments = ', '.join(f"{c} = excluded.{c}" for c in columns)
+        self.conn.execute(
+            f"INSERT INTO pages (url, {', '.join(columns)}) VALUES (?, {placeholders}) "
+            f"ON CONFLICT(url) DO UPDATE SET {assignments}",
+            [url] + [fields[c] for c in columns]
+        )
+        self._pending += 1
+        if self._pending >= self.commit_every:
+            self.commit()
+
+    def commit(self):
+        self.conn.commit()
+        self._pending = 0
+
+    # Kept for callers of the previous JSON-backed validator cache
+    save = commit
+
+    def close(self):
+        self.commit()
+        self.conn.close()
+
+    def get(self, url: str) -> Optional[Dict]:
+        row = self.conn.execute("SELECT * FROM pages WHERE url = ?", (url,)).fetchone()
+        if row is None:
+            return None
+        page = dict(row)
+        page['links'] = json.loads(page['links']) if page['links'] else []
+        return page
+
+    def get_checksum(self, url: str) -> Optional[str]:
+        row = self.conn.execute("SELECT checksum FROM pages WHERE url = ?", (url,)).fetchone()
+        return row[0] if row else None
+
+    def get_links(self, url: str) -> List[str]:
+        row = self.conn.execute("SELECT links FROM pages WHERE url = ?", (url,)).fetchone()
+        return json.loads(row[0]) if row and row[0] else []
+
+    def current_urls(self) -> List[str]:
+        """URLs last seen alive on the site"""
+        return [url for (url,) in self.conn.execute(f"SELECT url FROM pages WHERE {LIVE}")]
+
+    def due_urls(self, now: str, limit: int) -> List[str]:
+        """Live URLs whose recrawl is due, most overdue first"""
+        return [url for (url,) in self.conn.execute(
+            f"SELECT url FROM pages WHERE {LIVE} AND next_due <= ? ORDER BY next_due LIMIT ?",
+            (now, limit)
+        )]
+
+    def next_due(self) -> Optional[str]:
+        return self.conn.execute(f"SELECT MIN(next_due) FROM pages WHERE {LIVE}").fetchone()[0]
+
+    def checked_since(self, since: str) -> int:
+        return self.conn.execute("SELECT COUNT(*) FROM pages WHERE last_checked >= ?", (since,)).fetchone()[0]
+
+    def recrawl_load(self) -> float:
+        """Pages per hour the current recrawl intervals add up to"""
+        load = self.conn.execute(
+            f"SELECT SUM(1.0 / recrawl_interval) FROM pages WHERE {LIVE} AND recrawl_interval > 0"
+        ).fetchone()[0]
+        return load or 0.0
+
+    def set_recrawl_state(self, url: str, state: Dict):
+        self._upsert(url, {c: state[c] for c in RECRAWL_COLUMNS if c in state})
+
+    def conditional_headers(self, url: str) -> Dict[str, str]:
+        """Request headers that let the server answer 304 Not Modified"""
+        row = self.conn.execute(
+            "SELECT etag, last_modified FROM pages WHERE url = ?", (url,)
+        ).fetchone()
+        headers = {}
+        if row and row[0]:
+            headers['If-None-Match'] = row[0]
+        if row and row[1]:
+            headers['If-Modified-Since'] = row[1]
+        return headers
+
+    def record_check(self, url: str, checksum: str, headers: Dict[str, str],
+                     links: Optional[List[str]] = None, content_ref: Optional[str] = None,
+                     http_status: int = 200) -> bool:
+        """Record a fully fetched page; returns whether its content changed"""
+        now = datetime.now().isoformat()
+        changed = self.get_checksum(url) != checksum
+        lowered = {k.lower(): v for k, v in headers.items()}
+        content_length = lowered.get('content-length')
+        fields = {
+            'checksum': checksum,
+            'etag': lowered.get('etag'),
+            'last_modified': lowered.get('last-modified'),
+            'content_length': int(content_length) if content_length and content_length.isdigit() else None,
+            'links': links,
+            'status': 'ok',
+            'http_status': http_status,
+            'last_seen': now,
+            'validated_at': now
+        }
+        if changed:
+            fields['last_changed'] = now
+            if content_ref is not None:
+                fields['content_ref'] = content_ref
+        self._upsert(url, fields)
+        return changed
+
+    def set_content_ref(self, url: str, content_ref: str):
+        self._upsert(url, {'content_ref': content_ref})
+
+    def touch(self, url: str):
+        """Note that a page was revalidated with a 304"""
+        now = datetime.now().isoformat()
+        self._upsert(url, {'status': 'ok', 'http_status': 304, 'last_seen': now, 'validated_at': now})
+
+    def mark_status(self, url: str, http_status: int):
+        """Record a failed fetch; 404/410 mark the page as gone"""
+        status = 'gone' if http_status in GONE_STATUSES else 'error'
+        self._upsert(url, {'status': status, 'http_status': http_status})
+
+    def migrate_json(self, checksum_path: Optional[str] = None, validator_path: Optional[str] = None):
+        """One-off import of the old whole-file checksum/validator JSON into an empty store"""
+        if len(self):
+            return
+        imported = 0
+        for path, to_fields in (
+            (checksum_path, lambda value: {'checksum': value}),
+            (validator_path, lambda entry: {c: entry.get(c) for c in COLUMNS if c in entry}),
+        ):
+            if not path or not os.path.exists(path):
+                continue
+            with open(path, 'r', encoding='utf-8') as f:
+                for url, value in json.load(f).items():
+                    self._upsert(url, to_fields(value))
+                    imported += 1
+        self.commit()
+        if imported:
+            self.logger.info(f"Imported {imported} legacy page entries into {self.path}")
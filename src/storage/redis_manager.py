@@ -1,9 +1,12 @@
 from enum import Enum
-from typing import Optional, Dict
+from contextlib import contextmanager
+from typing import Optional, Dict, List
 import redis
 import numpy as np
 from datetime import datetime
 
+from src.monitoring.metrics import metrics
+
 class RedisKeyTypes(Enum):
     PDF_TEXT = "pdf:text"
     PDF_EMBEDDING = "pdf:emb"
@@ -12,16 +15,130 @@ class RedisKeyTypes(Enum):
     METADATA = "meta"
 
 class RedisKeyManager:
-    def __init__(self, redis_host: str, redis_port: int, redis_db: int):
-        self.redis_text = redis.Redis(
+    def __init__(self, redis_host: str, redis_port: int, redis_db: int,
+                 redis_text: Optional[redis.Redis] = None, redis_binary: Optional[redis.Redis] = None):
+        """Connect to the given server, unless clients (decoding and binary) are passed in"""
+        self.redis_text = redis_text if redis_text is not None else redis.Redis(
             host=redis_host,
             port=redis_port,
             db=redis_db,
             decode_responses=True
         )
-        self.redis_binary = redis.Redis(
+        self.redis_binary = redis_binary if redis_binary is not None else redis.Redis(
             host=redis_host,
             port=redis_port,
             db=redis_db,
             decode_responses=False
-        )
\ No newline at end of file
+        )
+
+    def bulk_writer(self, flush_size: int = 1000, atomic: bool = False) -> 'RedisBulkWriter':
+        """Pipelined writer on the binary connection, which accepts text and bytes values"""
+        return RedisBulkWriter(self.redis_binary, flush_size, atomic)
+
+
+class RedisBulkWriter:
+    """Queue write commands and send them to Redis in pipelined batches
+
+    Commands are buffered until ``flush_size`` are pending, then sent in one
+    round trip. Commands issued inside ``document()`` are never split across
+    flushes, so with ``atomic=True`` each flush is a MULTI/EXEC holding only
+    whole documents. Use as a context manager to flush on exit.
+    """
+
+    def __init__(self, client: redis.Redis, flush_size: int = 1000, atomic: bool = False):
+        self.client = client
+        self.flush_size = flush_size
+        self.atomic = atomic
+        self.commands_sent = 0
+        self.round_trips = 0
+        self._pipe = client.pipeline(transaction=atomic)
+        self._pending = 0
+        self._document_depth = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.flush()
+        else:
+            self.discard()
+
+    @contextmanager
+    def document(self):
+        """Group the commands of one document so they are flushed together"""
+        self._document_depth += 1
+        try:
+            yield self
+        finally:
+            self._document_depth -= 1
+        self._maybe_flush()
+
+    def _queued(self):
+        self._pending += 1
+        self._maybe_flush()
+
+    def _maybe_flush(self):
+        if not self._document_depth and self._pending >= self.flush_size:
+            self.flush()
+
+    def hset(self, name: str, key: Optional[str] = None, value=None, mapping: Optional[Dict] = None):
+        if mapping is not None and not mapping and key is None:
+            return
+        self._pipe.hset(name, key, value, mapping)
+        self._queued()
+
+    def hset_chunked(self, name: str, mapping: Dict):
+        """HSET a large mapping as several commands of at most flush_size fields"""
+        items = list(mapping.items())
+        for start in range(0, len(items), self.flush_size):
+            self.hset(name, mapping=dict(items[start:start + self.flush_size]))
+
+    def hdel(self, name: str, *keys):
+        if keys:
+            self._pipe.hdel(name, *keys)
+            self._queued()
+
+    def sadd(self, name: str, *values):
+        if values:
+            self._pipe.sadd(name, *values)
+            self._queued()
+
+    def srem(self, name: str, *values):
+        if values:
+            self._pipe.srem(name, *values)
+            self._queued()
+
+    def set(self, name: str, value):
+        self._pipe.set(name, value)
+        self._queued()
+
+    def lpush(self, name: str, *values):
+        if values:
+            self._pipe.lpush(name, *values)
+            self._queued()
+
+    def delete(self, *names):
+        if names:
+            self._pipe.delete(*names)
+            self._queued()
+
+    def flush(self) -> List:
+        """Send pending commands in one round trip and return their replies"""
+        if not self._pending:
+            return []
+        pending = self._pending
+        self._pending = 0
+        try:
+            with metrics.time('redis_write', items=pending):
+                replies = self._pipe.execute()
+        finally:
+            self._pipe.reset()
+        self.commands_sent += pending
+        self.round_trips += 1
+        return replies
+
+    def discard(self):
+        """Drop queued commands without sending them"""
+        self._pipe.reset()
+        self._pending = 0
@@ -1,87 +1,252 @@
-from typing import Dict, List, Optional
+from typing import Dict, Iterable, List, Optional
 import redis
 import json
+import time
 from datetime import datetime
 import logging
-from src.config.settings import REDIS_HOST, REDIS_PORT, REDIS_DB
+from src.config.settings import (
+    REDIS_HOST, REDIS_PORT, REDIS_DB, REDIS_FLUSH_SIZE,
+    VERSION_SNAPSHOT_EVERY, VERSION_RETENTION, VERSION_CACHE_TTL
+)
+from src.storage.redis_manager import RedisBulkWriter
+
+# Marks a content id removed in a delta
+TOMBSTONE = ''
 
 class DataVersionManager:
-    def __init__(self, redis_host: str = REDIS_HOST, redis_port: int = REDIS_PORT, redis_db: int = REDIS_DB):
-        self.redis = redis.Redis(
+    """Content-hash versions stored as deltas over their parent version
+
+    A version's ``version:{id}:content`` hash only holds the content ids
+    that changed in it; lookups walk the parent chain, newest first, until
+    a snapshot. Every ``snapshot_every`` versions the chain is materialized
+    into a snapshot, and ``collect_garbage`` drops versions that neither the
+    newest ``retention`` versions nor their chains need. The current version
+    id is cached and refreshed through pub/sub, with a TTL as a fallback.
+    """
+
+    def __init__(self, redis_host: str = REDIS_HOST, redis_port: int = REDIS_PORT, redis_db: int = REDIS_DB,
+                 snapshot_every: int = VERSION_SNAPSHOT_EVERY, retention: int = VERSION_RETENTION,
+                 cache_ttl: float = VERSION_CACHE_TTL, redis_client: Optional[redis.Redis] = None):
+        # A passed-in client must decode responses
+        self.redis = redis_client if redis_client is not None else redis.Redis(
             host=redis_host,
             port=redis_port,
             db=redis_db,
             decode_responses=True
         )
         self.logger = logging.getLogger(__name__)
-        
+        self.snapshot_every = snapshot_every
+        self.retention = retention
+        self.cache_ttl = cache_ttl
+
         # Keys for version tracking
         self.VERSION_KEY = "data_version:current"
         self.VERSION_HISTORY_KEY = "data_version:history"
+        self.VERSION_IDS_KEY = "data_version:ids"
+        self.VERSION_CHANNEL = "data_version:changes"
         self.CONTENT_VERSION_KEY = "content:versions"
-        
+
+        self._current_version: Optional[str] = None
+        self._current_checked: Optional[float] = None
+        self._pubsub_thread = None
+        # Parent links never change once a version is finalized
+        self._version_meta: Dict[str, Dict] = {}
+
+    def _on_version_message(self, message):
+        self._current_version = message['data'] or None
+        self._current_checked = time.monotonic()
+
+    def _ensure_subscription(self):
+        if self._pubsub_thread is not None:
+            return
+        try:
+            pubsub = self.redis.pubsub(ignore_subscribe_messages=True)
+            pubsub.subscribe(**{self.VERSION_CHANNEL: self._on_version_message})
+            self._pubsub_thread = pubsub.run_in_thread(sleep_time=1.0, daemon=True)
+        except redis.RedisError as e:
+            self.logger.warning(f"Version change subscription unavailable, using {self.cache_ttl}s TTL: {e}")
+            self._pubsub_thread = False
+
+    def close(self):
+        if self._pubsub_thread:
+            self._pubsub_thread.stop()
+        self._pubsub_thread = None
+
     def create_new_version(self) -> str:
         """Create a new data version and return its ID"""
         timestamp = datetime.now().isoformat()
         version_id = f"v_{timestamp}"
-        
+
         # Store new version information
         version_info = {
             "version_id": version_id,
             "created_at": timestamp,
             "status": "creating"
         }
-        
+
         # Add to version history
-        self.redis.lpush(self.VERSION_HISTORY_KEY, json.dumps(version_info))
-        
+        pipe = self.redis.pipeline(transaction=False)
+        pipe.lpush(self.VERSION_HISTORY_KEY, json.dumps(version_info))
+        pipe.zadd(self.VERSION_IDS_KEY, {version_id: time.time()})
+        pipe.execute()
+
         return version_id
-    
-    def finalize_version(self, version_id: str, content_mapping: Dict[str, str]):
-        """Finalize a version after all content is processed"""
+
+    def _meta(self, version_id: str) -> Dict:
+        meta = self._version_meta.get(version_id)
+        if meta is None:
+            meta = self.redis.hgetall(f"version:{version_id}")
+            if meta.get('status') == 'active':
+                self._version_meta[version_id] = meta
+        return meta
+
+    def _chain(self, version_id: str) -> List[str]:
+        """Version ids to consult for lookups, newest first, ending at a snapshot"""
+        chain = []
+        while version_id and version_id not in chain:
+            chain.append(version_id)
+            meta = self._meta(version_id)
+            # Versions written before deltas carry no kind and are read on their own
+            if meta.get('kind', 'snapshot') == 'snapshot':
+                break
+            version_id = meta.get('parent')
+        return chain
+
+    def finalize_version(self, version_id: str, content_mapping: Dict[str, str],
+                         removed: Iterable[str] = ()):
+        """Finalize a version holding the changed content hashes and removed content ids"""
         try:
-            # Update version status
-            self.redis.hset(
-                f"version:{version_id}",
-                mapping={
-                    "status": "active",
-                    "finalized_at": datetime.now().isoformat(),
-                    "content_count": len(content_mapping)
-                }
-            )
-            
-            # Store content mappings for this version
-            for content_id, content_hash in content_mapping.items():
-                self.redis.hset(
-                    f"version:{version_id}:content",
-                    content_id,
-                    content_hash
+            parent = self.get_current_version()
+            depth = int(self._meta(parent).get('depth', 0)) + 1 if parent else 0
+            delta = dict(content_mapping)
+            delta.update({content_id: TOMBSTONE for content_id in removed})
+
+            with RedisBulkWriter(self.redis, REDIS_FLUSH_SIZE) as writer:
+                # Store only what changed since the parent version
+                writer.hset_chunked(f"version:{version_id}:content", delta)
+
+                # Update version status
+                writer.hset(
+                    f"version:{version_id}",
+                    mapping={
+                        "status": "active",
+                        "finalized_at": datetime.now().isoformat(),
+                        "content_count": len(delta),
+                        "parent": parent or '',
+                        "kind": "delta" if parent else "snapshot",
+                        "depth": depth
+                    }
                 )
-            
-            # Set as current version
-            self.redis.set(self.VERSION_KEY, version_id)
-            
-            self.logger.info(f"Finalized version {version_id} with {len(content_mapping)} content items")
-            
+
+                # Set as current version
+                writer.set(self.VERSION_KEY, version_id)
+
+            self._current_version = version_id
+            self._current_checked = time.monotonic()
+            self.redis.publish(self.VERSION_CHANNEL, version_id)
+            self.logger.info(f"Finalized version {version_id} with {len(delta)} changed content items")
+
+            if depth >= self.snapshot_every:
+                self.compact(version_id)
+            self.collect_garbage()
+
         except Exception as e:
             self.logger.error(f"Error finalizing version {version_id}: {e}")
             raise
-    
+
+    def resolve_all(self, version_id: Optional[str] = None) -> Dict[str, str]:
+        """Every live content hash as of a version"""
+        if version_id is None:
+            version_id = self.get_current_version()
+        mapping: Dict[str, str] = {}
+        for level in reversed(self._chain(version_id) if version_id else []):
+            mapping.update(self.redis.hgetall(f"version:{level}:content"))
+        return {content_id: value for content_id, value in mapping.items() if value != TOMBSTONE}
+
+    def compact(self, version_id: str):
+        """Materialize a version's chain into a snapshot so lookups stop there"""
+        mapping = self.resolve_all(version_id)
+        tmp_key = f"version:{version_id}:content:compacting"
+        with RedisBulkWriter(self.redis, REDIS_FLUSH_SIZE) as writer:
+            writer.delete(tmp_key)
+            writer.hset_chunked(tmp_key, mapping)
+        # Swap the full mapping in atomically, then stop chain walks here
+        pipe = self.redis.pipeline(transaction=True)
+        if mapping:
+            pipe.rename(tmp_key, f"version:{version_id}:content")
+        else:
+            pipe.delete(f"version:{version_id}:content")
+        pipe.hset(f"version:{version_id}", mapping={"kind": "snapshot", "depth": 0, "content_count": len(mapping)})
+        pipe.execute()
+        self._version_meta.pop(version_id, None)
+        self.logger.info(f"Compacted version {version_id} into a snapshot of {len(mapping)} items")
+
+    def collect_garbage(self, retention: Optional[int] = None) -> int:
+        """Delete versions outside the retention window that no kept version depends on"""
+        retention = retention or self.retention
+        history = [json.loads(entry).get('version_id') for entry in self.redis.lrange(self.VERSION_HISTORY_KEY, 0, -1)]
+        ranked = self.redis.zrevrange(self.VERSION_IDS_KEY, 0, -1)
+        known = list(dict.fromkeys(ranked + [version_id for version_id in history if version_id]))
+
+        needed = set()
+        current = self.get_current_version()
+        for version_id in known[:retention] + ([current] if current else []):
+            needed.update(self._chain(version_id))
+        stale = [version_id for version_id in known if version_id not in needed]
+
+        # Every version id is also tracked in the sorted set, so history only needs the recent entries
+        pipe = self.redis.pipeline(transaction=False)
+        pipe.ltrim(self.VERSION_HISTORY_KEY, 0, retention - 1)
+        for version_id in stale:
+            pipe.delete(f"version:{version_id}", f"version:{version_id}:content")
+        if stale:
+            pipe.zrem(self.VERSION_IDS_KEY, *stale)
+        pipe.execute()
+        if not stale:
+            return 0
+        for version_id in stale:
+            self._version_meta.pop(version_id, None)
+        self.logger.info(f"Garbage-collected {len(stale)} old versions")
+        return len(stale)
+
     def get_current_version(self) -> Optional[str]:
         """Get the current active version ID"""
-        return self.redis.get(self.VERSION_KEY)
-    
+        self._ensure_subscription()
+        now = time.monotonic()
+        if self._current_checked is None or now - self._current_checked > self.cache_ttl:
+            self._current_version = self.redis.get(self.VERSION_KEY)
+            self._current_checked = now
+        return self._current_version
+
     def get_content_hash(self, content_id: str, version_id: Optional[str] = None) -> Optional[str]:
         """Get content hash for specific version"""
+        return self.get_content_hashes([content_id], version_id)[content_id]
+
+    def get_content_hashes(self, content_ids: List[str], version_id: Optional[str] = None) -> Dict[str, Optional[str]]:
+        """Content hashes for many ids, one HMGET per chain level and batch"""
         if version_id is None:
             version_id = self.get_current_version()
-            
-        if not version_id:
-            return None
-            
-        return self.redis.hget(f"version:{version_id}:content", content_id)
-    
+
+        found: Dict[str, Optional[str]] = {}
+        pending = list(dict.fromkeys(content_ids))
+        for level in (self._chain(version_id) if version_id else []):
+            if not pending:
+                break
+            pipe = self.redis.pipeline(transaction=False)
+            for start in range(0, len(pending), REDIS_FLUSH_SIZE):
+                pipe.hmget(f"version:{level}:content", pending[start:start + REDIS_FLUSH_SIZE])
+            values = [value for batch in pipe.execute() for value in batch]
+            unresolved = []
+            for content_id, value in zip(pending, values):
+                if value is None:
+                    unresolved.append(content_id)
+                else:
+                    found[content_id] = value or None
+            pending = unresolved
+        found.update({content_id: None for content_id in pending})
+        return found
+
     def has_content_changed(self, content_id: str, new_hash: str) -> bool:
         """Check if content has changed from current version"""
         current_hash = self.get_content_hash(content_id)
-        return current_hash != new_hash
\ No newline at end of file
+        return current_hash != new_hash